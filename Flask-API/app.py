@@ -1,14 +1,28 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
+from functools import wraps
 from io import StringIO
+import hmac
 import os
-import requests
-import pickle
-import joblib
 import json
-import os
-import pandas as pd # Example for data handling
+import numpy as np
+from retention_features import RetentionFeatureTransformer, INPUT_COLUMNS
+from linear_scorer import build_scorer, as_feature_row
+from onnx_backend import build_onnx_scorer
+from microbatch import MicroBatcher, MicroBatchTimeout
+from metrics import Metrics, RequestMetrics
+from sampling_profiler import SamplingProfiler
+from prediction_cache import PredictionCache, RedisBackend
+from cached_response import CachedFileResponse, CachedResponse
+from columnar import ARROW_STREAM_TYPE, ColumnarTable, parse_query, prefers_arrow
+from retention_dashboard import retention_aggregates
+from retention_store import RetentionStore, load_retention_frame
+from decision_grid import GridTooLarge, grid_columns, grid_key, grid_payload, parse_grid_spec
+from csv_stream import iter_csv_records, iter_ndjson
+from envision_client import EnvisionClient, CircuitOpenError
+from ttl_cache import TTLCache
+from model_registry import ModelRegistry, ModelSpec, ModelLoadError, model_names_from_env
 
 # Load environment variable from .env file
 load_dotenv()
@@ -22,47 +36,206 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 app = Flask(__name__)
 CORS(app)
 
+# Admin routes are disabled unless ADMIN_TOKEN is set; callers send it as a bearer token
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+def require_admin(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({"error": "Admin routes are disabled, set ADMIN_TOKEN to enable them"}), 403
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(supplied, ADMIN_TOKEN):
+            return jsonify({"error": "Invalid admin token"}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+# Metrics Section
+# Per-route latency and in-flight requests, serving stages, model calls and Envision calls, served at /metrics
+metrics = Metrics()
+request_metrics = RequestMetrics(app, metrics)
+stage_seconds = metrics.histogram(
+    'stage_duration_seconds',
+    'Time per stage of a prediction route: parse, encode, predict (including cache and micro-batch wait), serialize',
+    ('endpoint', 'stage')
+)
+inference_seconds = metrics.histogram('model_inference_duration_seconds', 'Time per model call, by scorer backend',
+                                      ('model', 'backend'))
+upstream_seconds = metrics.histogram('upstream_request_duration_seconds', 'Time per upstream call, retries included',
+                                     ('upstream', 'method', 'outcome'))
+
+def stage(name):
+    """Time a stage of the current route, e.g. with stage('encode'): ..."""
+    return stage_seconds.time(request.endpoint, name)
+
+def timed_inference(name, fn, scorer):
+    """fn (a method of scorer) with every call observed as model inference."""
+    return inference_seconds.timed(fn, name, type(scorer).__name__)
+
+# Samples the stacks of request threads while switched on with POST /admin/profiler; idle otherwise
+profiler = SamplingProfiler(request_metrics.active_threads)
+
+# Optional micro-batching of prediction requests (off by default)
+microbatch_settings = {
+    'enabled': os.getenv("MICROBATCH_ENABLED", "0") == "1",
+    'max_wait_ms': float(os.getenv("MICROBATCH_WINDOW_MS", "2")),
+    'max_batch_size': int(os.getenv("MICROBATCH_MAX_SIZE", "64")),
+    'timeout_ms': float(os.getenv("MICROBATCH_TIMEOUT_MS", "10000")),
+}
+
+# A prediction whose batch did not run in time (the model call hung or the batching thread died)
+@app.errorhandler(MicroBatchTimeout)
+def microbatch_timeout(e):
+    return jsonify({"error": str(e)}), 503
+
+# Results of single-row predictions, keyed on model version and features (PREDICTION_CACHE_SIZE=0 disables)
+# With PREDICTION_CACHE_REDIS_URL set, workers also share their results through Redis
+prediction_cache_ttl = float(os.getenv("PREDICTION_CACHE_TTL", "3600"))
+prediction_cache_redis_url = os.getenv("PREDICTION_CACHE_REDIS_URL")
+prediction_cache = PredictionCache(
+    max_entries=int(os.getenv("PREDICTION_CACHE_SIZE", "10000")),
+    ttl=prediction_cache_ttl,
+    shared=RedisBackend(prediction_cache_redis_url, ttl=prediction_cache_ttl) if prediction_cache_redis_url else None
+)
+
+# Models are declared here and unpickled on first use; see the end of this file for MODEL_WARMUP
+# Each model can hold two versions at once, so a reloaded model can be A/B tested against the previous one
+model_registry = ModelRegistry(max_versions=int(os.getenv("MODEL_MAX_VERSIONS", "2")))
+
+# Models listed in ONNX_MODELS ('all' for every model) are scored with onnxruntime when it is installed
+onnx_models = model_names_from_env(os.getenv("ONNX_MODELS"))
+onnx_threads = int(os.getenv("ONNX_THREADS", "1"))
+
+# A dropped model version stops its micro-batching thread, which would otherwise keep the model alive
+def close_batcher(model):
+    model['batcher'].close()
+
+def uses_onnx(name):
+    return onnx_models is None or name in onnx_models
+
+def uses_model(name):
+    """
+    Pass the model version serving this request to the view as its first argument.
+
+    Requests holding a version keep it until they finish, even if a reload swaps in a new one.
+    An X-Model-Version header pins a specific loaded version.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                model = model_registry.select(name, request.headers.get('X-Model-Version'))
+            except KeyError as e:
+                return jsonify({"error": e.args[0]}), 400
+            except ModelLoadError as e:
+                return jsonify({"error": str(e)}), 503
+            return view(model, *args, **kwargs)
+        return wrapper
+    return decorator
+
 @app.route("/")
 def hello_world():
     return "<p>Hello, World!</p>"
 
 # Iris Section
-# Load the trained model using absolute path
+# Register the trained model using absolute path
 iris_model_path = os.path.join(BASE_DIR, 'models/iris_prediction', 'iris_log_reg.pkl')
-iris_model = pickle.load(open(iris_model_path, 'rb'))
 iris_species = ["Setosa", "Versicolor", "Virginica"]
 
+def build_iris(artifacts):
+    model = artifacts['model']
+    # Closed-form scorer, checked against sklearn's output before it is used
+    scorer = build_scorer(model)
+    if uses_onnx('iris'):
+        scorer = build_onnx_scorer(model, scorer, threads=onnx_threads)
+    predict = timed_inference('iris', scorer.predict, scorer)
+    return {'model': model, 'scorer': scorer, 'batcher': MicroBatcher(predict, **microbatch_settings)}
+
+# A reloaded model must classify a typical flower into one of the known species before it serves traffic
+def check_iris(iris):
+    index = int(iris['scorer'].predict(np.array([[1.4, 0.2]]))[0])
+    if not 0 <= index < len(iris_species):
+        raise ValueError(f"Iris model predicted an unknown class: {index}")
+
+model_registry.register(ModelSpec('iris', {'model': iris_model_path}, build_iris, canary=check_iris,
+                                  release=close_batcher))
+
 # API call to handle Iris model requests
 @app.route('/predict-iris', methods=['POST'])
-def predict_iris():
-    data = request.get_json(force=True)
-    # Assuming input data is a dictionary matching model's features
-    df = pd.DataFrame([data])
-    prediction = iris_model.predict(df)  # returns an index for the iris_species list
-    index = int(prediction[0])
-    return jsonify({'prediction': iris_species[index]})
+@uses_model('iris')
+def predict_iris(model):
+    iris = model.value
+    with stage('parse'):
+        data = request.get_json(force=True)
+    # Assuming input data is a list or dictionary matching model's features
+    try:
+        with stage('encode'):
+            features = as_feature_row(data, getattr(iris['model'], 'feature_names_in_', None), iris['scorer'].n_features_in_)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    # returns an index for the iris_species list
+    with stage('predict'):
+        prediction = prediction_cache.get_or_compute('iris', model.version, features[0],
+                                                     lambda: iris['batcher'].submit(features[0]))
+    index = int(prediction)
+    with stage('serialize'):
+        return jsonify({'prediction': iris_species[index], 'model_version': model.version})
     # return jsonify({'prediction': prediction.tolist()})
 
 # API call to fetch Iris dataset in JSON format
+# Serialize exactly as jsonify would
+def dump_json_body(payload):
+    return app.json.response(payload).get_data(as_text=True)
+
+# The parsed file and its compressed encodings are cached until iris.json changes
+def load_json_file(path):
+    with open(path) as json_file:
+        return json.load(json_file)
+
+iris_data_path = os.path.join(BASE_DIR, 'datasets', 'iris.json')
+iris_data_response = CachedFileResponse(iris_data_path, load_json_file, dump_json_body)
+
 @app.route('/iris-data', methods=['GET'])
 def get_iris_data():
-    iris_data_path = os.path.join(BASE_DIR, 'datasets', 'iris.json')
-    with open(iris_data_path) as iris_data:
-        iris_json = json.load(iris_data)
-        return iris_json
+    return iris_data_response.response(request)
 
 # House Price Section
 # house_model = pickle.load(open('pickles/house_price_random_forest.pkl', 'rb'))
 house_model_path = os.path.join(BASE_DIR, 'models/house_price', 'house_price_lin_reg.pkl')
-house_model = pickle.load(open(house_model_path, 'rb'))
+
+def build_house(artifacts):
+    model = artifacts['model']
+    scorer = build_scorer(model)
+    if uses_onnx('house'):
+        scorer = build_onnx_scorer(model, scorer, threads=onnx_threads)
+    predict = timed_inference('house', scorer.predict, scorer)
+    return {'model': model, 'scorer': scorer, 'batcher': MicroBatcher(predict, **microbatch_settings)}
+
+def check_house(house):
+    price = float(house['scorer'].predict(np.array([[3, 2, 5000, 0]], dtype=np.float64))[0])
+    if not np.isfinite(price):
+        raise ValueError(f"House model predicted a non-finite price: {price}")
+
+model_registry.register(ModelSpec('house', {'model': house_model_path}, build_house, canary=check_house,
+                                  release=close_batcher))
 
 # API call to handle house price prediction requests
 @app.route('/predict-house', methods=['POST'])
-def predict_house():
-    data = request.get_json(force=True)
-    df = pd.DataFrame([data])
-    prediction = house_model.predict(df)[0]
-    return jsonify({'prediction': prediction})
+@uses_model('house')
+def predict_house(model):
+    house = model.value
+    with stage('parse'):
+        data = request.get_json(force=True)
+    try:
+        with stage('encode'):
+            features = as_feature_row(data, getattr(house['model'], 'feature_names_in_', None), house['scorer'].n_features_in_)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    with stage('predict'):
+        prediction = prediction_cache.get_or_compute('house', model.version, features[0],
+                                                     lambda: house['batcher'].submit(features[0]))
+    with stage('serialize'):
+        return jsonify({'prediction': float(prediction), 'model_version': model.version})
 
 # Reference for the house price model prediction function
 # def predict_house_price(bedrooms, bathrooms, sqft_lot, waterfront):
@@ -87,16 +260,65 @@ def predict_house():
 #     """
 
 # Air Force Retention Section
-# Load model artifacts
+# Model artifacts: one fused pipeline from current training runs, or the four files older runs wrote
+retention_pipeline_path = os.path.join(BASE_DIR, 'models/airforce_retention', 'airforce_retention_pipeline.joblib')
 retention_model_path = os.path.join(BASE_DIR, 'models/airforce_retention', 'airforce_retention_model.pkl')
 retention_scaler_path = os.path.join(BASE_DIR, 'models/airforce_retention', 'airforce_retention_scaler.pkl')
 retention_encoders_path = os.path.join(BASE_DIR, 'models/airforce_retention', 'airforce_retention_encoders.pkl')
 retention_feature_info_path = os.path.join(BASE_DIR, 'models/airforce_retention', 'airforce_retention_feature_info.pkl')
 
-retention_model = joblib.load(retention_model_path)
-retention_scaler = joblib.load(retention_scaler_path)
-retention_encoders = joblib.load(retention_encoders_path)
-retention_feature_info = joblib.load(retention_feature_info_path)
+def build_retention(artifacts):
+    onnx_graph = None
+    if 'pipeline' in artifacts:
+        from retention_pipeline import pipeline_parts
+        encoders, scaler, feature_columns, model = pipeline_parts(artifacts['pipeline']['pipeline'])
+        requires_scaling = scaler is not None
+        # Scaler and model compiled at training time (--export-onnx), taking unscaled encoded features
+        onnx_graph = artifacts['pipeline'].get('onnx')
+    else:
+        encoders, scaler, model = artifacts['encoders'], artifacts.get('scaler'), artifacts['model']
+        feature_columns = artifacts['feature_info']['feature_columns']
+        requires_scaling = artifacts['feature_info']['requires_scaling']
+    # Compile encoders, rank levels and scaler into a pandas-free transformer once per load
+    transformer = RetentionFeatureTransformer(encoders, scaler, feature_columns, requires_scaling)
+    # The scorer takes unscaled encoded features; for linear models the scaling is folded into the weights
+    scorer = build_scorer(model, transformer.scale, transformer.offset)
+    if uses_onnx('retention'):
+        scorer = build_onnx_scorer(model, scorer, onnx_graph, transformer.scale, transformer.offset,
+                                   canary=transformer.encode(retention_canary), threads=onnx_threads)
+    return {
+        'model': model,
+        'transformer': transformer,
+        'scorer': scorer,
+        'batcher': MicroBatcher(timed_inference('retention', scorer.predict_proba, scorer), **microbatch_settings)
+    }
+
+# Artifacts written by different training runs (e.g. a new model with an old encoder) fail here, not on live traffic
+retention_canary = {
+    'age': 28, 'gender': 'Male', 'marital_status': 'Married', 'num_dependents': 2, 'grade_rank': 'E-6 (TSgt)',
+    'salary': 47000, 'years_of_service': 10, 'num_prior_reenlistments': 2, 'bonuses_received': 10000
+}
+
+def check_retention(retention):
+    probabilities = retention['scorer'].predict_proba(retention['transformer'].encode(retention_canary).reshape(1, -1))
+    if probabilities.shape != (1, 2) or not np.isclose(probabilities.sum(), 1.0):
+        raise ValueError(f"Retention model returned unusable probabilities: {probabilities.tolist()}")
+
+# Uncompressed joblib artifacts are memory-mapped so pre-fork workers share their arrays (MODEL_MMAP=0 to disable)
+retention_loader = 'joblib-mmap' if os.getenv("MODEL_MMAP", "1") == "1" else 'joblib'
+retention_legacy_artifacts = {
+    'model': retention_model_path,
+    'encoders': retention_encoders_path,
+    'feature_info': retention_feature_info_path
+}
+# Only written when the trained model needs scaled inputs
+if os.path.exists(retention_scaler_path):
+    retention_legacy_artifacts['scaler'] = retention_scaler_path
+# The fused pipeline (checksum-verified on every load, arrays memory-mapped) is read once it exists, so a
+# training run that writes one next to the older files is picked up by a reload or the watcher
+model_registry.register(ModelSpec('retention', {'pipeline': retention_pipeline_path}, build_retention,
+                                  loader='pipeline', canary=check_retention,
+                                  fallback=(retention_legacy_artifacts, retention_loader), release=close_batcher))
 
 # Prepare input data
 # airman_data = {
@@ -113,61 +335,254 @@ retention_feature_info = joblib.load(retention_feature_info_path)
 
 # API call to handle Air Force retention prediction requests
 @app.route('/predict-retention', methods=['POST'])
-def predict_retention():
-    data = request.get_json(force=True)
-
-    # Create DataFrame
-    # df = pd.DataFrame([airman_data])
-    df = pd.DataFrame([data])
-
-    # Encode categorical variables
-    for col in ['gender', 'marital_status', 'grade_rank']:
-        df[col + '_encoded'] = retention_encoders[col].transform(df[col])
-
-    # Extract rank level
-    df['rank_level'] = df['grade_rank'].str.extract(r'E-(\d+)').astype(int)
-
-    # Select features
-    features = df[retention_feature_info['feature_columns']]
-
-    # Scale features (Logistic Regression requires scaling)
-    features_scaled = retention_scaler.transform(features)
+@uses_model('retention')
+def predict_retention(model):
+    retention = model.value
+    with stage('parse'):
+        data = request.get_json(force=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+
+    # Encode categorical variables and extract rank level
+    try:
+        with stage('encode'):
+            features = retention['transformer'].encode(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Make prediction; the class is read off the probabilities so the model is evaluated once
+    with stage('predict'):
+        probabilities = prediction_cache.get_or_compute('retention', model.version, features,
+                                                        lambda: retention['batcher'].submit(features))
+        prediction = retention['scorer'].classes_[probabilities.argmax()]
+
+    with stage('serialize'):
+        return jsonify({
+            'retained': bool(prediction),
+            'retention_probability': probabilities[1],
+            'non_retention_probability': probabilities[0],
+            'model_version': model.version
+        })
+
+# Batch retention scoring
+retention_batch_max_rows = int(os.getenv("RETENTION_BATCH_MAX_ROWS", "50000"))
+
+def parse_retention_batch(payload):
+    """
+    Turn a batch payload into column lists.
+
+    Accepts a list of records, {"records": [...]}, or a columnar payload
+    {"columns": {"age": [...], "gender": [...], ...}}.
+    Returns (columns, n_rows, row_errors). Raises ValueError if the payload shape itself is unusable.
+    """
+    if isinstance(payload, dict) and 'columns' in payload:
+        columns = payload['columns']
+        if not isinstance(columns, dict) or not all(isinstance(v, list) for v in columns.values()):
+            raise ValueError("'columns' must map field names to lists")
+        lengths = {len(v) for v in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError("All columns must have the same length")
+        n_rows = lengths.pop() if lengths else 0
+        return columns, n_rows, {}
+
+    records = payload.get('records') if isinstance(payload, dict) else payload
+    if not isinstance(records, list):
+        raise ValueError("Expected a list of records, {'records': [...]} or {'columns': {...}}")
+    row_errors = {i: "Row must be a JSON object" for i, r in enumerate(records) if not isinstance(r, dict)}
+    columns = {
+        col: [r.get(col) if isinstance(r, dict) else None for r in records]
+        for col in INPUT_COLUMNS
+    }
+    return columns, len(records), row_errors
 
-    # Make prediction
-    prediction = retention_model.predict(features_scaled)[0]
-    probabilities = retention_model.predict_proba(features_scaled)[0]
+# API call to score many airmen in one request
+@app.route('/predict-retention-batch', methods=['POST'])
+@uses_model('retention')
+def predict_retention_batch(model):
+    retention = model.value
+    with stage('parse'):
+        data = request.get_json(force=True)
 
-    return jsonify({
-        'retained': bool(prediction),
-        'retention_probability': probabilities[1],
-        'non_retention_probability': probabilities[0]
-    })
+    try:
+        columns, n_rows, row_errors = parse_retention_batch(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if n_rows > retention_batch_max_rows:
+        return jsonify({"error": f"Batch too large: {n_rows} rows (max {retention_batch_max_rows})"}), 413
+
+    # Non-object rows have every field missing, so they are already invalid; report them plainly
+    with stage('encode'):
+        features, valid, errors = retention['transformer'].encode_batch(columns, n_rows)
+    for i, message in row_errors.items():
+        errors[i] = [message]
+    results = [{'row': i, 'errors': errors[i]} for i in range(n_rows)]
+
+    # Score the whole matrix in one pass
+    valid_rows = np.flatnonzero(valid)
+    if len(valid_rows):
+        with stage('predict'), inference_seconds.time('retention', type(retention['scorer']).__name__):
+            probabilities = retention['scorer'].predict_proba(features)
+        predictions = retention['scorer'].classes_[probabilities.argmax(axis=1)]
+
+        for i, prediction, proba in zip(valid_rows, predictions, probabilities):
+            results[i] = {
+                'row': int(i),
+                'retained': bool(prediction),
+                'retention_probability': float(proba[1]),
+                'non_retention_probability': float(proba[0])
+            }
+
+    with stage('serialize'):
+        return jsonify({
+            'results': results,
+            'num_rows': n_rows,
+            'num_scored': int(valid.sum()),
+            'num_errors': int(n_rows - valid.sum()),
+            'model_version': model.version
+        })
+
+# API call to expose micro-batching statistics, used to tune MICROBATCH_WINDOW_MS
+# Only models that have been loaded have a batcher to report on
+@app.route('/microbatch-stats', methods=['GET'])
+def get_microbatch_stats():
+    return jsonify({name: model['batcher'].stats() for name, model in model_registry.loaded_items()})
+
+# API call to report which model versions are loaded, their traffic split and load times
+@app.route('/model-stats', methods=['GET'])
+def get_model_stats():
+    return jsonify(model_registry.stats())
+
+# API call to reload a model from its artifacts without restarting workers
+# Optional body: {"artifacts": {"model": "models/<model>/candidate.pkl"}, "activate": false} stages a candidate;
+# candidate files must be inside the model's artifact directory
+@app.route('/admin/models/<name>/reload', methods=['POST'])
+@require_admin
+def reload_model(name):
+    body = request.get_json(silent=True) or {}
+    artifacts = body.get('artifacts')
+    if artifacts is not None and not (isinstance(artifacts, dict) and all(isinstance(p, str) for p in artifacts.values())):
+        return jsonify({"error": "'artifacts' must map artifact names to file paths"}), 400
+    try:
+        if artifacts:
+            # Relative paths are read from the Flask-API directory, like the registered artifacts
+            artifacts = {key: os.path.join(BASE_DIR, path) for key, path in artifacts.items()}
+            model_registry.spec(name).check_artifacts(artifacts)
+    except KeyError as e:
+        return jsonify({"error": e.args[0]}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        loaded = model_registry.reload(name, artifacts=artifacts, activate=body.get('activate', True) is not False)
+    except KeyError as e:
+        return jsonify({"error": e.args[0]}), 404
+    except ModelLoadError as e:
+        return jsonify({"error": str(e)}), 422
+    return jsonify({'model_version': loaded.version, 'models': model_registry.stats()[name]})
+
+# API call to split traffic between loaded versions, e.g. {"3f2a9c1d0b7e": 90, "9d8e7f6a5b4c": 10}
+@app.route('/admin/models/<name>/traffic', methods=['PUT'])
+@require_admin
+def set_model_traffic(name):
+    weights = request.get_json(silent=True)
+    if not isinstance(weights, dict):
+        return jsonify({"error": "Expected a JSON object of version -> weight"}), 400
+    try:
+        model_registry.set_traffic(name, weights)
+    except KeyError as e:
+        return jsonify({"error": e.args[0]}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(model_registry.stats()[name])
 
 # Envision Section - testinc capabilities for future development tasks
-hostname = 'https://envision.af.mil'
+hostname = os.getenv("ENVISION_HOSTNAME", 'https://envision.af.mil')
+
+# One pooled, keep-alive client (with timeouts, retries and a circuit breaker) for all Envision calls
+envision_client = EnvisionClient.from_env(hostname, ENVISION_TOKEN)
+envision_client.on_request = lambda method, seconds, failed: upstream_seconds.observe(
+    seconds, 'envision', method, 'error' if failed else 'ok')
+
+# Parsed Envision tables keyed on (rid, rowLimit); concurrent misses share one upstream fetch
+envision_cache = TTLCache(
+    max_entries=int(os.getenv("ENVISION_CACHE_SIZE", "32")),
+    ttl=float(os.getenv("ENVISION_CACHE_TTL", "300"))
+)
+
+def fetch_envision_table(path):
+    import pandas as pd  # deferred, only the Envision and dataset routes need it
+    response = envision_client.get(path)
+    response.raise_for_status()
+    return ColumnarTable.from_frame(pd.read_csv(StringIO(response.text)))
+
+def stream_envision_dataset(path, stream_format):
+    """Relay an Envision table as NDJSON or CSV while it downloads, without buffering it."""
+    response = envision_client.get(path, stream=True)
+    try:
+        response.raise_for_status()
+    except Exception:
+        response.close()
+        raise
+    response.raw.decode_content = True
+
+    def generate():
+        try:
+            if stream_format == 'csv':
+                yield from response.iter_content(chunk_size=64 * 1024)
+            else:
+                yield from iter_ndjson(iter_csv_records(response.raw, response.encoding or 'utf-8'))
+        finally:
+            response.close()
+
+    mimetype = 'text/csv' if stream_format == 'csv' else 'application/x-ndjson'
+    return Response(generate(), mimetype=mimetype)
+
+# Dataset routes answer with an Arrow IPC stream instead of JSON when the client sends
+# Accept: application/vnd.apache.arrow.stream and pyarrow is installed; JSON stays the default
+def arrow_response(body):
+    return Response(body, mimetype=ARROW_STREAM_TYPE, headers={'Vary': 'Accept'})
 
 # API call to query an Envision dataset
+# ?format=ndjson or ?format=csv streams rows as they arrive instead of returning one JSON array
 @app.route('/envision-dataset', methods=['GET'])
 def get_envision_dataset():
     rid = request.args.get('rid')
     row_limit = request.args.get('rowLimit')
-    url = f"{hostname}/api/v2/datasets/{rid}/readTable?format=CSV&rowLimit={row_limit}"
+    stream_format = request.args.get('format')
+    try:
+        query = parse_query(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if stream_format not in (None, 'ndjson', 'csv'):
+        return jsonify({"error": f"Unsupported format: {stream_format}"}), 400
+    if stream_format is not None and query is not None:
+        return jsonify({"error": "Streaming formats do not support offset, limit, columns, filter or sort"}), 400
 
-    # Format Authorization header as a bearer token
-    headers = {
-        "Authorization": f"Bearer {ENVISION_TOKEN}"
-    }
+    path = f"/api/v2/datasets/{rid}/readTable?format=CSV&rowLimit={row_limit}"
 
     # GET Request to Envision API
     try:
-        response = requests.get(url, headers=headers, verify=False)
-        response.raise_for_status()
-        
-        df = pd.read_csv(StringIO(response.text))
-        
-        csv_data = df.to_json(orient="records", indent=4)
-        return jsonify(csv_data)
-    
+        if stream_format is not None:
+            return stream_envision_dataset(path, stream_format)
+
+        table = envision_cache.get_or_load((rid, row_limit), lambda: fetch_envision_table(path))
+
+        # Paged, projected, filtered or sorted view
+        try:
+            if prefers_arrow(request.headers.get('Accept')):
+                return arrow_response(table.to_arrow_ipc(query))
+            if query is not None:
+                response = jsonify(table.query(**query))
+                response.vary.add('Accept')
+                return response
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # A JSON array of records, keeping the dataset's column order
+        return Response(json.dumps(table.to_records()), mimetype='application/json', headers={'Vary': 'Accept'})
+
+    except CircuitOpenError as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         return jsonify({"error": str(e)})
 
@@ -175,39 +590,215 @@ def get_envision_dataset():
 @app.route('/predict_ticket_assignment', methods=['POST'])
 def predict_ticket_assignment():
     deployment_rid = "placeholder"
-    url = f"{hostname}/foundry-ml-live/api/inference/transform/{deployment_rid}/v2"
+    path = f"/foundry-ml-live/api/inference/transform/{deployment_rid}/v2"
 
     # Get JSON body from incoming request
     data = request.get_json(force=True)
 
-    # Format Authorization header as a bearer token
-    headers = {
-        "Authorization": f"Bearer {ENVISION_TOKEN}"
-    }
-
-    # POST Request to Envision API
+    # POST Request to Envision API (not retried, inference calls are not idempotent)
     try:
-        response = requests.post(url, headers=headers, json=data, verify=False)
+        response = envision_client.post(path, json=data)
         response.raise_for_status()
 
         # Return the exact same response from Envision
         return jsonify(response.json())
 
+    except CircuitOpenError as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         return jsonify({"error": str(e)})
 
+# API call to inspect (GET) or invalidate (DELETE, optionally ?rid=...) the Envision dataset cache
+@app.route('/admin/envision-cache', methods=['GET', 'DELETE'])
+@require_admin
+def envision_cache_admin():
+    if request.method == 'GET':
+        return jsonify(envision_cache.stats())
+    rid = request.args.get('rid')
+    removed = envision_cache.invalidate(None if rid is None else lambda key: key[0] == rid)
+    return jsonify({'invalidated': removed})
+
+# API call for Prometheus: request latency by route, stage and model timings, Envision latency (per worker)
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# API call to switch the sampling profiler on or off without a restart, e.g. {"enabled": true, "interval_ms": 5,
+# "duration": 60}; "reset": true drops earlier samples. GET returns the stacks in collapsed (flame graph) format
+@app.route('/admin/profiler', methods=['GET', 'POST'])
+@require_admin
+def profiler_admin():
+    if request.method == 'GET':
+        return Response(profiler.collapsed(), mimetype='text/plain')
+
+    body = request.get_json(force=True, silent=True) or {}
+    if not isinstance(body, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    try:
+        interval_ms = float(body.get('interval_ms', os.getenv("PROFILER_INTERVAL_MS", "5")))
+        duration = float(body['duration']) if body.get('duration') is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "interval_ms and duration must be numbers"}), 400
+    if interval_ms <= 0:
+        return jsonify({"error": "interval_ms must be positive"}), 400
+
+    if body.get('reset'):
+        profiler.reset()
+    if body.get('enabled'):
+        profiler.start(interval_ms, duration)
+    elif 'enabled' in body:
+        profiler.stop()
+    return jsonify(profiler.stats())
+
+# API call to expose prediction cache hits, misses and evictions
+@app.route('/prediction-cache-stats', methods=['GET'])
+def get_prediction_cache_stats():
+    return jsonify(prediction_cache.stats())
+
+# API call to expose Envision connection pool, circuit breaker and upstream latency counters
+@app.route('/envision-client-stats', methods=['GET'])
+def get_envision_client_stats():
+    return jsonify(envision_client.stats())
+
 # API call to fetch Air Force retention dataset
-@app.route('/local-retention-dataset', methods=['GET'])
-def get_local_retention_dataset(): 
+# Read the data into a columnar table and convert it to JSON format; only reruns when the data changes
+# Once batches have been ingested into the partitioned store (retention_store.py ingest) it replaces the CSV;
+# the first ingest seeds the store with the CSV's rows, so none of them disappear
+def load_retention_table(path):
+    return ColumnarTable.from_frame(load_retention_frame(path))
+
+retention_data_path = os.path.join(BASE_DIR, 'models/airforce_retention', 'airforce_retention_data.csv')
+retention_store = RetentionStore(
+    os.getenv("RETENTION_STORE", os.path.join(BASE_DIR, 'models/airforce_retention', 'retention_store'))
+)
+
+# Checked on every request, so a store filled while the app runs is served without a restart
+def retention_data_source():
+    return retention_store.root if retention_store else retention_data_path
+
+def retention_data_key(path):
+    if path == retention_store.root:
+        return retention_store.key()
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+retention_data_response = CachedFileResponse(
+    retention_data_source, load_retention_table, dump_json_body, to_payload=lambda table: table.to_records(),
+    key=retention_data_key
+)
 
-    # Read CSV data
-    csv_path = os.path.join(BASE_DIR, 'models/airforce_retention', 'airforce_retention_data.csv')
-    df = pd.read_csv(csv_path)
+@app.route('/local-retention-dataset', methods=['GET'])
+def get_local_retention_dataset():
+    try:
+        query = parse_query(request.args)
+        if prefers_arrow(request.headers.get('Accept')):
+            return arrow_response(retention_data_response.data().to_arrow_ipc(query))
+        if query is None:
+            response = retention_data_response.response(request)
+        else:
+            # e.g. ?offset=0&limit=50&columns=age,salary&filter=years_of_service>=10&sort=-salary
+            response = jsonify(retention_data_response.data().query(**query))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    response.vary.add('Accept')
+    return response
+
+# API call for the dashboard charts: every airman in the dataset scored in one pass and reduced to aggregates
+# Cached per served model version and dataset, so both sides of an A/B traffic split are served from memory
+retention_dashboard_cache = TTLCache(
+    max_entries=int(os.getenv("DASHBOARD_CACHE_SIZE", "8")),
+    ttl=float(os.getenv("DASHBOARD_CACHE_TTL", "3600"))
+)
+retention_dashboard_response = CachedResponse(dump_json_body)
+
+@app.route('/retention-dashboard', methods=['GET'])
+@uses_model('retention')
+def get_retention_dashboard(model):
+    retention = model.value
+    data_path = retention_data_response.current_path()
+    data_key = retention_data_response.key(data_path)
+
+    def build():
+        aggregates = retention_aggregates(retention_data_response.data(), retention['transformer'], retention['scorer'])
+        payload = dict(aggregates, model_version=model.version)
+        return retention_dashboard_response.build(payload, max(data_key[0] / 1e9, model.loaded_at))
+
+    entry = retention_dashboard_cache.get_or_load((f"retention@{model.version}", data_path, data_key), build)
+    return retention_dashboard_response.respond(request, entry)
+
+# Decision Surface Section
+# Charts ask for a model evaluated over a grid of feature values, e.g. petal length x width or salary x years of service
+# Each grid is scored in one vectorized call; responses are cached per model version and canonical grid spec
+grid_max_points = int(os.getenv("GRID_MAX_POINTS", "250000"))
+grid_cache = TTLCache(
+    max_entries=int(os.getenv("GRID_CACHE_SIZE", "64")),
+    ttl=float(os.getenv("GRID_CACHE_TTL", "3600"))
+)
+grid_response = CachedResponse(dump_json_body)
+# The iris model takes petal length and width positionally
+iris_grid_features = ['petal_length', 'petal_width']
+
+def iris_grid_proba(iris, columns):
+    return iris['scorer'].predict_proba(np.column_stack([columns[name] for name in iris_grid_features]))
+
+def retention_grid_proba(retention, columns):
+    n_points = len(next(iter(columns.values())))
+    features, valid, errors = retention['transformer'].encode_columns(columns, n_points)
+    if not valid.all():
+        # Every point shares the fixed fields, so the first failing point explains the problem
+        raise ValueError('; '.join(errors[int(np.argmin(valid))]))
+    return retention['scorer'].predict_proba(features)
+
+def respond_with_grid(name, model, features, class_labels, proba, numeric=()):
+    """
+    Validate the grid spec in the request body, then score the grid or serve it from the cache.
+
+    Args:
+        features: Input feature names that may be varied or fixed
+        numeric: Features that must each be given as numbers, see parse_grid_spec
+        class_labels: Name of each probability column
+        proba: Function taking the model value and the grid columns, returning the probability matrix
+    """
+    try:
+        axes, fixed = parse_grid_spec(request.get_json(force=True), features, grid_max_points, numeric)
+    except GridTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    # Convert DataFrame to JSON format
-    csv_data = df.to_dict(orient='records')
+    def build():
+        columns, shape = grid_columns(axes, fixed)
+        payload = grid_payload(axes, shape, proba(model.value, columns), class_labels)
+        return grid_response.build(dict(payload, model_version=model.version), model.loaded_at)
 
-    return jsonify(csv_data)
+    try:
+        entry = grid_cache.get_or_load((name, model.version, grid_key(axes, fixed)), build)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return grid_response.respond(request, entry)
+
+# API call to evaluate the iris model over a grid, e.g. {"axes": {"petal_length": {"min": 1, "max": 7, "steps": 100},
+# "petal_width": {"min": 0, "max": 2.5, "steps": 100}}}
+@app.route('/predict-iris-grid', methods=['POST'])
+@uses_model('iris')
+def predict_iris_grid(model):
+    return respond_with_grid('iris', model, iris_grid_features, iris_species, iris_grid_proba, iris_grid_features)
+
+# API call to evaluate the retention model over a grid, with the airman fields that are not varied under "fixed"
+@app.route('/predict-retention-grid', methods=['POST'])
+@uses_model('retention')
+def predict_retention_grid(model):
+    return respond_with_grid('retention', model, INPUT_COLUMNS, ['not_retained', 'retained'], retention_grid_proba)
+
+# API call to expose decision surface cache hits, misses and evictions
+@app.route('/grid-cache-stats', methods=['GET'])
+def get_grid_cache_stats():
+    return jsonify(grid_cache.stats())
+
+# Optionally load models at import time, e.g. MODEL_WARMUP=all with gunicorn --preload
+model_registry.warm_up(model_names_from_env(os.getenv("MODEL_WARMUP")))
+# Pick up retrained artifacts automatically, checking every MODEL_RELOAD_INTERVAL seconds (0 = only via the admin route)
+model_registry.watch(float(os.getenv("MODEL_RELOAD_INTERVAL", "0")))
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,161 @@
+"""
+ASGI entry point
+
+Serves the Envision routes with non-blocking HTTP, so a handful of workers can
+keep hundreds of upstream calls in flight. Every other route is the Flask app,
+run on a thread pool so model inference never blocks the event loop.
+
+Requires the packages in requirements-async.txt:
+    uvicorn asgi:application --workers 2
+"""
+
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from io import StringIO
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+from app import app as flask_app, hostname, ENVISION_TOKEN, envision_cache, request_metrics, upstream_seconds
+from columnar import ARROW_STREAM_TYPE, ColumnarTable, parse_query, prefers_arrow
+from csv_stream import CsvRecordParser, iter_ndjson
+from envision_client import AsyncEnvisionClient, CircuitOpenError
+
+envision_client = AsyncEnvisionClient.from_env(hostname, ENVISION_TOKEN)
+envision_client.on_request = lambda method, seconds, failed: upstream_seconds.observe(
+    seconds, 'envision', method, 'error' if failed else 'ok')
+
+def error_response(message, status_code=200):
+    # Status 200 matches the Flask routes, which report upstream errors in the body
+    return JSONResponse({"error": message}, status_code=status_code)
+
+async def fetch_envision_table(path):
+    import pandas as pd
+    response = await envision_client.get(path)
+    response.raise_for_status()
+    # CSV parsing is CPU-bound, keep it off the event loop
+    return await asyncio.to_thread(lambda: ColumnarTable.from_frame(pd.read_csv(StringIO(response.text))))
+
+async def stream_envision_dataset(path, stream_format):
+    """Relay an Envision table as NDJSON or CSV while it downloads, without buffering it."""
+    response = await envision_client.get(path, stream=True)
+    try:
+        response.raise_for_status()
+    except Exception:
+        await response.aclose()
+        raise
+
+    async def generate():
+        try:
+            if stream_format == 'csv':
+                async for chunk in response.aiter_bytes():
+                    yield chunk
+            else:
+                parser = CsvRecordParser()
+                async for text in response.aiter_text():
+                    records = parser.feed(text)
+                    if records:
+                        yield ''.join(iter_ndjson(records))
+                yield ''.join(iter_ndjson(parser.close()))
+        finally:
+            await response.aclose()
+
+    media_type = 'text/csv' if stream_format == 'csv' else 'application/x-ndjson'
+    return StreamingResponse(generate(), media_type=media_type)
+
+# Async version of /envision-dataset, same parameters and responses as the Flask route
+async def envision_dataset(request):
+    args = request.query_params
+    rid = args.get('rid')
+    row_limit = args.get('rowLimit')
+    stream_format = args.get('format')
+    try:
+        query = parse_query(args)
+    except ValueError as e:
+        return error_response(str(e), 400)
+    if stream_format not in (None, 'ndjson', 'csv'):
+        return error_response(f"Unsupported format: {stream_format}", 400)
+    if stream_format is not None and query is not None:
+        return error_response("Streaming formats do not support offset, limit, columns, filter or sort", 400)
+
+    path = f"/api/v2/datasets/{rid}/readTable?format=CSV&rowLimit={row_limit}"
+
+    try:
+        if stream_format is not None:
+            return await stream_envision_dataset(path, stream_format)
+
+        table = await envision_cache.get_or_load_async((rid, row_limit), lambda: fetch_envision_table(path))
+
+        if prefers_arrow(request.headers.get('accept')):
+            try:
+                body = await asyncio.to_thread(table.to_arrow_ipc, query)
+            except ValueError as e:
+                return error_response(str(e), 400)
+            return Response(body, media_type=ARROW_STREAM_TYPE, headers={'Vary': 'Accept'})
+
+        if query is not None:
+            try:
+                page = await asyncio.to_thread(table.query, **query)
+            except ValueError as e:
+                return error_response(str(e), 400)
+            return JSONResponse(page, headers={'Vary': 'Accept'})
+
+        body = await asyncio.to_thread(lambda: json.dumps(table.to_records()))
+        return Response(body, media_type='application/json', headers={'Vary': 'Accept'})
+
+    except CircuitOpenError as e:
+        return error_response(str(e), 503)
+    except Exception as e:
+        return error_response(str(e))
+
+# Async version of /predict_ticket_assignment
+async def predict_ticket_assignment(request):
+    deployment_rid = "placeholder"
+    path = f"/foundry-ml-live/api/inference/transform/{deployment_rid}/v2"
+
+    # A malformed body is the caller's error, as in the Flask route
+    try:
+        data = await request.json()
+    except ValueError as e:
+        return error_response(f"Invalid JSON body: {e}", 400)
+
+    try:
+        response = await envision_client.post(path, json=data)
+        response.raise_for_status()
+        return JSONResponse(response.json())
+
+    except CircuitOpenError as e:
+        return error_response(str(e), 503)
+    except Exception as e:
+        return error_response(str(e))
+
+async def envision_client_stats(request):
+    return JSONResponse(envision_client.stats())
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await envision_client.aclose()
+
+def instrumented_route(path, endpoint, methods):
+    """A route timed and counted in /metrics like the Flask routes it replaces."""
+    return Route(path, request_metrics.wrap_async(path, endpoint), methods=methods)
+
+application = Starlette(
+    routes=[
+        instrumented_route('/envision-dataset', envision_dataset, ['GET']),
+        instrumented_route('/predict_ticket_assignment', predict_ticket_assignment, ['POST']),
+        instrumented_route('/envision-client-stats', envision_client_stats, ['GET']),
+        # Everything else, including model inference, runs in the Flask app on a thread pool
+        Mount('/', WSGIMiddleware(flask_app, workers=int(os.getenv("ASGI_WSGI_THREADS", "10")))),
+    ],
+    # Same open CORS policy flask_cors applies to the Flask routes
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan,
+)
@@ -0,0 +1,76 @@
+"""
+Dataset response formats: JSON records vs Arrow IPC
+
+Builds the retention dataset as the dataset routes hold it (a ColumnarTable),
+repeated to several sizes, and serializes it both ways. Reports the encode
+time of each body and its size, raw and gzip-compressed as it would be sent
+with Accept-Encoding: gzip.
+
+Usage:
+    python benchmarks/dataset_formats.py --scales 1,10,100 --runs 5
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+FLASK_API_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, FLASK_API_DIR)
+
+def load_table(scale):
+    import pandas as pd
+    from columnar import ColumnarTable
+
+    df = pd.read_csv(os.path.join(FLASK_API_DIR, 'models/airforce_retention', 'airforce_retention_data.csv'))
+    return ColumnarTable.from_frame(pd.concat([df] * scale, ignore_index=True))
+
+def median_seconds(fn, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        body = fn()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)), body
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare JSON and Arrow IPC dataset responses')
+    parser.add_argument('--scales', default='1,10,100', help='Dataset sizes, as multiples of the retention CSV')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    from app import dump_json_body
+    from columnar import ColumnarTable
+
+    results = {}
+    for scale in (int(s) for s in args.scales.split(',')):
+        table = load_table(scale)
+        formats = {
+            'json': lambda: dump_json_body(table.to_records()).encode('utf-8'),
+            # A fresh table each run, so the cached full-table body is not reused
+            'arrow': lambda: ColumnarTable(table.columns).to_arrow_ipc(),
+        }
+        for name, encode in formats.items():
+            seconds, body = median_seconds(encode, args.runs)
+            results[f'{name}_x{scale}'] = {
+                'rows': table.n_rows,
+                'encode_ms': round(seconds * 1000.0, 2),
+                'bytes': len(body),
+                'gzip_bytes': len(gzip.compress(body, compresslevel=6)),
+            }
+
+    print(f"{'format':<14}{'rows':>10}{'encode ms':>12}{'bytes':>14}{'gzip bytes':>14}")
+    for name, r in results.items():
+        print(f"{name:<14}{r['rows']:>10}{r['encode_ms']:>12}{r['bytes']:>14,}{r['gzip_bytes']:>14,}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'settings': vars(args), 'results': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Dataset loading: CSV re-read vs the partitioned Parquet store
+
+Grows the retention dataset to several multiples of its size (rows sampled
+with replacement, salaries jittered so the data does not compress
+unrealistically well), writes it both as one CSV and as a store of daily
+batches (retention_store.py), and times:
+
+    csv               pd.read_csv of the whole file, as the API and training script did
+    store             every column of every partition
+    store_columns     three columns only (the rest are never decoded)
+    store_latest      the most recent partition only, e.g. the newest batch for incremental training
+    ingest_batch      appending one daily batch
+
+Usage:
+    python benchmarks/dataset_store.py --scales 10,100 --batches 30 --runs 5
+"""
+
+import argparse
+import datetime
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+FLASK_API_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, FLASK_API_DIR)
+
+def grow(df, scale, seed):
+    rng = np.random.default_rng(seed)
+    grown = df.iloc[rng.integers(0, len(df), len(df) * scale)].reset_index(drop=True)
+    grown['salary'] = grown['salary'] + rng.integers(-1000, 1000, len(grown))
+    return grown
+
+def median_ms(fn, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return round(float(np.median(timings)) * 1000.0, 2)
+
+def directory_bytes(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def run_scale(df, scale, args, workdir):
+    import pandas as pd
+    from retention_store import RetentionStore
+
+    data = grow(df, scale, args.seed)
+    csv_path = os.path.join(workdir, f'retention_x{scale}.csv')
+    data.to_csv(csv_path, index=False)
+
+    store = RetentionStore(os.path.join(workdir, f'store_x{scale}'))
+    ingest_seconds = []
+    for day, batch in enumerate(np.array_split(data, args.batches)):
+        start = time.perf_counter()
+        store.append(batch, datetime.date(2024, 1, 1) + datetime.timedelta(days=day))
+        ingest_seconds.append(time.perf_counter() - start)
+    latest = store.partitions()[-1]
+
+    return {
+        'rows': len(data),
+        'csv_bytes': os.path.getsize(csv_path),
+        'store_bytes': directory_bytes(store.root),
+        'csv_ms': median_ms(lambda: pd.read_csv(csv_path), args.runs),
+        'store_ms': median_ms(lambda: store.read_frame(), args.runs),
+        'store_columns_ms': median_ms(lambda: store.read_frame(['salary', 'years_of_service', 'retained']), args.runs),
+        'store_latest_ms': median_ms(lambda: store.read_frame(partitions=[latest]), args.runs),
+        'ingest_batch_ms': round(float(np.median(ingest_seconds)) * 1000.0, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare CSV re-reads with the partitioned retention store')
+    parser.add_argument('--scales', default='1,10,100', help='Dataset sizes, as multiples of the retention CSV')
+    parser.add_argument('--batches', type=int, default=30, help='Daily batches the store is built from')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+    warnings.simplefilter('ignore')
+
+    import pandas as pd
+
+    df = pd.read_csv(os.path.join(FLASK_API_DIR, 'models/airforce_retention', 'airforce_retention_data.csv'))
+    workdir = tempfile.mkdtemp(prefix='retention_store_bench_')
+    try:
+        results = {f'x{scale}': run_scale(df, scale, args, workdir) for scale in (int(s) for s in args.scales.split(','))}
+    finally:
+        shutil.rmtree(workdir)
+
+    print(f"{'scale':<7}{'rows':>10}{'csv MB':>9}{'store MB':>10}{'csv ms':>10}{'store ms':>10}"
+          f"{'3 cols ms':>11}{'latest ms':>11}{'ingest ms':>11}")
+    for scale, r in results.items():
+        print(f"{scale:<7}{r['rows']:>10}{r['csv_bytes'] / 1e6:>9.2f}{r['store_bytes'] / 1e6:>10.2f}{r['csv_ms']:>10}"
+              f"{r['store_ms']:>10}{r['store_columns_ms']:>11}{r['store_latest_ms']:>11}{r['ingest_batch_ms']:>11}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'settings': vars(args), 'results': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Inference latency by backend: sklearn vs NumPy vs ONNX
+
+Fits each model the retention training script can select on the retention
+dataset and scores it with every backend the API can use for it:
+
+    sklearn  the estimator's own predict_proba (SklearnScorer)
+    numpy    LinearScorer for logistic regression, FlatTreeEnsemble for tree ensembles
+    onnx     the graph export_onnx compiles, run by onnxruntime
+
+For each it reports single-row latency (what one /predict-retention call
+pays), batch throughput, and the largest deviation from sklearn's output.
+
+Usage:
+    python benchmarks/inference_backends.py --calls 2000 --batch 1000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+FLASK_API_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, FLASK_API_DIR)
+
+def load_data():
+    import pandas as pd
+    from retention_features import RetentionFeatureTransformer
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+    df = pd.read_csv(os.path.join(FLASK_API_DIR, 'models/airforce_retention', 'airforce_retention_data.csv'))
+    encoders = {col: LabelEncoder().fit(df[col]) for col in ('gender', 'marital_status', 'grade_rank')}
+    feature_columns = ['age', 'gender_encoded', 'marital_status_encoded', 'num_dependents', 'rank_level',
+                       'salary', 'years_of_service', 'num_prior_reenlistments', 'bonuses_received']
+    transformer = RetentionFeatureTransformer(encoders, None, feature_columns, requires_scaling=False)
+    X, valid, _ = transformer.encode_batch({col: df[col].tolist() for col in df.columns}, len(df))
+    # encode_batch returns only the rows that passed validation
+    return X, df['retained'].astype(int).to_numpy()[valid], StandardScaler().fit(X)
+
+def build_backends(name, model, scaler):
+    from linear_scorer import SklearnScorer, affine_from_scaler, build_scorer
+    from mmap_artifacts import FlatTreeEnsemble
+    from onnx_backend import OnnxScorer, export_onnx
+
+    scale, offset = affine_from_scaler(scaler, scaler.n_features_in_) if scaler is not None else (None, None)
+    backends = {'sklearn': SklearnScorer(model, scale, offset)}
+    if name == 'logistic_regression':
+        backends['numpy'] = build_scorer(model, scale, offset)
+    else:
+        backends['numpy'] = FlatTreeEnsemble.from_estimator(model)
+    try:
+        backends['onnx'] = OnnxScorer(export_onnx(model, model.n_features_in_, scaler), model.classes_)
+    except ImportError as e:
+        print(f"Skipping onnx: {e}")
+    return backends
+
+def time_single_rows(scorer, X, calls):
+    timings = []
+    for i in range(calls):
+        row = X[i % len(X)].reshape(1, -1)
+        start = time.perf_counter()
+        scorer.predict_proba(row)
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1e6
+    return {'p50_us': round(float(np.percentile(timings, 50)), 1), 'p99_us': round(float(np.percentile(timings, 99)), 1)}
+
+def time_batch(scorer, X, repeats):
+    best = min(_elapsed(scorer, X) for _ in range(repeats))
+    return {'rows_per_s': round(len(X) / best)}
+
+def _elapsed(scorer, X):
+    start = time.perf_counter()
+    scorer.predict_proba(X)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare sklearn, NumPy and ONNX inference latency')
+    parser.add_argument('--calls', type=int, default=2000, help='Single-row calls per backend')
+    parser.add_argument('--batch', type=int, default=1000, help='Rows per batch call')
+    parser.add_argument('--repeats', type=int, default=20, help='Batch calls per backend, the fastest is reported')
+    parser.add_argument('--trees', type=int, default=100, help='Trees in the random forest and boosting models')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+
+    warnings.simplefilter('ignore', UserWarning)
+    X, y, scaler = load_data()
+    batch = X[np.random.default_rng(0).integers(0, len(X), size=args.batch)]
+    models = {
+        # Same settings as the training script's candidates
+        'logistic_regression': (LogisticRegression(random_state=42, max_iter=1000).fit(scaler.transform(X), y), scaler),
+        'random_forest': (RandomForestClassifier(n_estimators=args.trees, max_depth=10, random_state=42).fit(X, y), None),
+        'gradient_boosting': (GradientBoostingClassifier(n_estimators=args.trees, max_depth=5, random_state=42).fit(X, y), None),
+    }
+
+    results = {}
+    for name, (model, model_scaler) in models.items():
+        backends = build_backends(name, model, model_scaler)
+        reference = backends['sklearn'].predict_proba(batch)
+        results[name] = {}
+        for backend, scorer in backends.items():
+            scorer.predict_proba(batch[:1])  # warm up
+            results[name][backend] = dict(
+                time_single_rows(scorer, X, args.calls),
+                **time_batch(scorer, batch, args.repeats),
+                max_deviation=float(np.max(np.abs(scorer.predict_proba(batch) - reference)))
+            )
+
+    print(f"{'model':<22}{'backend':<10}{'p50 (us)':>10}{'p99 (us)':>10}{'rows/s':>12}{'max dev':>10}   (single row; batch of {args.batch})")
+    for name, backends in results.items():
+        for backend, r in backends.items():
+            print(f"{name:<22}{backend:<10}{r['p50_us']:>10}{r['p99_us']:>10}{r['rows_per_s']:>12}{r['max_deviation']:>10.1e}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'settings': vars(args), 'results': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
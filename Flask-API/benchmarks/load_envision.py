@@ -0,0 +1,130 @@
+"""
+Load test: sync (gunicorn) vs async (uvicorn) serving of /envision-dataset
+
+Starts the mock Envision upstream with a fixed latency, then runs the same
+burst of concurrent requests against the Flask app under gunicorn sync
+workers and against asgi.py under uvicorn, with the same worker count.
+Every request uses a distinct rid so the dataset cache cannot coalesce them.
+
+Usage:
+    python benchmarks/load_envision.py --workers 2 --concurrency 200 --requests 1000 --latency-ms 200
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import numpy as np
+
+FLASK_API_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def wait_until_up(process, url, name):
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{name} did not start")
+
+def start_upstream(port, latency_ms):
+    # Separate process so the mock does not compete with the load generator for the GIL
+    command = [sys.executable, 'mock_envision.py', '--port', str(port), '--latency-ms', str(latency_ms)]
+    process = subprocess.Popen(command, cwd=FLASK_API_DIR, stdout=subprocess.DEVNULL)
+    return wait_until_up(process, f'http://127.0.0.1:{port}/', 'mock Envision')
+
+def start_server(kind, port, workers, upstream):
+    env = dict(os.environ, ENVISION_HOSTNAME=upstream, ENVISION_READ_TIMEOUT='60', ENVISION_RETRIES='0')
+    if kind == 'sync':
+        command = ['gunicorn', '-w', str(workers), '--timeout', '120', '-b', f'127.0.0.1:{port}', 'app:app']
+    else:
+        command = ['uvicorn', 'asgi:application', '--workers', str(workers), '--port', str(port), '--log-level', 'warning']
+    process = subprocess.Popen(command, cwd=FLASK_API_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return wait_until_up(process, f'http://127.0.0.1:{port}/', f'{kind} server')
+
+async def run_load(base_url, total, concurrency, row_limit):
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+        async def one(i):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(f'/envision-dataset?rid=load-{i}&rowLimit={row_limit}')
+                    ok = response.status_code == 200 and isinstance(response.json(), list)
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append(time.perf_counter() - start)
+                errors += not ok
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies) * 1000.0
+    return {
+        'requests': total,
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(total / elapsed, 1),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 1),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare sync and async serving of the Envision routes')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--latency-ms', type=float, default=200.0, help='Upstream latency of the mock Envision server')
+    parser.add_argument('--row-limit', type=int, default=100)
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    upstream_port = free_port()
+    upstream = start_upstream(upstream_port, args.latency_ms)
+    upstream_url = f'http://127.0.0.1:{upstream_port}'
+    results = {}
+    try:
+        for kind in ('sync', 'async'):
+            port = free_port()
+            process = start_server(kind, port, args.workers, upstream_url)
+            try:
+                results[kind] = asyncio.run(
+                    run_load(f'http://127.0.0.1:{port}', args.requests, args.concurrency, args.row_limit)
+                )
+            finally:
+                process.terminate()
+                process.wait()
+    finally:
+        upstream.terminate()
+        upstream.wait()
+
+    print(f"{args.workers} workers, {args.concurrency} concurrent clients, {args.latency_ms:.0f} ms upstream latency")
+    print(f"{'path':<8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for kind, r in results.items():
+        print(f"{kind:<8}{r['requests_per_second']:>10}{r['p50_ms']:>10}{r['p99_ms']:>10}{r['errors']:>8}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'settings': vars(args), 'results': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Startup benchmark: lazy vs eager model loading
+
+Each run is a fresh interpreter, as a new gunicorn worker would be. It
+times importing app.py, the first request to a route that needs no model,
+and the first prediction from each model. "eager" sets MODEL_WARMUP=all,
+which loads every artifact at import as the app did before the registry.
+
+Usage:
+    python benchmarks/startup.py --runs 5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+FLASK_API_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Runs inside the child interpreter and prints its timings as JSON
+PROBE = r'''
+import json, time, warnings
+warnings.simplefilter('ignore')
+start = time.perf_counter()
+import app
+timings = {'import_ms': (time.perf_counter() - start) * 1000.0}
+client = app.app.test_client()
+requests = [
+    ('first_index_ms', 'GET', '/', None),
+    ('first_iris_ms', 'POST', '/predict-iris', [1.4, 0.2]),
+    ('first_house_ms', 'POST', '/predict-house', [3, 2, 5000, 0]),
+    ('first_retention_ms', 'POST', '/predict-retention', {
+        'age': 28, 'gender': 'Male', 'marital_status': 'Married', 'num_dependents': 2,
+        'grade_rank': 'E-6 (TSgt)', 'salary': 47000, 'years_of_service': 10,
+        'num_prior_reenlistments': 2, 'bonuses_received': 10000}),
+]
+for key, method, path, body in requests:
+    start = time.perf_counter()
+    response = client.open(path, method=method, json=body)
+    assert response.status_code == 200, (path, response.status_code)
+    timings[key] = (time.perf_counter() - start) * 1000.0
+print(json.dumps(timings))
+'''
+
+def run_once(warmup):
+    env = dict(os.environ, MODEL_WARMUP=warmup)
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=FLASK_API_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare cold start with lazy and eager model loading')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    results = {}
+    for mode, warmup in (('lazy', ''), ('eager', 'all')):
+        runs = [run_once(warmup) for _ in range(args.runs)]
+        results[mode] = {key: round(float(np.median([r[key] for r in runs])), 1) for key in runs[0]}
+
+    keys = list(results['lazy'])
+    print(f"median of {args.runs} cold starts, ms")
+    print(f"{'':<22}{'lazy':>10}{'eager':>10}")
+    for key in keys:
+        print(f"{key:<22}{results['lazy'][key]:>10}{results['eager'][key]:>10}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'settings': vars(args), 'results': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
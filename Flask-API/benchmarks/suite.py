@@ -0,0 +1,368 @@
+"""
+Benchmark suite for the serving paths, checked against a stored baseline
+
+Micro-benchmarks time each piece of the serving path on its own, in process
+and with the prediction cache off:
+
+    predict_retention            encode and score one airman, as /predict-retention does
+    predict_retention_batch      encode and score --batch-size airmen, as /predict-retention-batch does
+    predict_house, predict_iris  parse and score one row
+    serialize_retention_dataset  the JSON body of /local-retention-dataset, from the parsed table
+    load_<model>                 read, build and canary-check each model's artifacts
+
+The macro load test sends a mix of prediction, dataset and Envision requests
+from --concurrency threads, through the Flask test client or, with --server,
+to gunicorn workers. The mock Envision upstream (mock_envision.py) serves the
+Envision calls.
+
+Each benchmark runs --repeats times and every metric is reported as the
+median over the repeats, so one slow run (a noisy neighbour, a GC pause)
+does not move the result; the value of every run is kept as well. Results
+are written as JSON with --json, together with the run parameters and the
+host. With --baseline, every p50 latency and throughput is compared with the
+stored run, and the suite exits with status 1 when any of them is worse by
+more than --threshold (a fraction) and its runs are clearly apart from the
+baseline's: the interquartile ranges of the two sets of runs do not overlap,
+over at least MIN_GATED_REPEATS runs each. A bigger change whose runs overlap
+is reported as noise. p99 latencies are reported but not gated, as they are
+too noisy on shared machines. The comparison only runs when the baseline was
+recorded with the same run parameters (RUN_PARAMETERS); otherwise the suite
+exits with status 2.
+
+Timings depend on the machine, so no baseline is kept in the repository;
+record one on the machine that will run the comparison first.
+
+Usage:
+    python benchmarks/suite.py --save-baseline benchmarks/baseline.json
+    python benchmarks/suite.py --baseline benchmarks/baseline.json --json results.json
+    python benchmarks/suite.py --only micro --threshold 0.1
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+FLASK_API_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, FLASK_API_DIR)
+
+from load_envision import free_port, start_server, start_upstream
+
+AIRMAN = {
+    'age': 28, 'gender': 'Male', 'marital_status': 'Married', 'num_dependents': 2, 'grade_rank': 'E-6 (TSgt)',
+    'salary': 47000, 'years_of_service': 10, 'num_prior_reenlistments': 2, 'bonuses_received': 10000
+}
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the Flask API serving paths against a baseline')
+    parser.add_argument('--only', choices=('micro', 'macro'), help='Run one part of the suite')
+    parser.add_argument('--calls', type=int, default=2000, help='Timed calls per single-row micro-benchmark')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--batch-calls', type=int, default=50)
+    parser.add_argument('--load-runs', type=int, default=5, help='Times each model is loaded')
+    parser.add_argument('--requests', type=int, default=2000, help='Requests in the macro load test')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--server', action='store_true', help='Load test gunicorn instead of the Flask test client')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers with --server')
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='Latency of the mock Envision upstream')
+    parser.add_argument('--repeats', type=int, default=5, help='Runs of each benchmark; metrics are medians over the runs')
+    parser.add_argument('--json', help='Write the results to this file')
+    parser.add_argument('--baseline', help='Compare with this stored run')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Largest allowed regression, e.g. 0.25 = 25%%')
+    parser.add_argument('--save-baseline', help='Write the results to this file as the new baseline')
+    return parser.parse_args(argv)
+
+# Fewer runs than this give too rough a spread to tell a regression from noise; they are reported, not gated
+MIN_GATED_REPEATS = 3
+
+# Settings that change what is measured; a baseline is only compared with a run that used the same ones
+RUN_PARAMETERS = ('calls', 'batch_size', 'batch_calls', 'load_runs', 'requests', 'concurrency', 'workers', 'latency_ms', 'repeats')
+
+def environment():
+    import pandas
+    import scipy
+    import sklearn
+    return {
+        'hostname': platform.node(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pandas.__version__,
+        'scipy': scipy.__version__,
+        'sklearn': sklearn.__version__,
+    }
+
+def summarize(timings, items=1, unit='calls'):
+    """p50/p99 of per-call seconds, and throughput in calls (or rows) per second."""
+    timings = np.asarray(timings)
+    return {
+        'p50_ms': round(float(np.percentile(timings, 50)) * 1000.0, 4),
+        'p99_ms': round(float(np.percentile(timings, 99)) * 1000.0, 4),
+        f'{unit}_per_second': round(len(timings) * items / float(timings.sum()), 1),
+    }
+
+def median_of_runs(runs):
+    """
+    Combine the results of repeated runs: each metric becomes its median over the runs.
+
+    The value of every run is kept for the gated metrics, e.g. as p50_ms_runs, for the baseline check.
+    """
+    combined = {}
+    for name in runs[0]:
+        combined[name] = {
+            metric: round(float(np.median([run[name][metric] for run in runs])), 4)
+            for metric in runs[0][name]
+        }
+        for metric, _, _ in gated_metrics(runs[0][name]):
+            combined[name][f'{metric}_runs'] = [run[name][metric] for run in runs]
+    return combined
+
+def time_calls(fn, calls, warmup=None):
+    for _ in range(min(calls, 100) if warmup is None else warmup):
+        fn()
+    timings = np.empty(calls)
+    for i in range(calls):
+        start = time.perf_counter()
+        fn()
+        timings[i] = time.perf_counter() - start
+    return timings
+
+# Micro-benchmarks
+
+def run_micro(app, args):
+    from linear_scorer import as_feature_row
+
+    registry = app.model_registry
+    retention, iris, house = registry.get('retention'), registry.get('iris'), registry.get('house')
+    results = {}
+
+    def predict_retention():
+        features = retention['transformer'].encode(AIRMAN)
+        retention['batcher'].submit(features)
+
+    results['predict_retention'] = summarize(time_calls(predict_retention, args.calls))
+
+    batch = app.parse_retention_batch([AIRMAN] * args.batch_size)
+
+    def predict_retention_batch():
+        columns, n_rows, _ = batch
+        features, _, _ = retention['transformer'].encode_batch(columns, n_rows)
+        retention['scorer'].predict_proba(features)
+
+    results['predict_retention_batch'] = summarize(
+        time_calls(predict_retention_batch, args.batch_calls, warmup=2), args.batch_size, 'rows')
+
+    for name, model, row in (('predict_iris', iris, [1.4, 0.2]), ('predict_house', house, [3, 2, 5000, 0])):
+        def predict(model=model, row=row):
+            features = as_feature_row(row, getattr(model['model'], 'feature_names_in_', None), model['scorer'].n_features_in_)
+            model['batcher'].submit(features[0])
+        results[name] = summarize(time_calls(predict, args.calls))
+
+    table = app.retention_data_response.data()
+    results['serialize_retention_dataset'] = summarize(
+        time_calls(lambda: app.dump_json_body(table.to_records()), 20, warmup=2), table.n_rows, 'rows')
+
+    for name in registry.names():
+        spec = registry.spec(name)
+        results[f'load_{name}'] = summarize(time_calls(spec.load, args.load_runs, warmup=1))
+    return results
+
+# Macro load test
+
+def workload(i):
+    """The i-th request of the mixed workload: (label, method, path, JSON body)."""
+    kind = i % 10
+    if kind < 4:
+        return 'predict_retention', 'POST', '/predict-retention', dict(AIRMAN, age=20 + i % 30)
+    if kind < 6:
+        return 'predict_iris', 'POST', '/predict-iris', [1.0 + (i % 50) / 10, 0.1 + (i % 25) / 10]
+    if kind < 8:
+        return 'predict_house', 'POST', '/predict-house', [1 + i % 5, 1 + i % 3, 4000 + i % 100 * 10, i % 2]
+    if kind == 8:
+        return 'query_retention_dataset', 'GET', '/local-retention-dataset?limit=50&sort=-salary', None
+    # A new rid every time, so each request goes upstream
+    return 'envision_dataset', 'GET', f'/envision-dataset?rid=bench-{i}&rowLimit=100', None
+
+def run_macro(args, upstream_url):
+    if args.server:
+        import httpx
+
+        port = free_port()
+        server = start_server('sync', port, args.workers, upstream_url)
+        local = threading.local()
+
+        def send(method, path, body):
+            # One keep-alive client per thread
+            if not hasattr(local, 'client'):
+                local.client = httpx.Client(base_url=f'http://127.0.0.1:{port}', timeout=60)
+            return local.client.request(method, path, json=body).status_code
+    else:
+        import app as flask_app
+        server = None
+        test_client = flask_app.app.test_client()
+
+        def send(method, path, body):
+            return test_client.open(path, method=method, json=body).status_code
+
+    def one(i):
+        label, method, path, body = workload(i)
+        start = time.perf_counter()
+        try:
+            ok = send(method, path, body) == 200
+        except Exception:
+            ok = False
+        return label, time.perf_counter() - start, ok
+
+    try:
+        for i in range(min(args.requests, 50)):  # warm up models and connections, on rids the run does not use
+            one(args.requests + i)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            outcomes = list(pool.map(one, range(args.requests)))
+        elapsed = time.perf_counter() - start
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    # Test client and gunicorn runs are not comparable, so they are stored under different names
+    prefix = 'server' if args.server else 'load'
+    results = {f'{prefix}_total': {
+        'requests_per_second': round(len(outcomes) / elapsed, 1),
+        'p50_ms': round(float(np.percentile([t for _, t, _ in outcomes], 50)) * 1000.0, 3),
+        'p99_ms': round(float(np.percentile([t for _, t, _ in outcomes], 99)) * 1000.0, 3),
+        'errors': sum(not ok for _, _, ok in outcomes),
+    }}
+    for label in sorted({label for label, _, _ in outcomes}):
+        timings = [t for l, t, _ in outcomes if l == label]
+        results[f'{prefix}_{label}'] = {
+            'p50_ms': round(float(np.percentile(timings, 50)) * 1000.0, 3),
+            'p99_ms': round(float(np.percentile(timings, 99)) * 1000.0, 3),
+            'errors': sum(not ok for l, _, ok in outcomes if l == label),
+        }
+    return results
+
+# Baseline comparison
+
+def gated_metrics(result):
+    """(metric, value, higher_is_better) for the metrics a baseline check gates on."""
+    for metric, value in result.items():
+        if metric == 'p50_ms':
+            yield metric, value, False
+        elif metric.endswith('_per_second'):
+            yield metric, value, True
+
+def mismatched_parameters(settings, baseline):
+    """Run parameters that differ from the baseline's, as (name, baseline value, current value)."""
+    recorded = baseline.get('settings', {})
+    return [(name, recorded.get(name), settings[name]) for name in RUN_PARAMETERS if recorded.get(name) != settings[name]]
+
+def apart(before_runs, runs, higher_is_better):
+    """
+    True when runs are worse than before_runs beyond their spread: the interquartile ranges do not overlap.
+
+    None when either side has fewer than MIN_GATED_REPEATS runs, too few to tell.
+    """
+    if min(len(before_runs or ()), len(runs or ())) < MIN_GATED_REPEATS:
+        return None
+    before_low, before_high = np.percentile(before_runs, [25, 75])
+    low, high = np.percentile(runs, [25, 75])
+    return high < before_low if higher_is_better else low > before_high
+
+def compare(results, baseline, threshold):
+    """
+    Returns:
+        (rows, regressions) where rows are (benchmark, metric, baseline, current, change, status) for every
+        gated metric present in both runs; change is the fractional slowdown (positive = worse) and status
+        'REGRESSION', 'noise' (beyond the threshold, runs overlap), 'too few runs' or ''
+    """
+    rows, regressions = [], []
+    for name, result in results.items():
+        previous = baseline['results'].get(name)
+        if previous is None:
+            continue
+        for metric, value, higher_is_better in gated_metrics(result):
+            before = previous.get(metric)
+            if not before:
+                continue
+            change = (before - value) / before if higher_is_better else (value - before) / before
+            status = ''
+            if change > threshold:
+                separated = apart(previous.get(f'{metric}_runs'), result.get(f'{metric}_runs'), higher_is_better)
+                status = {True: 'REGRESSION', False: 'noise', None: 'too few runs'}[separated]
+            rows.append((name, metric, before, value, change, status))
+            if status == 'REGRESSION':
+                regressions.append(rows[-1])
+    return rows, regressions
+
+def main(argv=None):
+    args = parse_args(argv)
+    warnings.simplefilter('ignore')
+
+    # Every call is scored, not answered from the prediction cache
+    os.environ['PREDICTION_CACHE_SIZE'] = '0'
+    upstream_port = free_port()
+    upstream = start_upstream(upstream_port, args.latency_ms)
+    upstream_url = f'http://127.0.0.1:{upstream_port}'
+    os.environ.update(ENVISION_HOSTNAME=upstream_url, ENVISION_READ_TIMEOUT='60', ENVISION_RETRIES='0')
+
+    results = {}
+    try:
+        import app
+        if args.only != 'macro':
+            results.update(median_of_runs([run_micro(app, args) for _ in range(args.repeats)]))
+        if args.only != 'micro':
+            results.update(median_of_runs([run_macro(args, upstream_url) for _ in range(args.repeats)]))
+    finally:
+        upstream.terminate()
+        upstream.wait()
+
+    print(f"{'benchmark':<32}{'p50 ms':>12}{'p99 ms':>12}{'per second':>14}")
+    for name, r in results.items():
+        per_second = next((v for k, v in r.items() if k.endswith('_per_second')), '')
+        print(f"{name:<32}{r['p50_ms']:>12}{r['p99_ms']:>12}{per_second:>14}")
+
+    run = {'settings': vars(args), 'environment': environment(), 'results': results}
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(run, f, indent=2)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    mismatched = mismatched_parameters(run['settings'], baseline)
+    if mismatched:
+        print(f"\nNot compared: {args.baseline} was recorded with different run parameters")
+        for name, before, value in mismatched:
+            print(f"  --{name.replace('_', '-')}: baseline {before}, this run {value}")
+        print("Rerun with the baseline's parameters, or record a new baseline with --save-baseline")
+        return 2
+    recorded = baseline.get('environment', {})
+    host = {key: recorded.get(key) for key in ('hostname', 'platform', 'cpus')}
+    if host != {key: run['environment'][key] for key in host}:
+        print(f"\nWarning: the baseline was recorded on another host: {host}")
+    rows, regressions = compare(results, baseline, args.threshold)
+    print(f"\n{'benchmark':<32}{'metric':<20}{'baseline':>12}{'current':>12}{'change':>9}")
+    for name, metric, before, value, change, status in rows:
+        print(f"{name:<32}{metric:<20}{before:>12}{value:>12}{change:>+9.1%}{'  ' + status if status else ''}")
+    if regressions:
+        print(f"\n{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}, beyond the spread of the runs")
+        return 1
+    if any(status == 'too few runs' for *_, status in rows):
+        print(f"\nNot gated: fewer than {MIN_GATED_REPEATS} runs per benchmark; rerun both with --repeats {MIN_GATED_REPEATS} or more")
+    print(f"\nNo metric regressed by more than {args.threshold:.0%} beyond the spread of the runs")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
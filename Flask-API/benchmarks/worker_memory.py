@@ -0,0 +1,116 @@
+"""
+Memory per worker: pickled vs memory-mapped model artifacts
+
+Fits a random forest of the size the training script's grid search can
+produce, saves it both as a regular joblib pickle and with
+save_mmap_artifact, then starts N worker processes per format. Each worker
+loads the model independently (as gunicorn workers without --preload do)
+and scores a batch so every page is touched. RSS counts shared pages in
+every process; PSS splits them between the processes sharing them, so the
+sum of PSS is the real memory used.
+
+Usage:
+    python benchmarks/worker_memory.py --workers 4 --trees 300
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+FLASK_API_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, FLASK_API_DIR)
+
+LOADERS = {'pickle': 'joblib', 'mmap': 'joblib-mmap', 'none': None}
+
+def memory_kb(pid):
+    """Rss and Pss of a process in kB, from /proc (Linux only)."""
+    stats = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if key in ('Rss', 'Pss'):
+                stats[key.lower()] = int(rest.split()[0])
+    return stats
+
+def worker(loader, path, X, ready, done):
+    import model_registry
+    import sklearn.ensemble  # noqa: F401 -- same imports in every worker, so only the model differs
+
+    if loader is not None:
+        model, _ = model_registry.ARTIFACT_LOADERS[loader](path)
+        model.predict_proba(X)
+    ready.set()
+    done.wait()
+
+def measure(loader, path, X, workers):
+    context = multiprocessing.get_context('spawn')
+    done = context.Event()
+    processes = []
+    for _ in range(workers):
+        ready = context.Event()
+        process = context.Process(target=worker, args=(loader, path, X, ready, done))
+        process.start()
+        processes.append((process, ready))
+    for _, ready in processes:
+        ready.wait()
+    stats = [memory_kb(process.pid) for process, _ in processes]
+    done.set()
+    for process, _ in processes:
+        process.join()
+    return {
+        'rss_mb_per_worker': round(np.mean([s['rss'] for s in stats]) / 1024.0, 1),
+        'pss_mb_per_worker': round(np.mean([s['pss'] for s in stats]) / 1024.0, 1),
+        'pss_mb_total': round(sum(s['pss'] for s in stats) / 1024.0, 1),
+    }
+
+def build_model(trees, rows):
+    import pandas as pd
+    from sklearn.ensemble import RandomForestClassifier
+
+    df = pd.read_csv(os.path.join(FLASK_API_DIR, 'models/airforce_retention', 'airforce_retention_data.csv'))
+    X = df.select_dtypes('number').drop(columns=['retained'], errors='ignore').to_numpy(dtype=np.float64)
+    y = df['retained'].astype(int).to_numpy()
+    # Resample with jitter to get trees as deep as a larger training set would give
+    rng = np.random.default_rng(0)
+    index = rng.integers(0, len(X), size=rows)
+    X = X[index] * rng.normal(1.0, 0.05, size=(rows, X.shape[1]))
+    y = y[index]
+    return RandomForestClassifier(n_estimators=trees, random_state=42, n_jobs=-1).fit(X, y), X[:1000]
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare per-worker memory of pickled and memory-mapped models')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--trees', type=int, default=300)
+    parser.add_argument('--rows', type=int, default=20000, help='Training rows, controls tree depth')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    import joblib
+    from mmap_artifacts import save_mmap_artifact
+
+    model, X = build_model(args.trees, args.rows)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {'pickle': os.path.join(tmp, 'model.pkl'), 'mmap': os.path.join(tmp, 'model.mmap.joblib'), 'none': None}
+        joblib.dump(model, paths['pickle'])
+        save_mmap_artifact(model, paths['mmap'])
+        sizes = {fmt: round(os.path.getsize(path) / 2**20, 1) for fmt, path in paths.items() if path}
+        for fmt in ('none', 'pickle', 'mmap'):
+            results[fmt] = measure(LOADERS[fmt], paths[fmt], X, args.workers)
+
+    print(f"{args.trees} trees, artifact size: pickle {sizes['pickle']} MB, mmap {sizes['mmap']} MB, {args.workers} workers")
+    print(f"{'format':<10}{'RSS/worker':>12}{'PSS/worker':>12}{'PSS total':>12}   (MB; 'none' = no model loaded)")
+    for fmt, r in results.items():
+        print(f"{fmt:<10}{r['rss_mb_per_worker']:>12}{r['pss_mb_per_worker']:>12}{r['pss_mb_total']:>12}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'settings': vars(args), 'artifact_mb': sizes, 'results': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
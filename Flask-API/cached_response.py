@@ -0,0 +1,168 @@
+"""
+Cached, precompressed responses for files that rarely change
+
+The file is parsed once and serialized on the first full response; the parsed
+data, the JSON body and its gzip/brotli encodings are kept in memory until the
+file's mtime or size changes.
+CachedResponse does the same for any payload with an explicit cache key,
+e.g. results derived from a model version and a file.
+Responses carry a strong ETag and Last-Modified so a dashboard refresh
+gets a 304 without any parsing or serialization.
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is used when brotli is not installed
+    brotli = None
+
+class CachedResponse:
+    """
+    A JSON payload kept in memory with its compressed encodings, rebuilt only when its key changes.
+
+    Args:
+        dumps: Function serializing the payload to a JSON string
+        to_payload: Optional function turning the loaded data into the JSON-serializable payload
+    """
+
+    def __init__(self, dumps, to_payload=None):
+        self.dumps = dumps
+        self.to_payload = to_payload
+        self._lock = threading.Lock()
+        # (key, entry), replaced as one object so a reader never pairs one build's key with another's entry
+        self._current = (None, None)
+
+    def entry(self, key, load, last_modified=None):
+        """
+        Return the cache entry for key, calling load() to rebuild it if the key changed.
+
+        Args:
+            last_modified: Timestamp of the data for Last-Modified; the build time when omitted
+        """
+        current_key, entry = self._current
+        if key == current_key:
+            return entry
+        with self._lock:
+            current_key, entry = self._current
+            if key != current_key:
+                entry = self.build(load(), last_modified)
+                self._current = (key, entry)
+            return entry
+
+    def build(self, data, last_modified=None):
+        """Serialize and compress data into an entry for respond(), e.g. for callers keeping their own cache of entries."""
+        last_modified = time.time() if last_modified is None else last_modified
+        payload = data if self.to_payload is None else self.to_payload(data)
+        body = self.dumps(payload).encode('utf-8')
+        digest = hashlib.sha256(body).hexdigest()[:32]
+
+        # A strong ETag must differ per content-coding
+        bodies = {'identity': (body, f'"{digest}"')}
+        bodies['gzip'] = (gzip.compress(body, compresslevel=6, mtime=0), f'"{digest}-gzip"')
+        if brotli is not None:
+            bodies['br'] = (brotli.compress(body, quality=5), f'"{digest}-br"')
+
+        return {
+            'data': data,
+            'bodies': bodies,
+            'last_modified': datetime.fromtimestamp(int(last_modified), tz=timezone.utc),
+        }
+
+    def respond(self, request, entry):
+        """Build a 200 or 304 response for the incoming request from a cache entry."""
+        bodies = entry['bodies']
+
+        encoding = 'identity'
+        for candidate in ('br', 'gzip'):
+            if candidate in bodies and request.accept_encodings[candidate] > 0:
+                encoding = candidate
+                break
+        body, etag = bodies[encoding]
+
+        headers = {
+            'ETag': etag,
+            'Last-Modified': entry['last_modified'].strftime('%a, %d %b %Y %H:%M:%S GMT'),
+            'Cache-Control': 'no-cache',
+            'Vary': 'Accept-Encoding',
+        }
+
+        etags = [tag.strip('"') for _, tag in bodies.values()]
+        if request.if_none_match:
+            not_modified = any(request.if_none_match.contains(tag) for tag in etags)
+        else:
+            since = request.if_modified_since
+            not_modified = since is not None and entry['last_modified'] <= since
+        if not_modified:
+            return Response(status=304, headers=headers)
+
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        return Response(body, mimetype='application/json', headers=headers)
+
+class CachedFileResponse:
+    """
+    Serves a file-backed JSON payload from memory.
+
+    Args:
+        path: File whose mtime and size key the cache, or a function returning the path to serve,
+            checked on every request, e.g. to switch to another source once it exists
+        load: Function taking the path and returning the parsed data
+        dumps: Function serializing the payload to a JSON string
+        to_payload: Optional function turning the parsed data into the JSON-serializable payload
+        key: Optional function taking the path and returning (mtime_ns, size), for data that is not a single file,
+            e.g. a directory
+    """
+
+    def __init__(self, path, load, dumps, to_payload=None, key=None):
+        self.path = path
+        self.load = load
+        self._key = key
+        self._cache = CachedResponse(dumps, to_payload)
+        # The parsed data is cached on its own, so paged, filtered or Arrow responses never serialize the full body
+        self._lock = threading.Lock()
+        self._parsed_data = (None, None)  # ((path, key), data), replaced as one object
+
+    def current_path(self):
+        return self.path() if callable(self.path) else self.path
+
+    def key(self, path=None):
+        """(mtime_ns, size) of the file, which the cache is keyed on."""
+        path = self.current_path() if path is None else path
+        if self._key is not None:
+            return self._key(path)
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _parsed(self, path, key):
+        data_key, data = self._parsed_data
+        if (path, key) == data_key:
+            return data
+        with self._lock:
+            data_key, data = self._parsed_data
+            if (path, key) != data_key:
+                data = self.load(path)
+                self._parsed_data = ((path, key), data)
+            return data
+
+    def entry(self):
+        """Return the current cache entry, rebuilding it if the file changed."""
+        path = self.current_path()
+        key = self.key(path)
+        return self._cache.entry((path, key), lambda: self._parsed(path, key), key[0] / 1e9)
+
+    def data(self):
+        """The parsed data, for callers that need more than the full response; the JSON body is not built."""
+        path = self.current_path()
+        return self._parsed(path, self.key(path))
+
+    def response(self, request):
+        """Build a 200 or 304 response for the incoming request."""
+        return self._cache.respond(request, self.entry())
@@ -0,0 +1,239 @@
+"""
+In-memory columnar tables for dataset endpoints
+
+Keeps a dataset as one NumPy array per column so paging, column projection,
+filtering and sorting only touch the columns and rows a request needs.
+
+With pyarrow installed, tables can also be written as Arrow IPC streams:
+typed columns the browser reads with apache-arrow without parsing, with
+numeric columns handed to Arrow without a copy and repeated strings
+dictionary-encoded.
+"""
+
+import importlib.util
+import re
+
+import numpy as np
+
+QUERY_PARAMS = ('offset', 'limit', 'columns', 'filter', 'sort')
+
+ARROW_STREAM_TYPE = 'application/vnd.apache.arrow.stream'
+
+# Longest operators first so ">=" is not read as ">"
+FILTER_PATTERN = re.compile(r'^\s*([^<>=!]+?)\s*(>=|<=|!=|=|>|<)\s*(.*?)\s*$')
+FILTER_OPERATORS = {
+    '=': np.equal,
+    '!=': np.not_equal,
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '<': np.less,
+    '<=': np.less_equal,
+}
+
+def _to_python(values):
+    """Convert a column slice to JSON-ready Python values (NaN becomes None)."""
+    if values.dtype.kind == 'f':
+        return [None if v != v else v for v in values.tolist()]
+    if values.dtype.kind == 'O':
+        return [None if isinstance(v, float) and v != v else v for v in values.tolist()]
+    return values.tolist()
+
+def arrow_available():
+    """True when pyarrow is installed, without importing it."""
+    return importlib.util.find_spec('pyarrow') is not None
+
+def prefers_arrow(accept):
+    """True when an Accept header value ranks Arrow IPC above JSON and pyarrow is installed; JSON wins ties."""
+    if not accept or ARROW_STREAM_TYPE not in accept or not arrow_available():
+        return False
+    from werkzeug.datastructures import MIMEAccept
+    from werkzeug.http import parse_accept_header
+
+    return parse_accept_header(accept, MIMEAccept).best_match(['application/json', ARROW_STREAM_TYPE]) == ARROW_STREAM_TYPE
+
+def _to_arrow_array(values):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if values.dtype.kind in 'OU':
+        array = pa.array(values, from_pandas=True)
+        # Categories such as gender or grade_rank are sent once, with small integer codes per row
+        if pa.types.is_string(array.type) and len(array) and pc.count_distinct(array).as_py() * 2 <= len(array):
+            array = array.dictionary_encode()
+        return array
+    # from_pandas turns NaN into null, as to_records turns it into None
+    return pa.array(values, from_pandas=values.dtype.kind == 'f')
+
+def parse_query(args):
+    """
+    Read paging, projection, filter and sort options from request args.
+
+    Returns None when none of them were given, so callers can keep their plain response.
+    Raises ValueError on malformed options.
+    """
+    if not any(name in args for name in QUERY_PARAMS):
+        return None
+
+    try:
+        offset = int(args.get('offset', 0))
+        limit = int(args['limit']) if 'limit' in args else None
+    except ValueError:
+        raise ValueError("offset and limit must be integers") from None
+    if offset < 0 or (limit is not None and limit < 0):
+        raise ValueError("offset and limit must not be negative")
+
+    columns = [c.strip() for c in args['columns'].split(',') if c.strip()] if 'columns' in args else None
+
+    filters = []
+    for expression in args.getlist('filter'):
+        match = FILTER_PATTERN.match(expression)
+        if match is None:
+            raise ValueError(f"Invalid filter: {expression!r}")
+        filters.append(match.groups())
+
+    sort = []
+    for key in args.get('sort', '').split(','):
+        key = key.strip()
+        if key:
+            sort.append((key.lstrip('-'), key.startswith('-')))
+
+    return {'offset': offset, 'limit': limit, 'columns': columns, 'filters': filters, 'sort': sort}
+
+class ColumnarTable:
+    """
+    A dataset held as an ordered mapping of column name -> NumPy array.
+
+    Args:
+        columns: Dictionary of column name -> array, all of the same length
+    """
+
+    def __init__(self, columns):
+        self.columns = {name: np.asarray(values) for name, values in columns.items()}
+        self.n_rows = len(next(iter(self.columns.values()))) if self.columns else 0
+        self._arrow_ipc = None
+
+    @classmethod
+    def from_frame(cls, df):
+        """Build a table from a DataFrame without copying numeric columns."""
+        return cls({str(name): df[name].to_numpy() for name in df.columns})
+
+    def to_records(self, rows=None, columns=None):
+        """
+        Convert rows to a list of dicts, like DataFrame.to_dict(orient='records').
+
+        Args:
+            rows: Optional index array or slice selecting rows
+            columns: Optional list of column names to include
+        """
+        names = columns or list(self.columns)
+        selected = [_to_python(self.columns[name] if rows is None else self.columns[name][rows]) for name in names]
+        return [dict(zip(names, values)) for values in zip(*selected)]
+
+    def _check_column(self, name):
+        if name not in self.columns:
+            raise ValueError(f"Unknown column: {name}")
+        return self.columns[name]
+
+    def _filter_mask(self, name, op, raw):
+        column = self._check_column(name)
+        kind = column.dtype.kind
+        if kind == 'b':
+            if raw.lower() not in ('true', 'false'):
+                raise ValueError(f"Invalid value for {name}: {raw!r}")
+            value = raw.lower() == 'true'
+        elif kind in 'iuf':
+            try:
+                value = float(raw)
+            except ValueError:
+                raise ValueError(f"Invalid value for {name}: {raw!r}") from None
+        else:
+            value = raw
+            column = column.astype(str)
+        return FILTER_OPERATORS[op](column, value)
+
+    def _sort_key(self, name, descending):
+        column = self._check_column(name)
+        if column.dtype.kind not in 'biuf':
+            # Rank strings so every key is numeric and can be negated
+            _, column = np.unique(column.astype(str), return_inverse=True)
+        column = column.astype(np.float64)
+        return -column if descending else column
+
+    def select(self, offset=0, limit=None, columns=None, filters=(), sort=()):
+        """
+        Filter, sort and page the table without building any records.
+
+        Returns:
+            (rows, total) where rows indexes the requested page and total counts every matching row
+        """
+        if columns:
+            for name in columns:
+                self._check_column(name)
+
+        rows = np.arange(self.n_rows)
+        for name, op, raw in filters:
+            rows = rows[self._filter_mask(name, op, raw)[rows]]
+
+        if sort:
+            # lexsort treats the last key as primary
+            keys = [self._sort_key(name, descending)[rows] for name, descending in reversed(sort)]
+            rows = rows[np.lexsort(keys)]
+
+        total = len(rows)
+        page = rows[offset:] if limit is None else rows[offset:offset + limit]
+        return page, total
+
+    def query(self, offset=0, limit=None, columns=None, filters=(), sort=()):
+        """
+        Filter, sort and page the table.
+
+        Returns:
+            Dictionary with the total matching row count and the requested page of records
+        """
+        page, total = self.select(offset, limit, columns, filters, sort)
+        return {
+            'total': total,
+            'offset': offset,
+            'limit': limit,
+            'columns': columns or list(self.columns),
+            'rows': self.to_records(page, columns),
+        }
+
+    def to_arrow(self, rows=None, columns=None, metadata=None):
+        """
+        Convert rows to a pyarrow.Table; without rows, numeric columns are not copied.
+
+        Args:
+            metadata: Optional dictionary stored, as strings, in the schema metadata
+        """
+        import pyarrow as pa
+
+        names = columns or list(self.columns)
+        arrays = [_to_arrow_array(self.columns[name] if rows is None else self.columns[name][rows]) for name in names]
+        metadata = {str(k): str(v) for k, v in metadata.items() if v is not None} if metadata else None
+        return pa.Table.from_arrays(arrays, names=names, metadata=metadata)
+
+    def to_arrow_ipc(self, query=None):
+        """
+        Serialize the table, or the page a parse_query() query selects, as an Arrow IPC stream.
+
+        A page carries total, offset and limit (when given) in its schema metadata. The full table is serialized once.
+        """
+        import pyarrow as pa
+
+        if query is None:
+            if self._arrow_ipc is not None:
+                return self._arrow_ipc
+            table = self.to_arrow()
+        else:
+            rows, total = self.select(**query)
+            table = self.to_arrow(rows, query['columns'],
+                                  {'total': total, 'offset': query['offset'], 'limit': query['limit']})
+
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        body = sink.getvalue().to_pybytes()
+        if query is None:
+            self._arrow_ipc = body
+        return body
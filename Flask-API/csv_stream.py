@@ -0,0 +1,114 @@
+"""
+Streaming CSV helpers
+
+Turn an upstream CSV body into records or NDJSON lines as it arrives,
+holding only one row in memory at a time.
+"""
+
+import csv
+import io
+import json
+
+def parse_cell(value):
+    """Best-effort typing of a CSV cell, close to what pd.read_csv infers."""
+    if value == '':
+        return None
+    # int() and float() accept digit separators (1_000); pandas reads such a cell as text
+    if '_' in value:
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        number = float(value)
+    except ValueError:
+        pass
+    else:
+        # NaN/inf are not valid JSON
+        return number if number == number and abs(number) != float('inf') else None
+    if value in ('True', 'true', 'TRUE'):
+        return True
+    if value in ('False', 'false', 'FALSE'):
+        return False
+    return value
+
+def iter_csv_records(raw, encoding='utf-8'):
+    """
+    Yield one dict per CSV row from a binary file-like object.
+
+    Args:
+        raw: Binary stream, e.g. requests' response.raw with decode_content enabled
+        encoding: Text encoding of the body
+    """
+    reader = csv.reader(io.TextIOWrapper(raw, encoding=encoding, newline=''))
+    header = next(reader, None)
+    if header is None:
+        return
+    for row in reader:
+        if row:
+            yield dict(zip(header, map(parse_cell, row)))
+
+class CsvRecordParser:
+    """
+    Incremental CSV parser for text that arrives in arbitrary chunks, e.g. from an async body.
+
+    A record is only parsed once it has an even number of quote characters,
+    so quoted fields containing newlines are kept together.
+    """
+
+    def __init__(self):
+        self.header = None
+        self._partial = ''
+        self._record = []
+        self._quotes = 0
+
+    def _parse(self, text):
+        row = next(csv.reader([text]), [])
+        if not row:
+            return None
+        if self.header is None:
+            self.header = row
+            return None
+        return dict(zip(self.header, map(parse_cell, row)))
+
+    def _lines(self, lines):
+        for line in lines:
+            self._record.append(line)
+            self._quotes += line.count('"')
+            if self._quotes % 2 == 0:
+                record = self._parse(''.join(self._record))
+                self._record, self._quotes = [], 0
+                if record is not None:
+                    yield record
+
+    def feed(self, text):
+        """Parse a chunk of text, returning the records it completed."""
+        # Only \n ends a line (a \r before it stays with the record); str.splitlines would also split
+        # unquoted text on \x0b, \x0c, \x1c-\x1e, \x85, \u2028 and \u2029
+        lines = (self._partial + text).split('\n')
+        self._partial = lines.pop()
+        return list(self._lines(line + '\n' for line in lines))
+
+    def close(self):
+        """Parse whatever is left once the body has ended."""
+        remaining = [self._partial] if self._partial else []
+        self._partial = ''
+        records = list(self._lines(remaining))
+        if self._record:
+            record = self._parse(''.join(self._record))
+            self._record, self._quotes = [], 0
+            if record is not None:
+                records.append(record)
+        return records
+
+def iter_ndjson(records, rows_per_chunk=500):
+    """Serialize records as newline-delimited JSON, a few hundred rows per chunk."""
+    chunk = []
+    for record in records:
+        chunk.append(json.dumps(record))
+        if len(chunk) >= rows_per_chunk:
+            yield '\n'.join(chunk) + '\n'
+            chunk = []
+    if chunk:
+        yield '\n'.join(chunk) + '\n'
@@ -0,0 +1,136 @@
+"""
+Model evaluation over feature grids
+
+A grid spec names one or more input features to vary, each as an evenly
+spaced range or a list of values, plus fixed values for the rest. The
+Cartesian product is built as columns and scored in one vectorized call,
+and results are returned as typed arrays: base64 of little-endian
+row-major buffers that a browser wraps in a Float32Array or Uint8Array
+without parsing a number per cell.
+
+    {"axes": {"salary": {"min": 20000, "max": 90000, "steps": 50},
+              "years_of_service": {"values": [0, 5, 10, 15, 20]}},
+     "fixed": {"age": 30, "gender": "Male", ...}}
+"""
+
+import base64
+import json
+import math
+
+import numpy as np
+
+MAX_STEPS = 1000
+
+class GridTooLarge(ValueError):
+    """The grid has more points than the caller allows."""
+
+def _number(value, what):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ValueError(f"{what} must be a finite number")
+    return float(value)
+
+def parse_axis(name, axis):
+    """Turn {"min", "max", "steps"} or {"values": [...]} into a 1-d array of values."""
+    if not isinstance(axis, dict):
+        raise ValueError(f"Axis {name} must be an object")
+    if 'values' in axis:
+        values = axis['values']
+        if not isinstance(values, list) or not values:
+            raise ValueError(f"Axis {name}: values must be a non-empty list")
+        if len(values) > MAX_STEPS:
+            raise ValueError(f"Axis {name}: at most {MAX_STEPS} values")
+        if all(isinstance(v, str) for v in values):
+            return np.asarray(values)
+        return np.asarray([_number(v, f"Axis {name} values") for v in values], dtype=np.float64)
+
+    low, high = _number(axis.get('min'), f"Axis {name} min"), _number(axis.get('max'), f"Axis {name} max")
+    steps = axis.get('steps')
+    if isinstance(steps, bool) or not isinstance(steps, int) or not 2 <= steps <= MAX_STEPS:
+        raise ValueError(f"Axis {name}: steps must be an integer from 2 to {MAX_STEPS}")
+    if not low < high:
+        raise ValueError(f"Axis {name}: min must be less than max")
+    return np.linspace(low, high, steps)
+
+def parse_grid_spec(spec, features, max_points, numeric=()):
+    """
+    Validate a grid spec against the model's input features.
+
+    Args:
+        features: Input feature names the model accepts
+        max_points: Largest number of grid points allowed
+        numeric: Features that must be given, as an axis of numbers or a fixed number, e.g. every input of a numeric model
+
+    Returns:
+        (axes, fixed) where axes is a list of (name, values array) and fixed maps the other features to values
+    Raises:
+        ValueError describing the first problem; GridTooLarge when over max_points
+    """
+    if not isinstance(spec, dict) or not isinstance(spec.get('axes'), dict) or not spec['axes']:
+        raise ValueError("Expected {'axes': {feature: {'min', 'max', 'steps'} or {'values': [...]}}, 'fixed': {...}}")
+    fixed = spec.get('fixed') or {}
+    if not isinstance(fixed, dict):
+        raise ValueError("'fixed' must be an object")
+    for name, value in fixed.items():
+        if value is not None and not isinstance(value, (str, int, float)):
+            raise ValueError(f"Fixed value for {name} must be a string or a number")
+
+    unknown = [name for name in list(spec['axes']) + list(fixed) if name not in features]
+    if unknown:
+        raise ValueError(f"Unknown feature: {unknown[0]} (expected one of {', '.join(features)})")
+    axes = [(name, parse_axis(name, axis)) for name, axis in spec['axes'].items()]
+    fixed = {name: value for name, value in fixed.items() if name not in spec['axes']}
+
+    for name in numeric:
+        if name in spec['axes']:
+            if dict(axes)[name].dtype.kind != 'f':
+                raise ValueError(f"Axis {name} values must be numbers")
+        elif name in fixed:
+            _number(fixed[name], f"Fixed value for {name}")
+        else:
+            raise ValueError(f"Missing feature: {name} (give it as an axis or a fixed value)")
+
+    n_points = math.prod(len(values) for _, values in axes)
+    if n_points > max_points:
+        raise GridTooLarge(f"Grid too large: {n_points} points (max {max_points})")
+    return axes, fixed
+
+def grid_key(axes, fixed):
+    """Canonical form of a parsed spec; equal grids get equal keys however they were written."""
+    return json.dumps([[(name, values.tolist()) for name, values in axes], sorted(fixed.items())], default=str)
+
+def grid_columns(axes, fixed):
+    """
+    Column arrays for every point of the grid, first axis varying slowest.
+
+    Returns:
+        (columns, shape)
+    """
+    shape = tuple(len(values) for _, values in axes)
+    n_points = math.prod(shape)
+    index = np.indices(shape).reshape(len(shape), -1)
+    columns = {name: values[index[i]] for i, (name, values) in enumerate(axes)}
+    for name, value in fixed.items():
+        columns[name] = np.full(n_points, value)
+    return columns, shape
+
+def typed_array(array, dtype):
+    """JSON form of an array: its dtype, shape and base64 little-endian row-major bytes."""
+    array = np.ascontiguousarray(array, dtype=np.dtype(dtype).newbyteorder('<'))
+    return {'dtype': np.dtype(dtype).name, 'shape': list(array.shape), 'data': base64.b64encode(array.tobytes()).decode('ascii')}
+
+def grid_payload(axes, shape, probabilities, class_labels):
+    """
+    Payload for a scored grid.
+
+    Args:
+        probabilities: (n_points, n_classes) matrix in grid_columns order
+        class_labels: Name of each probability column
+    """
+    probabilities = np.asarray(probabilities).reshape(shape + (len(class_labels),))
+    return {
+        'axes': [{'name': name, 'values': values.tolist()} for name, values in axes],
+        'shape': list(shape),
+        'classes': list(class_labels),
+        'probabilities': typed_array(probabilities, np.float32),
+        'predicted': typed_array(probabilities.argmax(axis=-1), np.uint8),
+    }
@@ -0,0 +1,316 @@
+"""
+Shared HTTP client for the Envision API
+
+One pooled, keep-alive session for every Envision call, with connect/read
+timeouts, bounded retries with backoff for idempotent reads, and a circuit
+breaker that fails fast while upstream is degraded. AsyncEnvisionClient
+offers the same behaviour on httpx for the ASGI entry point.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling upstream while the circuit breaker is open."""
+
+class CircuitBreaker:
+    """
+    Opens after a run of consecutive failures and lets a single trial call
+    through once reset_timeout seconds have passed.
+
+    Args:
+        failure_threshold: Consecutive failures that open the circuit
+        reset_timeout: Seconds to wait before trying upstream again
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        """Return True if a call may go upstream now."""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+def settings_from_env():
+    """Client keyword arguments from ENVISION_* environment variables."""
+    return {
+        'connect_timeout': float(os.getenv("ENVISION_CONNECT_TIMEOUT", "3.05")),
+        'read_timeout': float(os.getenv("ENVISION_READ_TIMEOUT", "30")),
+        'retries': int(os.getenv("ENVISION_RETRIES", "2")),
+        'backoff': float(os.getenv("ENVISION_BACKOFF", "0.3")),
+        'pool_size': int(os.getenv("ENVISION_POOL_SIZE", "10")),
+        'failure_threshold': int(os.getenv("ENVISION_BREAKER_THRESHOLD", "5")),
+        'reset_timeout': float(os.getenv("ENVISION_BREAKER_RESET", "30")),
+    }
+
+class _ClientStats:
+    """
+    Circuit breaker and upstream counters shared by the sync and async clients.
+
+    Both clients record once per call, retries included (urllib3 retries inside the sync call), so the
+    breaker, stats() and on_request count the same thing. on_request, when set, is called as
+    on_request(method, seconds, failed) after every call, e.g. to feed a latency histogram.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.on_request = None
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=1024)
+        self._counts = {'requests': 0, 'failures': 0, 'short_circuited': 0}
+
+    def _check_breaker(self):
+        if not self.breaker.allow():
+            with self._lock:
+                self._counts['short_circuited'] += 1
+            raise CircuitOpenError("Envision is unavailable, try again later")
+
+    def _record(self, start, failed, method):
+        elapsed = time.perf_counter() - start
+        if failed:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        if self.on_request is not None:
+            self.on_request(method, elapsed, failed)
+        with self._lock:
+            self._latencies.append(elapsed)
+            self._counts['requests'] += 1
+            self._counts['failures'] += int(failed)
+
+    def pool_stats(self):
+        return {}
+
+    def stats(self):
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000.0
+            stats = dict(self._counts)
+        stats['circuit'] = self.breaker.state
+        stats['pool'] = self.pool_stats()
+        if len(latencies):
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            stats['latency_ms'] = {'p50': p50, 'p95': p95, 'p99': p99, 'max': float(latencies.max())}
+        return stats
+
+class EnvisionClient(_ClientStats):
+    """
+    Pooled client for envision.af.mil.
+
+    Args:
+        hostname: Base URL, e.g. https://envision.af.mil
+        token: Bearer token sent with every request
+        connect_timeout, read_timeout: Seconds before giving up on connecting / waiting for data
+        retries: Retries for idempotent (GET) requests and failed connects
+        backoff: Backoff factor between retries, in seconds
+        pool_size: Keep-alive connections kept per host
+        failure_threshold, reset_timeout: Circuit breaker settings
+        verify: TLS verification, passed through to requests
+    """
+
+    def __init__(self, hostname, token, connect_timeout=3.05, read_timeout=30.0, retries=2, backoff=0.3,
+                 pool_size=10, failure_threshold=5, reset_timeout=30.0, verify=False):
+        super().__init__(failure_threshold, reset_timeout)
+        self.hostname = hostname.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.verify = verify
+        self.token = token
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """The requests.Session, created (and requests imported) on the first Envision call."""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._build_session()
+        return self._session
+
+    def _build_session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        retry = Retry(
+            total=self.retries,
+            backoff_factor=self.backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({'GET', 'HEAD'}),
+            raise_on_status=False,
+        )
+        session = requests.Session()
+        session.headers['Authorization'] = f"Bearer {self.token}"
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=retry)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    @classmethod
+    def from_env(cls, hostname, token):
+        """Build a client using ENVISION_* settings from the environment."""
+        return cls(hostname, token, **settings_from_env())
+
+    def request(self, method, path, **kwargs):
+        """
+        Send a request to Envision.
+
+        Returns the requests.Response (status is not checked).
+        Raises CircuitOpenError when upstream is considered down, or the exception the call failed with.
+        """
+        self._check_breaker()
+        start = time.perf_counter()
+        try:
+            response = self.session.request(
+                method, f"{self.hostname}{path}", timeout=self.timeout, verify=self.verify, **kwargs
+            )
+        except BaseException:
+            # Any failure, not only requests' own, must end a half-open trial or the breaker stays shut
+            self._record(start, True, method)
+            raise
+        self._record(start, response.status_code >= 500, method)
+        return response
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def pool_stats(self):
+        """Connections opened vs requests sent over them, summed across hosts."""
+        connections = requests_sent = 0
+        adapters = self._session.adapters.values() if self._session is not None else ()
+        for adapter in set(adapters):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is not None:
+                    connections += pool.num_connections
+                    requests_sent += pool.num_requests
+        return {
+            'connections_opened': connections,
+            'requests_sent': requests_sent,
+            'connections_reused': max(requests_sent - connections, 0),
+        }
+
+class AsyncEnvisionClient(_ClientStats):
+    """
+    Non-blocking counterpart of EnvisionClient built on httpx.AsyncClient.
+
+    Takes the same arguments; requires the optional httpx package.
+    """
+
+    RETRY_STATUSES = (502, 503, 504)
+
+    def __init__(self, hostname, token, connect_timeout=3.05, read_timeout=30.0, retries=2, backoff=0.3,
+                 pool_size=100, failure_threshold=5, reset_timeout=30.0, verify=False):
+        import httpx
+
+        super().__init__(failure_threshold, reset_timeout)
+        self.httpx = httpx
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.client = httpx.AsyncClient(
+            base_url=hostname.rstrip('/'),
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            verify=verify,
+        )
+
+    @classmethod
+    def from_env(cls, hostname, token):
+        settings = settings_from_env()
+        # One event loop multiplexes many requests, so allow a larger pool than a threaded worker needs
+        settings['pool_size'] = int(os.getenv("ENVISION_ASYNC_POOL_SIZE", "100"))
+        return cls(hostname, token, **settings)
+
+    async def request(self, method, path, stream=False, **kwargs):
+        """
+        Send a request to Envision, retrying GETs on connection errors and 502/503/504.
+
+        With stream=True the response body is not read; the caller must aclose() it.
+        """
+        self._check_breaker()
+        attempts = self.retries + 1 if method == 'GET' else 1
+        start = time.perf_counter()
+        try:
+            for attempt in range(attempts):
+                if attempt:
+                    await asyncio.sleep(self.backoff * (2 ** (attempt - 1)))
+                try:
+                    request = self.client.build_request(method, path, **kwargs)
+                    response = await self.client.send(request, stream=stream)
+                except self.httpx.TransportError:
+                    if attempt + 1 < attempts:
+                        continue
+                    raise
+                if response.status_code in self.RETRY_STATUSES and attempt + 1 < attempts:
+                    await response.aclose()
+                    continue
+                break
+        except BaseException:
+            # Recorded once per call, like the sync client; cancellation also ends a half-open trial
+            self._record(start, True, method)
+            raise
+        self._record(start, response.status_code >= 500, method)
+        return response
+
+    async def get(self, path, **kwargs):
+        return await self.request('GET', path, **kwargs)
+
+    async def post(self, path, **kwargs):
+        return await self.request('POST', path, **kwargs)
+
+    def pool_stats(self):
+        # httpx does not expose pool counters publicly; report what the transport holds
+        pool = getattr(getattr(self.client, '_transport', None), '_pool', None)
+        connections = getattr(pool, 'connections', None)
+        stats = {'max_connections': self.pool_size}
+        if connections is not None:
+            stats['open_connections'] = len(connections)
+        return stats
+
+    async def aclose(self):
+        await self.client.aclose()
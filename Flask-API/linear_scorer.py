@@ -0,0 +1,189 @@
+"""
+Closed-form scoring for linear models
+
+Pulls the coefficients and intercepts out of fitted LogisticRegression and
+LinearRegression models, folds an optional affine preprocessing step
+(e.g. a StandardScaler) into them, and evaluates predictions with a single
+NumPy expression instead of going through sklearn's predict/predict_proba.
+"""
+
+import logging
+import warnings
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def affine_from_scaler(scaler, n_features):
+    """
+    Express a fitted StandardScaler as x * scale + offset.
+
+    Returns:
+        (scale, offset) arrays of length n_features
+    """
+    mean = scaler.mean_ if getattr(scaler, 'mean_', None) is not None else np.zeros(n_features)
+    std = scaler.scale_ if getattr(scaler, 'scale_', None) is not None else np.ones(n_features)
+    scale = 1.0 / np.asarray(std, dtype=np.float64)
+    return scale, -np.asarray(mean, dtype=np.float64) * scale
+
+def as_feature_row(data, feature_names=None, n_features=None):
+    """
+    Turn a JSON payload into a (1, n_features) float matrix.
+
+    Lists are taken positionally. Dicts are ordered by feature_names when the
+    model was fitted with them, otherwise by key order (as pd.DataFrame([data]) would).
+    Raises ValueError if the payload cannot be converted, or does not hold n_features values when given.
+    """
+    if isinstance(data, dict):
+        if feature_names is not None:
+            missing = [name for name in feature_names if name not in data]
+            if missing:
+                raise ValueError(f"Missing required field: {missing[0]}")
+            values = [data[name] for name in feature_names]
+        else:
+            values = list(data.values())
+    elif isinstance(data, list):
+        values = data
+    else:
+        raise ValueError("Expected a JSON list or object of feature values")
+
+    try:
+        row = np.asarray(values, dtype=np.float64).reshape(1, -1)
+    except (TypeError, ValueError):
+        raise ValueError(f"Feature values must be numbers: {values!r}") from None
+    if n_features is not None and row.shape[1] != n_features:
+        raise ValueError(f"Expected {n_features} feature values, got {row.shape[1]}")
+    return row
+
+class SklearnScorer:
+    """Fallback that applies the affine preprocessing and calls the estimator itself."""
+
+    def __init__(self, model, scale=None, offset=None):
+        self.model = model
+        self.scale = scale
+        self.offset = offset
+        self.classes_ = getattr(model, 'classes_', None)
+        self.n_features_in_ = getattr(model, 'n_features_in_', None)
+
+    def _prepare(self, X):
+        if self.scale is None:
+            return X
+        return X * self.scale + self.offset
+
+    def predict_proba(self, X):
+        return self.model.predict_proba(self._prepare(X))
+
+    def predict(self, X):
+        return self.model.predict(self._prepare(X))
+
+class LinearScorer:
+    """
+    Evaluates a linear model as X @ W.T + b with the preprocessing folded into W and b.
+
+    Args:
+        coef: Coefficient matrix of shape (n_outputs, n_features)
+        intercept: Intercept vector of length n_outputs
+        link: 'identity' for regression, 'logistic' for binary or one-vs-rest, 'softmax' for multinomial
+        classes: Class labels for classifiers, None for regressors
+    """
+
+    def __init__(self, coef, intercept, link, classes=None):
+        self.coef = np.ascontiguousarray(coef, dtype=np.float64)
+        self.intercept = np.asarray(intercept, dtype=np.float64)
+        self.link = link
+        self.classes_ = classes
+        self.n_features_in_ = self.coef.shape[1]
+
+    @classmethod
+    def from_estimator(cls, model, scale=None, offset=None):
+        """
+        Build a scorer from a fitted LogisticRegression or LinearRegression.
+
+        scale and offset describe preprocessing x * scale + offset applied before the model;
+        it is folded into the weights: W' = W * scale, b' = b + W @ offset.
+        Raises TypeError for unsupported estimators.
+        """
+        name = type(model).__name__
+        if name not in ('LogisticRegression', 'LinearRegression'):
+            raise TypeError(f"No closed-form scorer for {name}")
+
+        coef = np.atleast_2d(np.asarray(model.coef_, dtype=np.float64))
+        intercept = np.atleast_1d(np.asarray(model.intercept_, dtype=np.float64)).copy()
+        if scale is not None:
+            intercept = intercept + coef @ offset
+            coef = coef * scale
+
+        if name == 'LinearRegression':
+            return cls(coef, intercept, 'identity')
+
+        # Same rule LogisticRegression.predict_proba uses to pick one-vs-rest vs multinomial
+        multi_class = getattr(model, 'multi_class', 'auto')
+        ovr = multi_class in ('ovr', 'warn') or (
+            multi_class in ('auto', 'deprecated') and (len(model.classes_) <= 2 or model.solver == 'liblinear')
+        )
+        return cls(coef, intercept, 'logistic' if ovr else 'softmax', model.classes_)
+
+    def decision_function(self, X):
+        """Linear scores X @ W.T + b, one column per coefficient row (like sklearn's, except binary models keep a column)."""
+        return X @ self.coef.T + self.intercept
+
+    def predict_proba(self, X):
+        z = self.decision_function(X)
+        if self.link == 'softmax':
+            z = np.exp(z - z.max(axis=1, keepdims=True))
+            return z / z.sum(axis=1, keepdims=True)
+        p = 1.0 / (1.0 + np.exp(-z))
+        if p.shape[1] == 1:
+            return np.hstack([1.0 - p, p])
+        return p / p.sum(axis=1, keepdims=True)
+
+    def predict(self, X):
+        if self.link == 'identity':
+            y = self.decision_function(X)
+            return y[:, 0] if y.shape[1] == 1 else y
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    def max_deviation(self, model, X, scale=None, offset=None):
+        """Largest absolute difference from sklearn's own output on X."""
+        X_model = X if scale is None else X * scale + offset
+        with warnings.catch_warnings():
+            # Models fitted on DataFrames warn about the missing feature names
+            warnings.simplefilter('ignore', UserWarning)
+            return self._max_deviation(model, X, X_model)
+
+    def _max_deviation(self, model, X, X_model):
+        if self.link == 'identity':
+            expected = np.asarray(model.predict(X_model), dtype=np.float64).reshape(len(X), -1)
+            actual = self.predict(X).reshape(len(X), -1)
+            # Regression targets can be large, so compare relative to their magnitude
+            return float(np.max(np.abs(actual - expected) / np.maximum(np.abs(expected), 1.0)))
+        return float(np.max(np.abs(self.predict_proba(X) - model.predict_proba(X_model))))
+
+def build_scorer(model, scale=None, offset=None, canary=None, tolerance=1e-9):
+    """
+    Return a LinearScorer for the model when one can be built and agrees with sklearn,
+    otherwise a SklearnScorer.
+
+    Args:
+        model: Fitted estimator
+        scale, offset: Optional affine preprocessing applied before the model
+        canary: Inputs (in the unpreprocessed space) to check against sklearn; random rows when omitted
+        tolerance: Largest deviation from sklearn that is accepted
+    """
+    try:
+        scorer = LinearScorer.from_estimator(model, scale, offset)
+    except TypeError:
+        return SklearnScorer(model, scale, offset)
+
+    if canary is None:
+        rng = np.random.default_rng(0)
+        canary = rng.normal(size=(32, scorer.n_features_in_))
+        if scale is not None:
+            # Spread the rows over the range the model was trained on
+            canary = (canary - offset) / scale
+
+    deviation = scorer.max_deviation(model, canary, scale, offset)
+    if not deviation <= tolerance:
+        logger.warning("Linear scorer for %s deviates from sklearn by %g, using sklearn", type(model).__name__, deviation)
+        return SklearnScorer(model, scale, offset)
+    return scorer
@@ -0,0 +1,250 @@
+"""
+Latency histograms, gauges and counters in the Prometheus text format
+
+A small dependency-free subset of prometheus_client: fixed-bucket histograms,
+gauges and counters with labels, rendered by Metrics.render() for a /metrics
+endpoint. Observing a value takes a bisect and a lock, so timers can sit on
+the hot path of every request.
+
+Values are kept per process; with several gunicorn workers each scrape sees
+the worker that answered it.
+"""
+
+import bisect
+import math
+import threading
+import time
+from functools import wraps
+
+from flask import g, request
+
+# Seconds, from sub-millisecond model calls to slow upstream downloads
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Timer:
+    """Context manager observing the seconds spent inside it."""
+
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}  # label values -> value
+
+    def _check(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {labels}")
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            lines.extend(self._samples(labels, value))
+        return lines
+
+    def _samples(self, labels, value):
+        return [f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}']
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        self._check(labels)
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def inc(self, *labels, amount=1):
+        self._check(labels)
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value, *labels):
+        self._check(labels)
+        with self._lock:
+            self._values[labels] = value
+
+class Histogram(_Metric):
+    """
+    Cumulative-bucket histogram.
+
+    Args:
+        buckets: Upper bounds in ascending order; +Inf is added
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        self._check(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def time(self, *labels):
+        """Context manager observing its duration, e.g. with stage.time('retention', 'encode'): ..."""
+        self._check(labels)
+        return _Timer(self, labels)
+
+    def timed(self, fn, *labels):
+        """Wrap fn so every call is observed."""
+        self._check(labels)
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Timer(self, labels):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    def _samples(self, labels, state):
+        counts, total = state
+        samples, cumulative = [], 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            le = 'le="' + _number(bound) + '"'
+            samples.append(f'{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}')
+        samples.append(f'{self.name}_sum{_labels(self.labelnames, labels)} {total!r}')
+        samples.append(f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}')
+        return samples
+
+class Metrics:
+    """A set of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._add(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+class RequestMetrics:
+    """
+    Per-route latency and in-flight requests for a Flask app.
+
+    Routes are labelled by their rule (e.g. /admin/models/<name>/reload), so label
+    cardinality stays bounded. Streaming responses are timed until the handler returns.
+    active_threads() tells the sampling profiler which threads are handling a request.
+    """
+
+    def __init__(self, app, metrics):
+        self.latency = metrics.histogram('http_request_duration_seconds', 'Time to handle a request, by route',
+                                         ('route', 'method', 'status'))
+        self.in_flight = metrics.gauge('http_requests_in_flight', 'Requests being handled, by route', ('route',))
+        self._threads_lock = threading.Lock()
+        self._threads = set()
+        app.before_request(self._before)
+        app.after_request(self._after)
+        app.teardown_request(self._teardown)
+
+    @staticmethod
+    def _route():
+        return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+    def _before(self):
+        g.metrics_route = self._route()
+        g.metrics_start = time.perf_counter()
+        self.in_flight.inc(g.metrics_route)
+        with self._threads_lock:
+            self._threads.add(threading.get_ident())
+
+    def _after(self, response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            self.latency.observe(time.perf_counter() - start, g.metrics_route, request.method, str(response.status_code))
+        return response
+
+    def _teardown(self, exc):
+        route = g.pop('metrics_route', None)
+        if route is None:
+            return
+        # after_request is skipped when the view raised
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            self.latency.observe(time.perf_counter() - start, route, request.method, '500')
+        self.in_flight.dec(route)
+        with self._threads_lock:
+            self._threads.discard(threading.get_ident())
+
+    def wrap_async(self, route, handler):
+        """
+        Time an async handler (e.g. a Starlette endpoint) under route, with the same metrics as the Flask routes.
+
+        The handler runs on the event loop, so its thread is not reported to the sampling profiler.
+        """
+        @wraps(handler)
+        async def wrapper(request):
+            start = time.perf_counter()
+            status = '500'
+            self.in_flight.inc(route)
+            try:
+                response = await handler(request)
+                status = str(response.status_code)
+                return response
+            finally:
+                self.latency.observe(time.perf_counter() - start, route, request.method, status)
+                self.in_flight.dec(route)
+        return wrapper
+
+    def active_threads(self):
+        """Idents of the threads currently handling a request."""
+        with self._threads_lock:
+            return frozenset(self._threads)
@@ -0,0 +1,211 @@
+"""
+Micro-batching for model inference
+
+Requests that arrive within a short window are stacked into one matrix and
+scored with a single vectorized call; each caller gets its own row back.
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import numpy as np
+
+class MicroBatchTimeout(TimeoutError):
+    """A submitted row was not scored within the batcher's timeout, e.g. because the model call hung."""
+
+# Queued by close() to stop the worker thread
+_CLOSE = object()
+
+class MicroBatcher:
+    """
+    Coalesces single-row predictions into batches.
+
+    Args:
+        fn: Vectorized function taking an (n, n_features) matrix and returning n results
+        max_batch_size: Largest batch that is scored at once
+        max_wait_ms: How long the first request in a batch waits for others to join
+        enabled: When False, submit() calls fn directly and no worker thread is started
+        timeout_ms: Longest submit() waits for its batch before raising MicroBatchTimeout
+        window: Number of recent requests/batches kept for latency and size statistics
+    """
+
+    def __init__(self, fn, max_batch_size=64, max_wait_ms=2.0, enabled=True, timeout_ms=10000.0, window=2048):
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.enabled = enabled
+        self.timeout = timeout_ms / 1000.0
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+        self._closed = False
+
+        self._latencies = deque(maxlen=window)
+        self._batch_sizes = deque(maxlen=window)
+        self._requests = 0
+        self._batches = 0
+
+    def submit(self, row):
+        """
+        Score a single feature row, blocking until its batch has run.
+
+        Raises:
+            MicroBatchTimeout if the row was not scored within the timeout
+        """
+        start = time.perf_counter()
+        future = self._enqueue(row) if self.enabled else None
+        if future is not None:
+            try:
+                result = future.result(timeout=self.timeout)
+            except FutureTimeout:
+                raise MicroBatchTimeout(f"Prediction not scored within {self.timeout * 1000.0:.0f} ms") from None
+        else:
+            result = self.fn(np.asarray(row).reshape(1, -1))[0]
+            self._record_batch(1)
+        with self._lock:
+            self._requests += 1
+            self._latencies.append(time.perf_counter() - start)
+        return result
+
+    def _enqueue(self, row):
+        """Queue a row for the worker thread; None once the batcher is closed."""
+        if self._closed:
+            return None
+        self._ensure_worker()
+        future = Future()
+        # Under the lock, so every row is queued either before close()'s marker or not at all
+        with self._lock:
+            if self._closed:
+                return None
+            self._queue.put((row, future))
+        return future
+
+    def _ensure_worker(self):
+        # Threads do not survive a fork, so pre-fork workers each start their own
+        # A worker that died is replaced; rows already queued are kept for the new one
+        pid = os.getpid()
+        if self._worker is not None and self._worker_pid == pid and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._closed:
+                return
+            if self._worker_pid != pid:
+                self._queue = queue.Queue()
+            if self._worker is None or self._worker_pid != pid or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, daemon=True, name='microbatch')
+                self._worker_pid = pid
+                self._worker.start()
+
+    def close(self):
+        """
+        Stop the worker thread once the rows queued so far are scored, e.g. when the model version is dropped.
+
+        Later submit() calls, e.g. from requests still holding the dropped version, score their row directly.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            worker = self._worker if self._worker_pid == os.getpid() else None
+            self._queue.put(_CLOSE)
+        if worker is None or not worker.is_alive():
+            self._fail_queued(self._queue)
+
+    def _fail_queued(self, pending):
+        error = RuntimeError("Micro-batcher was closed before the row was scored")
+        while True:
+            try:
+                item = pending.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _CLOSE:
+                item[1].set_exception(error)
+
+    def _run(self):
+        pending = self._queue
+        closing = False
+        while not closing:
+            first = pending.get()
+            if first is _CLOSE:
+                break
+            batch = [first]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = pending.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _CLOSE:
+                    closing = True
+                    break
+                batch.append(item)
+
+            futures = [future for _, future in batch]
+            try:
+                results = self.fn(np.vstack([row for row, _ in batch]))
+            except Exception as e:
+                if len(batch) == 1:
+                    futures[0].set_exception(e)
+                else:
+                    # Score each row on its own, so one bad row fails only its own caller
+                    for row, future in batch:
+                        self._run_one(row, future)
+            else:
+                if len(results) != len(batch):
+                    error = RuntimeError(f"Model returned {len(results)} results for a batch of {len(batch)} rows")
+                    for future in futures:
+                        future.set_exception(error)
+                else:
+                    for future, result in zip(futures, results):
+                        future.set_result(result)
+            self._record_batch(len(batch))
+        self._fail_queued(pending)
+
+    def _run_one(self, row, future):
+        try:
+            result = self.fn(np.asarray(row).reshape(1, -1))[0]
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    def _record_batch(self, size):
+        with self._lock:
+            self._batches += 1
+            self._batch_sizes.append(size)
+
+    def stats(self):
+        """Tail latency and batch-size statistics over the recent window."""
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000.0
+            sizes = np.array(self._batch_sizes)
+            requests, batches = self._requests, self._batches
+
+        stats = {
+            'enabled': self.enabled,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'requests': requests,
+            'batches': batches,
+        }
+        if len(latencies):
+            p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+            stats['latency_ms'] = {'p50': p50, 'p90': p90, 'p99': p99, 'max': float(latencies.max())}
+        if len(sizes):
+            # Power-of-two buckets: "1", "2", "3-4", "5-8", ...
+            histogram = {}
+            for size in sizes:
+                upper = 1 << int(size - 1).bit_length()
+                label = str(upper) if upper <= 2 else f"{upper // 2 + 1}-{upper}"
+                histogram[label] = histogram.get(label, 0) + 1
+            stats['batch_size'] = {'mean': float(sizes.mean()), 'max': int(sizes.max()), 'histogram': histogram}
+        return stats
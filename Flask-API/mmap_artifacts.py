@@ -0,0 +1,229 @@
+"""
+Memory-mappable model artifacts
+
+Pickled sklearn models are unpickled into private memory, so every worker
+process holds its own copy. Artifacts written by save_mmap_artifact keep
+their arrays in an uncompressed joblib file that load_mmap_artifact maps
+read-only (mmap_mode='r'); workers on the same machine then share those
+pages through the OS page cache instead of each holding a copy.
+
+sklearn trees copy their node arrays into their own buffers when they are
+unpickled, so tree ensembles are first flattened into FlatTreeEnsemble,
+which keeps every node of every tree in a few flat arrays and scores them
+with NumPy directly from the mapped file.
+
+Usage:
+    python mmap_artifacts.py models/airforce_retention/airforce_retention_model.pkl model.mmap.joblib
+"""
+
+import argparse
+import logging
+import warnings
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class FlatTreeEnsemble:
+    """
+    Tree ensemble stored as flat node arrays.
+
+    Not an sklearn estimator: it only scores. Build one from a fitted
+    sklearn ensemble with from_estimator(); the constructor takes the
+    arrays that method produces.
+
+    Node i is internal when feature[i] >= 0; samples go to left[i] when
+    x[feature[i]] <= threshold[i] (compared in float32, as sklearn does)
+    and to right[i] otherwise. Leaves hold leaf_value[i].
+
+    Args:
+        feature, threshold, left, right, leaf_value: Node arrays for all trees, child indices global
+        roots: Index of each tree's root node
+        tree_output: Output column each tree contributes to
+        kind: 'average' (random forest: mean of per-tree class probabilities)
+            or 'boosting' (gradient boosting: init + learning_rate * sum of tree outputs, then logistic/softmax)
+        classes: Class labels
+        n_features_in: Width of the input rows, as the estimator was fitted; trailing features may never be split on
+        init: Initial raw prediction per output column (boosting only)
+        learning_rate: Boosting learning rate
+        max_depth: Deepest path in any tree, bounds the traversal loop
+    """
+
+    def __init__(self, feature, threshold, left, right, leaf_value, roots, tree_output, kind, classes, n_features_in,
+                 init=None, learning_rate=1.0, max_depth=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.leaf_value = leaf_value
+        self.roots = roots
+        self.tree_output = tree_output
+        self.kind = kind
+        self.classes_ = classes
+        self.n_features_in_ = n_features_in
+        self.init = init
+        self.learning_rate = learning_rate
+        self.max_depth = max_depth
+
+    @classmethod
+    def from_estimator(cls, model):
+        """
+        Flatten a fitted RandomForestClassifier, ExtraTreesClassifier, DecisionTreeClassifier
+        or GradientBoostingClassifier.
+
+        Raises TypeError for any other estimator.
+        """
+        name = type(model).__name__
+        if name in ('RandomForestClassifier', 'ExtraTreesClassifier'):
+            trees = [(estimator.tree_, 0) for estimator in model.estimators_]
+            kind = 'average'
+        elif name == 'DecisionTreeClassifier':
+            trees = [(model.tree_, 0)]
+            kind = 'average'
+        elif name == 'GradientBoostingClassifier':
+            trees = [(estimator.tree_, k) for stage in model.estimators_ for k, estimator in enumerate(stage)]
+            kind = 'boosting'
+        else:
+            raise TypeError(f"Cannot flatten {name}")
+        if getattr(model, 'n_outputs_', 1) != 1:
+            raise TypeError("Multi-output trees are not supported")
+
+        features, thresholds, lefts, rights, values, roots, outputs = [], [], [], [], [], [], []
+        offset, max_depth = 0, 0
+        for tree, output in trees:
+            n_nodes = tree.node_count
+            internal = tree.children_left >= 0
+            features.append(np.where(internal, tree.feature, -1))
+            thresholds.append(tree.threshold)
+            # Leaves point at themselves so the traversal can run a fixed number of steps
+            lefts.append(np.where(internal, tree.children_left + offset, np.arange(n_nodes) + offset))
+            rights.append(np.where(internal, tree.children_right + offset, np.arange(n_nodes) + offset))
+            value = tree.value[:, 0, :]
+            if kind == 'average':
+                # Per-tree class probabilities, as DecisionTreeClassifier.predict_proba normalizes them
+                totals = value.sum(axis=1, keepdims=True)
+                value = np.divide(value, totals, out=np.zeros_like(value), where=totals > 0)
+            values.append(value)
+            roots.append(offset)
+            outputs.append(output)
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        init, learning_rate = None, 1.0
+        if kind == 'boosting':
+            learning_rate = float(model.learning_rate)
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', UserWarning)
+                init = np.asarray(model._raw_predict_init(np.zeros((1, model.n_features_in_)))[0], dtype=np.float64)
+
+        return cls(
+            feature=np.concatenate(features).astype(np.int32),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            left=np.concatenate(lefts).astype(np.int32),
+            right=np.concatenate(rights).astype(np.int32),
+            leaf_value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            roots=np.asarray(roots, dtype=np.int32),
+            tree_output=np.asarray(outputs, dtype=np.int32),
+            kind=kind,
+            classes=np.asarray(model.classes_),
+            n_features_in=int(model.n_features_in_),
+            init=init,
+            learning_rate=learning_rate,
+            max_depth=max_depth,
+        )
+
+    def apply(self, X):
+        """Leaf node index reached in every tree, shape (n_samples, n_trees)."""
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            feature = self.feature[nodes]
+            go_left = X[rows, np.maximum(feature, 0)] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        if self.kind == 'average':
+            return self.leaf_value[leaves].mean(axis=1)
+
+        contributions = self.leaf_value[leaves, 0]  # (n_samples, n_trees)
+        n_outputs = len(self.init)
+        raw = np.tile(self.init, (len(leaves), 1))
+        for k in range(n_outputs):
+            raw[:, k] += self.learning_rate * contributions[:, self.tree_output == k].sum(axis=1)
+        if n_outputs == 1:
+            positive = 1.0 / (1.0 + np.exp(-raw[:, 0]))
+            return np.column_stack([1.0 - positive, positive])
+        raw -= raw.max(axis=1, keepdims=True)
+        exp = np.exp(raw)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+def flatten_model(model, canary=None, tolerance=1e-9):
+    """
+    Return a FlatTreeEnsemble for tree ensembles it agrees with on the canary rows, otherwise the model itself.
+
+    Args:
+        canary: Rows to compare predict_proba on; random rows in the training feature range when omitted
+    """
+    try:
+        flat = FlatTreeEnsemble.from_estimator(model)
+    except TypeError:
+        return model
+
+    if canary is None:
+        internal = flat.feature >= 0
+        thresholds = flat.threshold[internal]
+        rng = np.random.default_rng(0)
+        canary = np.column_stack([
+            rng.uniform(thresholds[flat.feature[internal] == j].min(initial=0.0) - 1,
+                        thresholds[flat.feature[internal] == j].max(initial=0.0) + 1, size=256)
+            for j in range(model.n_features_in_)
+        ])
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)
+        expected = model.predict_proba(canary)
+    deviation = float(np.max(np.abs(flat.predict_proba(canary) - expected)))
+    if not deviation <= tolerance:
+        logger.warning("Flattened %s deviates from sklearn by %g, keeping the estimator", type(model).__name__, deviation)
+        return model
+    return flat
+
+def save_mmap_artifact(obj, path, flatten=True):
+    """
+    Write obj as an uncompressed joblib file whose arrays can be memory-mapped.
+
+    Args:
+        flatten: Replace a supported tree ensemble with a FlatTreeEnsemble first, so its nodes are mapped too
+    """
+    import joblib
+
+    if flatten:
+        obj = flatten_model(obj)
+    joblib.dump(obj, path, compress=0)
+    return obj
+
+def load_mmap_artifact(path):
+    """Load an artifact with its arrays memory-mapped read-only."""
+    import joblib
+    return joblib.load(path, mmap_mode='r')
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert a pickled model into a memory-mappable artifact')
+    parser.add_argument('source', help='Existing .pkl written by pickle or joblib')
+    parser.add_argument('destination')
+    parser.add_argument('--no-flatten', action='store_true', help='Keep tree ensembles as sklearn estimators')
+    args = parser.parse_args()
+
+    import joblib
+
+    model = joblib.load(args.source)
+    saved = save_mmap_artifact(model, args.destination, flatten=not args.no_flatten)
+    print(f"Wrote {type(saved).__name__} to {args.destination}")
+
+if __name__ == '__main__':
+    main()
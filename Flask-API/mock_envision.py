@@ -0,0 +1,138 @@
+"""
+Local stand-in for the Envision API
+
+Serves the two Envision endpoints the Flask app calls, so the Envision
+routes can be exercised and load tested without network access or a token.
+
+    GET  /api/v2/datasets/<rid>/readTable?format=CSV&rowLimit=N
+         Streams N rows of airforce_retention_data.csv (repeated as needed) in chunks
+    POST /foundry-ml-live/api/inference/transform/<deployment_rid>/v2
+         Echoes the request body back as {"output": ...}
+
+Usage:
+    python mock_envision.py --port 8081 --latency-ms 50
+    ENVISION_HOSTNAME=http://localhost:8081 flask run
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_PATH = os.path.join(BASE_DIR, 'models/airforce_retention', 'airforce_retention_data.csv')
+
+READ_TABLE = re.compile(r'^/api/v2/datasets/([^/]+)/readTable$')
+INFERENCE = re.compile(r'^/foundry-ml-live/api/inference/transform/([^/]+)/v2$')
+
+def load_rows(path=DATA_PATH):
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        return next(reader), list(reader)
+
+class MockEnvisionHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    latency = 0.0
+    chunk_rows = 1000
+    header, rows = None, None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        url = urlparse(self.path)
+        match = READ_TABLE.match(url.path)
+        if match is None:
+            return self._send_json(404, {'error': 'Not found'})
+        if match.group(1) == 'forbidden':
+            return self._send_json(403, {'error': 'Insufficient permissions'})
+
+        params = parse_qs(url.query)
+        try:
+            row_limit = int(params.get('rowLimit', ['100'])[0])
+        except ValueError:
+            return self._send_json(400, {'error': 'rowLimit must be an integer'})
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/csv; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def write_chunk(text):
+            data = text.encode('utf-8')
+            self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        writer.writerow(self.header)
+        for i in range(row_limit):
+            writer.writerow(self.rows[i % len(self.rows)])
+            if (i + 1) % self.chunk_rows == 0:
+                write_chunk(buffer.getvalue())
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            write_chunk(buffer.getvalue())
+        self.wfile.write(b'0\r\n\r\n')
+
+    def do_POST(self):
+        time.sleep(self.latency)
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        if INFERENCE.match(urlparse(self.path).path) is None:
+            return self._send_json(404, {'error': 'Not found'})
+        try:
+            payload = json.loads(body or b'null')
+        except ValueError:
+            return self._send_json(400, {'error': 'Invalid JSON'})
+        self._send_json(200, {'output': payload})
+
+def start_mock_envision(port=0, latency_ms=0.0):
+    """
+    Start the mock server on a background thread.
+
+    Returns:
+        (server, base_url); call server.shutdown() to stop it
+    """
+    header, rows = load_rows()
+    handler = type('Handler', (MockEnvisionHandler,), {
+        'latency': latency_ms / 1000.0, 'header': header, 'rows': rows,
+    })
+    # The default listen backlog of 5 drops connections under load tests
+    server_class = type('Server', (ThreadingHTTPServer,), {'request_queue_size': 1024})
+    server = server_class(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the Envision API')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Delay added to every response')
+    args = parser.parse_args()
+
+    server, base_url = start_mock_envision(args.port, args.latency_ms)
+    print(f"Mock Envision listening on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
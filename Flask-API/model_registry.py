@@ -0,0 +1,478 @@
+"""
+Lazy, versioned model registry
+
+Models are declared up front (name, artifact files, and a build step that
+turns the loaded artifacts into whatever the routes need) but nothing is
+unpickled until a model is first used, or warmed up explicitly. Importing
+the app therefore no longer pays for sklearn and every artifact.
+
+Each model lives in a slot that can hold more than one version. A reload
+builds the new version off to the side, checks it on a canary input and
+only then swaps it in, so requests already holding the old version finish
+on it. Traffic can be split between versions for A/B comparisons.
+"""
+
+import hashlib
+import os
+import pickle
+import random
+import threading
+import time
+from collections import OrderedDict
+
+HASH_CHUNK_SIZE = 1 << 20
+
+def _file_identity(stat):
+    return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+def _hash_open_file(f):
+    """SHA-256 hex digest of an open file, read in chunks from its start; leaves f at its start."""
+    digest = hashlib.sha256()
+    f.seek(0)
+    for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    f.seek(0)
+    return digest.hexdigest()
+
+def _load_from_file(path, load, by_name=False):
+    """
+    Hash the file, then load it with load(f) from the same open file.
+
+    Args:
+        by_name: load reopens path itself (e.g. to memory-map it), so path must still name the hashed file
+
+    Raises:
+        ValueError if the file was rewritten, or with by_name replaced, after it was hashed
+    """
+    with open(path, 'rb') as f:
+        identity = _file_identity(os.fstat(f.fileno()))
+        digest = _hash_open_file(f)
+        value = load(f)
+        changed = _file_identity(os.fstat(f.fileno())) != identity
+        if by_name:
+            changed = changed or _file_identity(os.stat(path)) != identity
+    if changed:
+        raise ValueError(f"{path} changed while it was loaded")
+    return value, digest
+
+def _load_pickle(path):
+    return _load_from_file(path, pickle.load)
+
+def _load_joblib(path):
+    import joblib
+    return _load_from_file(path, joblib.load)
+
+def _load_joblib_mmap(path):
+    # Arrays stay in the file and are shared between worker processes through the page cache
+    from mmap_artifacts import load_mmap_artifact
+    return _load_from_file(path, lambda f: load_mmap_artifact(path), by_name=True)
+
+def _load_pipeline(path):
+    # Checksum-verified fused pipeline artifact; its arrays are memory-mapped like 'joblib-mmap'
+    # The checksum is verified in the same pass that computes the digest, which also names the version
+    from retention_pipeline import load_pipeline_artifact
+    artifact = load_pipeline_artifact(path)
+    return artifact, artifact['sha256']
+
+# Each loader takes a path and returns (loaded object, SHA-256 hex digest of the bytes it was loaded from)
+ARTIFACT_LOADERS = {
+    'pickle': _load_pickle,
+    'joblib': _load_joblib,
+    'joblib-mmap': _load_joblib_mmap,
+    'pipeline': _load_pipeline,
+}
+
+class ModelLoadError(Exception):
+    """Raised when a model version cannot be loaded or fails its canary check."""
+
+class ModelSpec:
+    """
+    Declarative description of a model.
+
+    Args:
+        name: Registry key, e.g. 'iris'
+        artifacts: Mapping of artifact name -> file path
+        build: Called with {artifact name: loaded object}; returns the object handed to routes
+            (typically the model plus its preprocessing and scorer)
+        loader: 'pickle', 'joblib', 'joblib-mmap' (arrays memory-mapped read-only) or 'pipeline'
+            (a checksummed retention_pipeline artifact), how the artifact files are read
+        canary: Optional check called with a freshly built model; raises if the model is unusable
+        fallback: Optional (artifacts, loader) of an older file layout, read while any of the
+            artifacts files is missing; build receives whichever set of artifacts was loaded
+        release: Optional function called with a built model when the registry drops its version,
+            e.g. to stop threads the build started, so the version can be freed
+    """
+
+    def __init__(self, name, artifacts, build=None, loader='pickle', canary=None, fallback=None, release=None):
+        for layout_loader in (loader,) + ((fallback[1],) if fallback is not None else ()):
+            if layout_loader not in ARTIFACT_LOADERS:
+                raise ValueError(f"Unknown artifact loader: {layout_loader}")
+        self.name = name
+        self.artifacts = dict(artifacts)
+        self.build = build
+        self.loader = loader
+        self.canary = canary
+        self.release = release
+        self.fallback = (dict(fallback[0]), fallback[1]) if fallback is not None else None
+
+    def _layouts(self):
+        return [(self.artifacts, self.loader)] + ([self.fallback] if self.fallback is not None else [])
+
+    def check_artifacts(self, artifacts):
+        """
+        Validate caller-supplied artifact overrides before any file is read, e.g. from an admin request.
+
+        Raises:
+            ValueError for unknown artifact names, a mix of file layouts, a missing file, or a path
+            outside the directories of the declared artifacts (symlinks resolved)
+        """
+        self.layout(artifacts)
+        directories = sorted({os.path.dirname(os.path.realpath(path)) for paths, _ in self._layouts() for path in paths.values()})
+        for key, path in artifacts.items():
+            resolved = os.path.realpath(path)
+            if not any(os.path.commonpath([resolved, directory]) == directory for directory in directories):
+                raise ValueError(f"Artifact {key} for {self.name} must be inside {' or '.join(directories)}")
+            if not os.path.isfile(resolved):
+                raise ValueError(f"Artifact {key} for {self.name} not found: {path}")
+
+    def layout(self, artifacts=None):
+        """
+        The artifact paths and loader a load would use.
+
+        Args:
+            artifacts: Optional mapping overriding some artifact paths; its keys pick the layout
+
+        Returns:
+            (paths, loader), with the overrides applied
+        """
+        layouts = self._layouts()
+        if artifacts:
+            for paths, loader in layouts:
+                if set(artifacts) <= set(paths):
+                    return dict(paths, **artifacts), loader
+            known = sorted(set().union(*(paths for paths, _ in layouts)))
+            unknown = sorted(set(artifacts) - set(known))
+            if unknown:
+                raise ValueError(f"Unknown artifact for {self.name}: {', '.join(unknown)}")
+            raise ValueError(f"Artifacts for {self.name} mix file layouts: {', '.join(sorted(artifacts))}")
+        if self.fallback is not None and not all(os.path.exists(path) for path in self.artifacts.values()):
+            return dict(self.fallback[0]), self.fallback[1]
+        return dict(self.artifacts), self.loader
+
+    def signature(self):
+        """artifact_signature() of the files a load would read now."""
+        paths, _ = self.layout()
+        return artifact_signature(paths.values())
+
+    def load(self, artifacts=None):
+        """
+        Read, build and canary-check one version of the model.
+
+        Args:
+            artifacts: Optional mapping overriding some artifact paths, e.g. a candidate for A/B testing
+
+        Returns:
+            (version, value), where version is a short hash of the artifact contents: the file's own
+            SHA-256 for a single artifact, otherwise a hash of every artifact's name and SHA-256
+        """
+        paths, loader = self.layout(artifacts)
+        load = ARTIFACT_LOADERS[loader]
+        loaded, digests = {}, {}
+        for key in sorted(paths):
+            loaded[key], digests[key] = load(paths[key])
+
+        if len(digests) == 1:
+            version = next(iter(digests.values()))
+        else:
+            combined = ''.join(f"{key}\0{digest}\n" for key, digest in digests.items())
+            version = hashlib.sha256(combined.encode('utf-8')).hexdigest()
+        value = self.build(loaded) if self.build is not None else loaded
+        if self.canary is not None:
+            self.canary(value)
+        return version[:12], value
+
+def artifact_signature(paths):
+    """Cheap change detector for a set of files: (mtime_ns, size) of each, None if missing."""
+    signature = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            signature.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+class ModelVersion:
+    def __init__(self, version, value, load_seconds, artifacts):
+        self.version = version
+        self.value = value
+        self.load_seconds = load_seconds
+        self.loaded_at = time.time()
+        self.artifacts = artifacts
+
+class _Slot:
+    def __init__(self, spec):
+        self.spec = spec
+        self.lock = threading.Lock()     # serializes loads into this slot
+        self.versions = OrderedDict()    # version -> ModelVersion, oldest first
+        self.routing = ()                # ((ModelVersion, cumulative weight), ...), replaced atomically
+        self.signature = None            # spec.signature() of the default paths when last loaded
+        self.pending_signature = None    # a change seen by the watcher, reloaded once it is stable
+        self.reloads = 0
+        self.last_error = None
+
+class ModelRegistry:
+    """
+    Thread-safe, load-on-first-use store of models declared with ModelSpec.
+
+    Args:
+        max_versions: Versions kept per model; the oldest version without traffic is dropped beyond this
+    """
+
+    def __init__(self, max_versions=2):
+        self.max_versions = max_versions
+        self._slots = {}
+        self._watch_interval = 0.0
+        self._watcher_pid = None
+        self._watcher_lock = threading.Lock()
+
+    def register(self, spec):
+        if spec.name in self._slots:
+            raise ValueError(f"Model already registered: {spec.name}")
+        self._slots[spec.name] = _Slot(spec)
+        return spec
+
+    def names(self):
+        return list(self._slots)
+
+    def spec(self, name):
+        """The ModelSpec registered under name, e.g. to load a version outside the registry."""
+        return self._slot(name).spec
+
+    def _slot(self, name):
+        try:
+            return self._slots[name]
+        except KeyError:
+            raise KeyError(f"Unknown model: {name}") from None
+
+    def _load_version(self, slot, artifacts=None):
+        """Load a version into the slot (caller holds slot.lock). Returns (ModelVersion, is_new)."""
+        signature = slot.spec.signature()
+        start = time.perf_counter()
+        try:
+            version, value = slot.spec.load(artifacts)
+        except Exception as e:
+            slot.last_error = f"{type(e).__name__}: {e}"
+            raise ModelLoadError(f"Could not load {slot.spec.name}: {e}") from e
+        slot.last_error = None
+        if not artifacts:
+            slot.signature = signature
+        if version in slot.versions:
+            return slot.versions[version], False
+
+        paths, _ = slot.spec.layout(artifacts)
+        loaded = ModelVersion(version, value, time.perf_counter() - start, paths)
+        slot.versions[version] = loaded
+        return loaded, True
+
+    def _set_routing(self, slot, weights):
+        total = float(sum(weights.values()))
+        routing, cumulative = [], 0.0
+        for version, weight in weights.items():
+            if weight > 0:
+                cumulative += weight / total
+                routing.append((slot.versions[version], cumulative))
+        slot.routing = tuple(routing)
+        self._trim(slot)
+
+    def _trim(self, slot, keep=None):
+        serving = {entry.version for entry, _ in slot.routing} | {keep}
+        for version in list(slot.versions):
+            if len(slot.versions) <= self.max_versions:
+                break
+            if version not in serving:
+                dropped = slot.versions.pop(version)
+                if slot.spec.release is not None:
+                    slot.spec.release(dropped.value)
+
+    def select(self, name, version=None):
+        """
+        Pick the ModelVersion to serve a request, loading the model on first use.
+
+        Args:
+            version: Pin a specific loaded version; otherwise one is drawn according to the traffic split
+        """
+        self._ensure_watcher()
+        slot = self._slot(name)
+        if not slot.routing:
+            with slot.lock:
+                if not slot.routing:
+                    loaded, _ = self._load_version(slot)
+                    self._set_routing(slot, {loaded.version: 1})
+
+        if version is not None:
+            try:
+                return slot.versions[version]
+            except KeyError:
+                raise KeyError(f"Unknown version for {name}: {version}") from None
+
+        routing = slot.routing
+        if len(routing) == 1:
+            return routing[0][0]
+        draw = random.random()
+        for entry, cumulative in routing:
+            if draw < cumulative:
+                return entry
+        return routing[-1][0]
+
+    def get(self, name):
+        """Return the built model for a request, loading it on first use."""
+        return self.select(name).value
+
+    def is_loaded(self, name):
+        return bool(self._slot(name).routing)
+
+    def loaded_items(self):
+        """(name@version, model) pairs for every loaded version, without triggering any loads."""
+        return [
+            (f"{name}@{version}", entry.value)
+            for name, slot in self._slots.items()
+            for version, entry in list(slot.versions.items())
+        ]
+
+    def reload(self, name, artifacts=None, activate=True):
+        """
+        Load the model's artifacts again and swap the new version in if it passes its canary check.
+
+        Args:
+            artifacts: Optional mapping overriding artifact paths, e.g. to stage a candidate model
+            activate: Send all traffic to the new version; when False it is only loaded
+                (use set_traffic to split traffic or a pinned version to try it)
+
+        Returns:
+            The ModelVersion that was loaded
+        Raises:
+            ModelLoadError if loading or the canary check fails; the serving version is unchanged
+        """
+        slot = self._slot(name)
+        with slot.lock:
+            loaded, is_new = self._load_version(slot, artifacts)
+            slot.reloads += int(is_new)
+            if activate:
+                self._set_routing(slot, {loaded.version: 1})
+            else:
+                self._trim(slot, keep=loaded.version)
+        return loaded
+
+    def set_traffic(self, name, weights):
+        """
+        Split traffic between loaded versions, e.g. {'3f2a9c1d0b7e': 90, '9d8e7f6a5b4c': 10}.
+
+        Raises ValueError for unknown versions or weights that are negative or all zero.
+        """
+        slot = self._slot(name)
+        with slot.lock:
+            unknown = [v for v in weights if v not in slot.versions]
+            if unknown:
+                raise ValueError(f"Unknown version for {name}: {', '.join(unknown)}")
+            if any(not isinstance(w, (int, float)) or isinstance(w, bool) or w < 0 for w in weights.values()):
+                raise ValueError("Traffic weights must be non-negative numbers")
+            if not sum(weights.values()) > 0:
+                raise ValueError("At least one version needs a positive weight")
+            self._set_routing(slot, weights)
+
+    def warm_up(self, names=None):
+        """
+        Load models ahead of the first request.
+
+        Args:
+            names: Iterable of model names, or None for every registered model
+
+        Returns:
+            Seconds each model took to load (0 if it was already loaded)
+        """
+        timings = {}
+        for name in self.names() if names is None else names:
+            was_loaded = self.is_loaded(name)
+            entry = self.select(name)
+            timings[name] = 0.0 if was_loaded else entry.load_seconds
+        return timings
+
+    def watch(self, interval):
+        """
+        Reload models whose artifact files change, checking every interval seconds (0 disables).
+
+        A change is only acted on once it has been stable for one interval, so a model that is
+        still being written is not picked up half way. The thread is started on first use and
+        again in each forked worker.
+        """
+        self._watch_interval = interval
+        self._ensure_watcher()
+
+    def _ensure_watcher(self):
+        if self._watch_interval <= 0 or self._watcher_pid == os.getpid():
+            return
+        with self._watcher_lock:
+            if self._watcher_pid != os.getpid():
+                threading.Thread(target=self._watch_loop, name='model-watcher', daemon=True).start()
+                self._watcher_pid = os.getpid()
+
+    def _watch_loop(self):
+        while True:
+            time.sleep(self._watch_interval)
+            self.check_for_changes()
+
+    def check_for_changes(self):
+        """Reload every loaded model whose artifacts changed since the previous check. Returns the names reloaded."""
+        reloaded = []
+        for name, slot in self._slots.items():
+            if not slot.routing:
+                continue
+            # Covers a switch of layout too, e.g. a fused pipeline written next to older files
+            signature = slot.spec.signature()
+            if signature == slot.signature or None in signature:
+                slot.pending_signature = None
+                continue
+            if signature != slot.pending_signature:
+                slot.pending_signature = signature
+                continue
+            slot.pending_signature = None
+            try:
+                self.reload(name)
+                reloaded.append(name)
+            except ModelLoadError:
+                # Keep serving the current version; the error is reported in stats()
+                slot.signature = signature
+        return reloaded
+
+    def stats(self):
+        stats = {}
+        for name, slot in self._slots.items():
+            weights, previous = {}, 0.0
+            for entry, cumulative in slot.routing:
+                weights[entry.version] = round(cumulative - previous, 6)
+                previous = cumulative
+            stats[name] = {
+                'loaded': bool(slot.routing),
+                'traffic': weights,
+                'versions': {
+                    version: {
+                        'load_ms': round(entry.load_seconds * 1000.0, 3),
+                        'loaded_at': entry.loaded_at,
+                        'artifacts': {key: os.path.basename(path) for key, path in entry.artifacts.items()},
+                    }
+                    for version, entry in list(slot.versions.items())
+                },
+                'reloads': slot.reloads,
+                'last_error': slot.last_error,
+            }
+        return stats
+
+def model_names_from_env(value):
+    """Parse a model list setting such as MODEL_WARMUP: '' -> nothing, 'all' -> None (every model), else a comma separated list."""
+    value = (value or '').strip()
+    if not value:
+        return []
+    if value == 'all':
+        return None
+    return [name.strip() for name in value.split(',') if name.strip()]
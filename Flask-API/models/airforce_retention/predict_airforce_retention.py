@@ -8,84 +8,42 @@ Usage:
     python predict_airforce_retention.py
 """
 
-import pandas as pd
-import joblib
+import os
 import sys
 
-def load_model_artifacts():
-    """Load all model artifacts from the models directory."""
-    try:
-        model = joblib.load('models/airforce_retention_model.pkl')
-        scaler = joblib.load('models/airforce_retention_scaler.pkl')
-        encoders = joblib.load('models/airforce_retention_encoders.pkl')
-        feature_info = joblib.load('models/airforce_retention_feature_info.pkl')
-        return model, scaler, encoders, feature_info
-    except FileNotFoundError as e:
-        print(f"Error: Could not find model files. Please run train_airforce_retention_model.py first.")
-        print(f"Details: {e}")
-        sys.exit(1)
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
-def prepare_input(data, encoders, scaler, feature_columns, requires_scaling):
-    """
-    Prepare input data for prediction.
+# retention_pipeline lives at the Flask-API root, two levels up
+sys.path.insert(0, os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..')))
+from retention_pipeline import load_retention_pipeline
 
-    Args:
-        data: Dictionary with airman profile information
-        encoders: Dictionary of label encoders for categorical variables
-        scaler: StandardScaler for numerical features
-        feature_columns: List of feature column names
-        requires_scaling: Boolean indicating if scaling is needed
+def load_model_artifacts(model_dir=SCRIPT_DIR):
+    """
+    Load the fused retention pipeline from the directory the training script writes it to.
 
     Returns:
-        Prepared DataFrame ready for prediction
+        Dictionary with the pipeline, its input schema and training metadata
     """
-    # Create DataFrame from input
-    df = pd.DataFrame([data])
-
-    # Encode categorical variables
-    categorical_columns = ['gender', 'marital_status', 'grade_rank']
-    for col in categorical_columns:
-        if col not in data:
-            raise ValueError(f"Missing required field: {col}")
-        df[col + '_encoded'] = encoders[col].transform(df[col])
-
-    # Extract rank level from grade_rank
-    df['rank_level'] = df['grade_rank'].str.extract(r'E-(\d+)').astype(int)
-
-    # Select features in correct order
-    features = df[feature_columns]
-
-    # Apply scaling if required (for Logistic Regression)
-    if requires_scaling:
-        features = scaler.transform(features)
-
-    return features
+    try:
+        return load_retention_pipeline(model_dir)
+    except FileNotFoundError as e:
+        print(f"Error: Could not find model files. Please run train_airforce_retention_model.py first.")
+        print(f"Details: {e}")
+        sys.exit(1)
 
-def predict_retention(data, model, scaler, encoders, feature_info):
+def predict_retention(data, pipeline):
     """
     Predict retention for an airman.
 
     Args:
         data: Dictionary with airman profile information
-        model: Trained ML model
-        scaler: StandardScaler object
-        encoders: Dictionary of label encoders
-        feature_info: Dictionary with feature column names and model info
+        pipeline: Fused pipeline (encoding, scaling and model) from load_model_artifacts
 
     Returns:
         Dictionary with prediction and probability
     """
-    features = prepare_input(
-        data,
-        encoders,
-        scaler,
-        feature_info['feature_columns'],
-        feature_info['requires_scaling']
-    )
-
-    # Make prediction
-    prediction = model.predict(features)[0]
-    probabilities = model.predict_proba(features)[0]
+    probabilities = pipeline.predict_proba([data])[0]
+    prediction = pipeline.classes_[probabilities.argmax()]
 
     return {
         'retained': bool(prediction),
@@ -101,9 +59,10 @@ def main():
 
     # Load model artifacts
     print("\nLoading model artifacts...")
-    model, scaler, encoders, feature_info = load_model_artifacts()
-    print(f"Model type: {feature_info['model_type']}")
-    print(f"Features used: {len(feature_info['feature_columns'])}")
+    artifact = load_model_artifacts()
+    pipeline, schema = artifact['pipeline'], artifact['schema']
+    print(f"Model type: {schema['model_type']}")
+    print(f"Features used: {len(schema['feature_columns'])}")
 
     # Example predictions for different airman profiles
     test_cases = [
@@ -170,7 +129,7 @@ def main():
             print(f"  {key}: {value}")
 
         # Make prediction
-        result = predict_retention(case, model, scaler, encoders, feature_info)
+        result = predict_retention(case, pipeline)
 
         print(f"\n{'PREDICTION RESULT':^80}")
         print("-" * 80)
@@ -0,0 +1,299 @@
+"""
+Air Force Retention Bulk Scoring
+
+Scores a CSV or Parquet file of airman profiles with the trained retention
+model. The input is streamed in chunks; each chunk is encoded and scored as
+a whole and appended to the output before the next one is read, so memory
+stays bounded by the chunk size however large the file is. Chunks can be
+spread across worker processes with --workers.
+
+Rows that cannot be scored (missing or invalid fields, or CSV lines with
+too many fields) are written to a separate rejects file with the reason.
+
+Usage:
+    python score_airforce_retention.py airmen.csv scores.csv
+    python score_airforce_retention.py airmen.parquet scores.parquet --chunk-size 200000 --workers 4
+"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import os
+import re
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# retention_pipeline lives at the Flask-API root, two levels up
+sys.path.insert(0, os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..')))
+from linear_scorer import build_scorer
+from retention_features import RetentionFeatureTransformer
+from retention_pipeline import load_retention_pipeline, pipeline_parts
+
+# Added to the copied input columns; named so they cannot be mistaken for the input's own, e.g. its 'retained' label
+ROW_COLUMN = 'row_number'
+REJECT_COLUMN = 'reject_reason'
+RESULT_COLUMNS = ['predicted_retained', 'retention_probability', 'non_retention_probability']
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Score a CSV or Parquet file of airmen with the retention model')
+    parser.add_argument('input', help='.csv or .parquet file of airman profiles')
+    parser.add_argument('output', help='.csv or .parquet file for the scores')
+    parser.add_argument('--rejects', help='Where rows that cannot be scored go (default: <output>.rejects.csv)')
+    parser.add_argument('--model-dir', default=SCRIPT_DIR, help='Directory holding the trained model')
+    parser.add_argument('--chunk-size', type=int, default=100000, help='Rows read, scored and written at a time')
+    parser.add_argument('--workers', type=int, default=1, help='Processes scoring chunks in parallel')
+    parser.add_argument('--columns', help='Input columns copied to the output, comma separated (default: all)')
+    args = parser.parse_args(argv)
+
+    # Checked against the input's header now, rather than failing in the first chunk
+    try:
+        header = input_columns(args.input)
+    except (OSError, ValueError) as e:
+        parser.error(f"cannot read the header of {args.input}: {e}")
+    copied = header
+    if args.columns:
+        copied = column_list(args.columns)
+        unknown = [col for col in copied if col not in header]
+        if unknown:
+            parser.error(f"--columns: {', '.join(unknown)} not in {args.input} (columns: {', '.join(header)})")
+    # Rejects keep every input column; scores keep the copied ones
+    clashes = [col for col in header if col in (ROW_COLUMN, REJECT_COLUMN)]
+    clashes += [col for col in copied if col in RESULT_COLUMNS]
+    if clashes:
+        parser.error(f"{args.input} already has {', '.join(clashes)}, which the scores are written to; "
+                     f"rename it or leave it out with --columns")
+    return args
+
+def column_list(value):
+    return [col.strip() for col in value.split(',') if col.strip()]
+
+def input_columns(path):
+    """Column names of a CSV or Parquet file, read from its header or schema."""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(path).schema_arrow.names
+    return [str(col) for col in pd.read_csv(path, nrows=0).columns]
+
+class RetentionChunkScorer:
+    """Vectorized preprocessing and predict_proba for one DataFrame chunk at a time."""
+
+    def __init__(self, model_dir):
+        encoders, scaler, feature_columns, model = pipeline_parts(load_retention_pipeline(model_dir)['pipeline'])
+        self.transformer = RetentionFeatureTransformer(encoders, scaler, feature_columns, scaler is not None)
+        self.scorer = build_scorer(model, self.transformer.scale, self.transformer.offset)
+
+    def score(self, chunk, first_row, keep_columns=None):
+        """
+        Returns:
+            (scored, rejects) DataFrames; both carry each row's 0-based position in the input as ROW_COLUMN
+        """
+        n_rows = len(chunk)
+        columns = {col: chunk[col].to_numpy() for col in chunk.columns}
+        features, valid, errors = self.transformer.encode_columns(columns, n_rows)
+        rows = np.arange(first_row, first_row + n_rows)
+
+        scored = chunk.loc[valid, keep_columns if keep_columns is not None else chunk.columns].reset_index(drop=True)
+        scored.insert(0, ROW_COLUMN, rows[valid])
+        if len(features):
+            probabilities = self.scorer.predict_proba(features)
+            scored['predicted_retained'] = self.scorer.classes_[probabilities.argmax(axis=1)].astype(bool)
+            scored['retention_probability'] = probabilities[:, 1]
+            scored['non_retention_probability'] = probabilities[:, 0]
+        else:
+            scored = scored.assign(**{col: pd.Series(dtype=float) for col in RESULT_COLUMNS})
+
+        rejects = chunk.loc[~valid].reset_index(drop=True)
+        rejects.insert(0, REJECT_COLUMN, ['; '.join(errors[i]) for i in np.flatnonzero(~valid)])
+        rejects.insert(0, ROW_COLUMN, rows[~valid])
+        return scored, rejects
+
+def read_chunks(path, chunk_size, malformed):
+    """
+    Yield DataFrame chunks of a CSV or Parquet file.
+
+    CSV lines with more fields than the header are skipped by the parser; their messages are appended to malformed.
+    """
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+        return
+
+    reader = pd.read_csv(path, chunksize=chunk_size, on_bad_lines='warn')
+    while True:
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always', pd.errors.ParserWarning)
+            chunk = next(reader, None)
+        for warning in caught:
+            malformed.extend(line for line in str(warning.message).splitlines() if line)
+        if chunk is None:
+            return
+        yield chunk
+
+def _have_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+class ChunkWriter:
+    """
+    Appends DataFrames to a CSV or Parquet file, writing the header or schema with the first one.
+
+    CSV is written with pyarrow when it is installed (several times faster than DataFrame.to_csv;
+    booleans come out as true/false), otherwise with pandas.
+
+    Args:
+        columns: Align every frame to these columns (missing ones are left empty); set before the first write
+        use_arrow: False forces pandas for CSV, e.g. for rejects whose column types vary between chunks
+    """
+
+    def __init__(self, path, columns=None, use_arrow=True):
+        self.path = path
+        self.columns = columns
+        self.parquet = path.endswith('.parquet')
+        self.use_arrow = self.parquet or (use_arrow and _have_pyarrow())
+        self.writer = None
+        self.schema = None
+        self.empty = None
+        self.rows = 0
+        if os.path.exists(path):
+            os.remove(path)
+
+    def _arrow_writer(self, schema):
+        import pyarrow.csv
+        import pyarrow.parquet
+
+        if self.parquet:
+            return pyarrow.parquet.ParquetWriter(self.path, schema)
+        return pyarrow.csv.CSVWriter(self.path, schema, write_options=pyarrow.csv.WriteOptions(quoting_style='needed'))
+
+    def write(self, frame):
+        if self.columns is not None:
+            frame = frame.reindex(columns=self.columns)
+        if self.use_arrow:
+            import pyarrow as pa
+
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self.writer is None:
+                if not len(frame):
+                    # Text columns of an empty frame have no type yet; the schema comes from the first rows
+                    self.empty = table
+                    return
+                self._open(table.schema)
+            # A column can be inferred differently in a later chunk, e.g. float once it held a rejected blank
+            self.writer.write_table(table.cast(self.schema))
+        else:
+            frame.to_csv(self.path, mode='a', header=not os.path.exists(self.path), index=False)
+        self.rows += len(frame)
+
+    def _open(self, schema):
+        import pyarrow as pa
+
+        # A column with no values at all in the first rows is written as text
+        self.schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field for field in schema])
+        self.writer = self._arrow_writer(self.schema)
+
+    def close(self):
+        if self.writer is None and self.empty is not None:
+            # Nothing was written, e.g. every row was rejected: a file with just the header or schema
+            self._open(self.empty.schema)
+            self.writer.write_table(self.empty.cast(self.schema))
+        if self.writer is not None:
+            self.writer.close()
+
+# Per-process scorer for --workers > 1, loaded once when the worker starts
+_worker_scorer = None
+
+def _init_worker(model_dir):
+    global _worker_scorer
+    _worker_scorer = RetentionChunkScorer(model_dir)
+
+def _score_in_worker(chunk, first_row, keep_columns):
+    return _worker_scorer.score(chunk, first_row, keep_columns)
+
+def malformed_rejects(messages):
+    """Rejects rows for CSV lines the parser skipped; their position among the data rows is unknown."""
+    errors = []
+    for message in messages:
+        match = re.match(r'Skipping line (\d+): (.*)', message)
+        errors.append(f"Line {match.group(1)}: {match.group(2)}" if match else message)
+    return pd.DataFrame({ROW_COLUMN: pd.Series([None] * len(errors), dtype='Int64'), REJECT_COLUMN: errors})
+
+def score_file(args):
+    """
+    Stream args.input through the model into args.output and the rejects file.
+
+    Returns:
+        Dictionary with rows read, scored and rejected
+    """
+    keep_columns = column_list(args.columns) if args.columns else None
+    rejects_path = args.rejects or f"{os.path.splitext(args.output)[0]}.rejects.csv"
+    output, rejects = ChunkWriter(args.output), ChunkWriter(rejects_path, use_arrow=False)
+    malformed = []
+    chunks = read_chunks(args.input, args.chunk_size, malformed)
+
+    def numbered(chunks):
+        first_row = 0
+        for chunk in chunks:
+            if rejects.columns is None:
+                # Skipped CSV lines have no fields, so rejects are aligned to the input's columns
+                rejects.columns = [ROW_COLUMN, REJECT_COLUMN] + list(chunk.columns)
+            yield chunk, first_row
+            first_row += len(chunk)
+
+    def write(result):
+        scored, rejected = result
+        output.write(scored)
+        if len(rejected):
+            rejects.write(rejected)
+        if malformed:
+            rejects.write(malformed_rejects(malformed))
+            malformed.clear()
+
+    try:
+        if args.workers > 1:
+            # At most two chunks per worker are in flight, so memory stays bounded while results are written in order
+            with ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=(args.model_dir,)) as pool:
+                pending = deque()
+                for chunk, first_row in numbered(chunks):
+                    pending.append(pool.submit(_score_in_worker, chunk, first_row, keep_columns))
+                    if len(pending) >= 2 * args.workers:
+                        write(pending.popleft().result())
+                while pending:
+                    write(pending.popleft().result())
+        else:
+            scorer = RetentionChunkScorer(args.model_dir)
+            for chunk, first_row in numbered(chunks):
+                write(scorer.score(chunk, first_row, keep_columns))
+        if malformed:
+            rejects.write(malformed_rejects(malformed))
+    finally:
+        output.close()
+        rejects.close()
+
+    return {'scored': output.rows, 'rejected': rejects.rows, 'rejects_path': rejects_path}
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+    summary = score_file(args)
+    elapsed = time.perf_counter() - start
+    total = summary['scored'] + summary['rejected']
+
+    print(f"Scored {summary['scored']} rows into {args.output}")
+    if summary['rejected']:
+        print(f"Rejected {summary['rejected']} rows into {summary['rejects_path']}")
+    print(f"{total} rows in {elapsed:.2f}s ({total / elapsed:,.0f} rows/s)")
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,37 @@
+"""
+Air Force Retention Model Training
+
+Compares the candidate models with cross-validation, tunes the best one and
+saves it, with its encoders and scaler, as one fused pipeline artifact
+(airforce_retention_pipeline.joblib) that the Flask API loads. Candidate fits and CV folds run in
+parallel across cores. Preprocessed matrices and fold splits are cached on
+disk, and every finished fit is checkpointed, so re-running an interrupted
+search only fits what is missing. Wall-clock time is reported per phase.
+
+With --incremental, the last trained model is updated from the records
+ingested into the retention store since it was trained, instead of
+retraining from scratch: tree ensembles grow new trees fitted on the new
+records (warm start), logistic regression takes SGD steps from its current
+coefficients, and the scaler statistics are updated with partial_fit. The
+updated model is published only if it scores no worse on the holdout set
+(the original test split plus a share of every new batch) than the current
+one. What an update builds on is kept in airforce_retention_training_state.joblib
+beside the pipeline.
+
+Usage:
+    python train_airforce_retention_model.py
+    python train_airforce_retention_model.py --search halving --n-jobs 4
+    python train_airforce_retention_model.py --search random --n-iter 12 --output-dir /tmp/candidate
+    python train_airforce_retention_model.py --data retention_store   # partitioned store from retention_store.py
+    python train_airforce_retention_model.py --data retention_store --incremental
+"""
+
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split, cross_val_score, GridSearchCV
+from sklearn.base import clone
+from sklearn.model_selection import train_test_split, StratifiedKFold, ParameterGrid, ParameterSampler
 from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.linear_model import LogisticRegression
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
 from sklearn.metrics import (
     classification_report,
@@ -11,57 +40,35 @@ from sklearn.metrics import (
     precision_score,
     recall_score,
     f1_score,
-    roc_auc_score,
-    roc_curve
+    roc_auc_score
 )
+from contextlib import contextmanager
+import argparse
+import copy
+import hashlib
 import joblib
+from joblib import Parallel, delayed
+import json
+import math
 import os
+import sys
+import time
 import warnings
 warnings.filterwarnings('ignore')
 
-# Load the data
-df = pd.read_csv('airforce_retention_data.csv')
-
-print("=" * 80)
-print("AIRFORCE RETENTION MODEL TRAINING")
-print("=" * 80)
-
-# Basic dataset info
-print(f"\nDataset shape: {df.shape}")
-print(f"\nColumn names and types:")
-print(df.dtypes)
-print(f"\nMissing values:")
-print(df.isnull().sum())
-print(f"\nTarget variable distribution:")
-print(df['retained'].value_counts())
-print(f"Retention rate: {df['retained'].sum() / len(df) * 100:.2f}%")
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# Data preprocessing
-print("\n" + "=" * 80)
-print("DATA PREPROCESSING")
-print("=" * 80)
+# mmap_artifacts and retention_pipeline live at the Flask-API root, two levels up
+sys.path.insert(0, os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..')))
+from mmap_artifacts import flatten_model, save_mmap_artifact
+from retention_pipeline import LEGACY_FILENAMES, PIPELINE_FILENAME, build_pipeline, save_pipeline_artifact
+from retention_store import COLUMNS, RetentionStore, load_retention_frame
 
-# Create a copy for preprocessing
-df_processed = df.copy()
+TRAINING_STATE_FILENAME = 'airforce_retention_training_state.joblib'
+HOLDOUT_SIZE = 0.2
 
-# Convert target to binary (True/False -> 1/0)
-df_processed['retained'] = df_processed['retained'].astype(int)
-
-# Encode categorical variables
-label_encoders = {}
 categorical_columns = ['gender', 'marital_status', 'grade_rank']
 
-for col in categorical_columns:
-    le = LabelEncoder()
-    df_processed[col + '_encoded'] = le.fit_transform(df_processed[col])
-    label_encoders[col] = le
-    print(f"\n{col} encoding:")
-    for i, label in enumerate(le.classes_):
-        print(f"  {label} -> {i}")
-
-# Feature engineering: Extract rank level from grade_rank
-df_processed['rank_level'] = df_processed['grade_rank'].str.extract(r'E-(\d+)').astype(int)
-
 # Select features for modeling
 feature_columns = [
     'age',
@@ -75,230 +82,32 @@ feature_columns = [
     'bonuses_received'
 ]
 
-X = df_processed[feature_columns]
-y = df_processed['retained']
-
-print(f"\nFeature set shape: {X.shape}")
-print(f"Features used: {feature_columns}")
-
-# Split the data
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42, stratify=y
-)
-
-print(f"\nTraining set size: {X_train.shape[0]}")
-print(f"Test set size: {X_test.shape[0]}")
-
-# Scale features
-scaler = StandardScaler()
-X_train_scaled = scaler.fit_transform(X_train)
-X_test_scaled = scaler.transform(X_test)
-
-# Train multiple models
-print("\n" + "=" * 80)
-print("MODEL TRAINING AND EVALUATION")
-print("=" * 80)
-
-models = {
-    'Logistic Regression': LogisticRegression(random_state=42, max_iter=1000),
-    'Random Forest': RandomForestClassifier(n_estimators=100, random_state=42, max_depth=10),
-    'Gradient Boosting': GradientBoostingClassifier(n_estimators=100, random_state=42, max_depth=5)
-}
-
-results = {}
-
-for name, model in models.items():
-    print(f"\n{'-' * 80}")
-    print(f"Training {name}...")
-    print(f"{'-' * 80}")
-
-    # Train the model
-    if name == 'Logistic Regression':
-        model.fit(X_train_scaled, y_train)
-        y_pred = model.predict(X_test_scaled)
-        y_pred_proba = model.predict_proba(X_test_scaled)[:, 1]
-
-        # Cross-validation for Logistic Regression
-        cv_scores = cross_val_score(model, X_train_scaled, y_train, cv=5, scoring='f1')
-    else:
-        model.fit(X_train, y_train)
-        y_pred = model.predict(X_test)
-        y_pred_proba = model.predict_proba(X_test)[:, 1]
-
-        # Cross-validation for tree-based models
-        cv_scores = cross_val_score(model, X_train, y_train, cv=5, scoring='f1')
-
-    # Evaluate
-    accuracy = accuracy_score(y_test, y_pred)
-    precision = precision_score(y_test, y_pred)
-    recall = recall_score(y_test, y_pred)
-    f1 = f1_score(y_test, y_pred)
-    roc_auc = roc_auc_score(y_test, y_pred_proba)
-
-    print(f"\nCross-validation F1 Score: {cv_scores.mean():.4f} (+/- {cv_scores.std():.4f})")
-    print(f"Test Accuracy: {accuracy:.4f}")
-    print(f"Test Precision: {precision:.4f}")
-    print(f"Test Recall: {recall:.4f}")
-    print(f"Test F1 Score: {f1:.4f}")
-    print(f"Test ROC AUC: {roc_auc:.4f}")
-    print(f"\nClassification Report:")
-    print(classification_report(y_test, y_pred, target_names=['Not Retained', 'Retained']))
-    print(f"\nConfusion Matrix:")
-    cm = confusion_matrix(y_test, y_pred)
-    print(cm)
-    print(f"  True Negatives: {cm[0,0]}, False Positives: {cm[0,1]}")
-    print(f"  False Negatives: {cm[1,0]}, True Positives: {cm[1,1]}")
-
-    results[name] = {
-        'model': model,
-        'accuracy': accuracy,
-        'precision': precision,
-        'recall': recall,
-        'f1': f1,
-        'roc_auc': roc_auc,
-        'cv_scores': cv_scores,
-        'y_pred': y_pred,
-        'y_pred_proba': y_pred_proba
+# Candidate models; only logistic regression is trained on scaled features
+def make_candidates(seed):
+    return {
+        'Logistic Regression': LogisticRegression(random_state=seed, max_iter=1000),
+        'Random Forest': RandomForestClassifier(n_estimators=100, random_state=seed, max_depth=10),
+        'Gradient Boosting': GradientBoostingClassifier(n_estimators=100, random_state=seed, max_depth=5)
     }
 
-# Select best model based on F1 score (better for potentially imbalanced data)
-best_model_name = max(results, key=lambda x: results[x]['f1'])
-best_model = results[best_model_name]['model']
-
-print("\n" + "=" * 80)
-print(f"BEST MODEL: {best_model_name}")
-print(f"F1 Score: {results[best_model_name]['f1']:.4f}")
-print(f"ROC AUC: {results[best_model_name]['roc_auc']:.4f}")
-print(f"Accuracy: {results[best_model_name]['accuracy']:.4f}")
-print(f"Precision: {results[best_model_name]['precision']:.4f}")
-print(f"Recall: {results[best_model_name]['recall']:.4f}")
-print("=" * 80)
-
-# Feature importance (for tree-based models)
-if best_model_name in ['Random Forest', 'Gradient Boosting']:
-    print("\nFeature Importances:")
-    feature_importance = pd.DataFrame({
-        'feature': feature_columns,
-        'importance': best_model.feature_importances_
-    }).sort_values('importance', ascending=False)
-    print(feature_importance)
-
-# Hyperparameter tuning for best model
-print("\n" + "=" * 80)
-print("HYPERPARAMETER TUNING")
-print("=" * 80)
-
-if best_model_name == 'Random Forest':
-    print("\nPerforming Grid Search for Random Forest...")
-    param_grid = {
+SCALED_MODELS = {'Logistic Regression'}
+MODEL_KEYS = {'logistic_regression': 'Logistic Regression', 'random_forest': 'Random Forest', 'gradient_boosting': 'Gradient Boosting'}
+
+# Hyperparameter search spaces for the models that get tuned
+PARAM_GRIDS = {
+    'Random Forest': {
         'n_estimators': [100, 200, 300],
         'max_depth': [10, 20, None],
         'min_samples_split': [2, 5],
         'min_samples_leaf': [1, 2]
-    }
-    grid_search = GridSearchCV(
-        RandomForestClassifier(random_state=42),
-        param_grid,
-        cv=5,
-        scoring='f1',
-        n_jobs=-1,
-        verbose=1
-    )
-    grid_search.fit(X_train, y_train)
-    best_model = grid_search.best_estimator_
-
-    print(f"\nBest parameters: {grid_search.best_params_}")
-    print(f"Best CV F1 score: {grid_search.best_score_:.4f}")
-
-    # Re-evaluate with tuned model
-    y_pred = best_model.predict(X_test)
-    y_pred_proba = best_model.predict_proba(X_test)[:, 1]
-
-    print(f"\nTuned model performance:")
-    print(f"  Accuracy: {accuracy_score(y_test, y_pred):.4f}")
-    print(f"  Precision: {precision_score(y_test, y_pred):.4f}")
-    print(f"  Recall: {recall_score(y_test, y_pred):.4f}")
-    print(f"  F1 Score: {f1_score(y_test, y_pred):.4f}")
-    print(f"  ROC AUC: {roc_auc_score(y_test, y_pred_proba):.4f}")
-
-elif best_model_name == 'Gradient Boosting':
-    print("\nPerforming Grid Search for Gradient Boosting...")
-    param_grid = {
+    },
+    'Gradient Boosting': {
         'n_estimators': [100, 200],
         'max_depth': [3, 5, 7],
         'learning_rate': [0.01, 0.1, 0.2],
         'min_samples_split': [2, 5]
     }
-    grid_search = GridSearchCV(
-        GradientBoostingClassifier(random_state=42),
-        param_grid,
-        cv=5,
-        scoring='f1',
-        n_jobs=-1,
-        verbose=1
-    )
-    grid_search.fit(X_train, y_train)
-    best_model = grid_search.best_estimator_
-
-    print(f"\nBest parameters: {grid_search.best_params_}")
-    print(f"Best CV F1 score: {grid_search.best_score_:.4f}")
-
-    # Re-evaluate with tuned model
-    y_pred = best_model.predict(X_test)
-    y_pred_proba = best_model.predict_proba(X_test)[:, 1]
-
-    print(f"\nTuned model performance:")
-    print(f"  Accuracy: {accuracy_score(y_test, y_pred):.4f}")
-    print(f"  Precision: {precision_score(y_test, y_pred):.4f}")
-    print(f"  Recall: {recall_score(y_test, y_pred):.4f}")
-    print(f"  F1 Score: {f1_score(y_test, y_pred):.4f}")
-    print(f"  ROC AUC: {roc_auc_score(y_test, y_pred_proba):.4f}")
-else:
-    print(f"\nNo hyperparameter tuning for {best_model_name}")
-
-# Save the best model and preprocessing objects
-print("\n" + "=" * 80)
-print("SAVING MODEL ARTIFACTS")
-print("=" * 80)
-
-# Create models directory if it doesn't exist
-os.makedirs('models', exist_ok=True)
-
-# Save the model
-model_filename = 'models/airforce_retention_model.pkl'
-joblib.dump(best_model, model_filename)
-print(f"Model saved to: {model_filename}")
-
-# Save the scaler (if needed)
-if best_model_name == 'Logistic Regression':
-    scaler_filename = 'models/airforce_retention_scaler.pkl'
-    joblib.dump(scaler, scaler_filename)
-    print(f"Scaler saved to: {scaler_filename}")
-
-# Save label encoders
-encoders_filename = 'models/airforce_retention_encoders.pkl'
-joblib.dump(label_encoders, encoders_filename)
-print(f"Label encoders saved to: {encoders_filename}")
-
-# Save feature columns list
-feature_info = {
-    'feature_columns': feature_columns,
-    'model_type': best_model_name,
-    'requires_scaling': best_model_name == 'Logistic Regression'
 }
-joblib.dump(feature_info, 'models/airforce_retention_feature_info.pkl')
-print(f"Feature info saved to: models/airforce_retention_feature_info.pkl")
-
-print("\n" + "=" * 80)
-print("TRAINING COMPLETE!")
-print("=" * 80)
-print(f"\nBest Model: {best_model_name}")
-print(f"Model artifacts saved in 'models/' directory")
-
-# Example prediction
-print("\n" + "=" * 80)
-print("EXAMPLE PREDICTION")
-print("=" * 80)
 
 sample_data = {
     'age': 28,
@@ -312,33 +121,654 @@ sample_data = {
     'bonuses_received': 10000
 }
 
-print(f"\nSample airman profile:")
-for key, value in sample_data.items():
-    print(f"  {key}: {value}")
-
-# Prepare sample for prediction
-sample_df = pd.DataFrame([sample_data])
-
-# Encode categorical variables
-for col in categorical_columns:
-    sample_df[col + '_encoded'] = label_encoders[col].transform(sample_df[col])
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Train the Air Force retention model')
+    parser.add_argument('--data', default=os.path.join(SCRIPT_DIR, 'airforce_retention_data.csv'),
+                        help='Training CSV, or a directory written by retention_store.py')
+    parser.add_argument('--output-dir', default=SCRIPT_DIR,
+                        help='Where the model artifacts are written (default: next to this script, where the API loads them)')
+    parser.add_argument('--cache-dir', default=None,
+                        help='Preprocessing cache and fit checkpoints (default: <output-dir>/.training_cache)')
+    parser.add_argument('--n-jobs', type=int, default=-1, help='Parallel fits, -1 for one per core')
+    parser.add_argument('--cv', type=int, default=5, help='Cross-validation folds')
+    parser.add_argument('--model', choices=['best'] + sorted(MODEL_KEYS), default='best',
+                        help='Model to tune and save; by default the candidate with the best test F1')
+    parser.add_argument('--search', choices=['grid', 'random', 'halving', 'none'], default='grid',
+                        help='Hyperparameter search for the best model')
+    parser.add_argument('--n-iter', type=int, default=10, help='Parameter settings sampled by --search random')
+    parser.add_argument('--halving-factor', type=int, default=3,
+                        help='Share of settings kept (1/factor) and growth of training rows per --search halving round')
+    parser.add_argument('--no-resume', action='store_true', help='Ignore fits checkpointed by an earlier run')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--export-onnx', action='store_true',
+                        help='Also compile the scaler and model to ONNX inside the pipeline artifact (needs requirements-onnx.txt)')
+    parser.add_argument('--legacy-artifacts', action='store_true',
+                        help='Also write the separate model, scaler, encoders and feature info files')
+    parser.add_argument('--report', help='Also write phase timings and test metrics to this JSON file')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Update the last trained model from the store batches ingested since, instead of retraining')
+    parser.add_argument('--add-estimators', type=int, default=None,
+                        help='Trees added per --incremental update (default: in proportion to the new rows)')
+    parser.add_argument('--epochs', type=int, default=1, help='SGD passes over the new rows per --incremental update')
+    parser.add_argument('--learning-rate', type=float, default=0.01, help='SGD step size for --incremental updates')
+    parser.add_argument('--max-regression', type=float, default=0.0,
+                        help='Largest drop in holdout F1 or ROC AUC an --incremental update may publish with')
+    return parser.parse_args(argv)
+
+class PhaseTimer:
+    """Prints a banner per phase and collects wall-clock time for the summary."""
+
+    def __init__(self):
+        self.phases = []
+
+    @contextmanager
+    def phase(self, title):
+        print("\n" + "=" * 80)
+        print(title)
+        print("=" * 80)
+        start = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - start
+        self.phases.append((title, elapsed))
+        print(f"\n[{title.lower()} took {elapsed:.2f}s]")
+
+    def summary(self):
+        print("\n" + "=" * 80)
+        print("WALL-CLOCK TIME PER PHASE")
+        print("=" * 80)
+        for title, elapsed in self.phases:
+            print(f"  {title:<40}{elapsed:>10.2f}s")
+        print(f"  {'TOTAL':<40}{sum(e for _, e in self.phases):>10.2f}s")
+
+def file_digest(path):
+    if os.path.isdir(path):
+        return RetentionStore(path).digest()
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+def encode_features(df, label_encoders):
+    """
+    Unscaled feature matrix and 0/1 target of raw airman records, with fitted encoders.
+
+    Raises:
+        ValueError if a categorical column holds a value the encoders were not fitted on
+    """
+    # Create a copy for preprocessing
+    df_processed = df.copy()
+
+    # Convert target to binary (True/False -> 1/0)
+    df_processed['retained'] = df_processed['retained'].astype(int)
+
+    # Encode categorical variables
+    for col in categorical_columns:
+        df_processed[col + '_encoded'] = label_encoders[col].transform(df_processed[col])
+
+    # Feature engineering: Extract rank level from grade_rank
+    df_processed['rank_level'] = df_processed['grade_rank'].str.extract(r'E-(\d+)').astype(int)
+
+    return df_processed[feature_columns], df_processed['retained']
+
+def preprocess(data_digest, data_path, test_size, seed):
+    """
+    Encode, split and scale the dataset.
+
+    Cached on data_digest (the content hash of the CSV or store), so data_path itself is not part of the cache key.
+    """
+    # Only the columns the model uses; a store has them typed already
+    df = load_retention_frame(data_path, columns=COLUMNS)
+
+    label_encoders = {col: LabelEncoder().fit(df[col]) for col in categorical_columns}
+    X, y = encode_features(df, label_encoders)
+
+    # Split the data
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=test_size, random_state=seed, stratify=y
+    )
 
-# Extract rank level
-sample_df['rank_level'] = sample_df['grade_rank'].str.extract(r'E-(\d+)').astype(int)
+    # Scale features
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
+
+    return {
+        'df': df,
+        'label_encoders': label_encoders,
+        'scaler': scaler,
+        'X_train': X_train, 'X_test': X_test,
+        'X_train_scaled': X_train_scaled, 'X_test_scaled': X_test_scaled,
+        'y_train': y_train, 'y_test': y_test
+    }
 
-# Select features
-sample_features = sample_df[feature_columns]
+def fold_splits(data_digest, test_size, seed, y_train, cv):
+    """
+    Stratified (train, validation) index pairs, the same splits cross_val_score(cv=cv) uses.
+
+    y_train is not hashed for the cache key; the dataset, test_size and seed that produced it stand in for it.
+    """
+    return list(StratifiedKFold(n_splits=cv).split(np.zeros(len(y_train)), y_train))
+
+def prepare_data(memory, data_path, seed, cv):
+    """
+    Preprocess the dataset and build the CV folds, both cached on the data's content hash and the split settings.
+
+    Returns:
+        (data_digest, data, folds)
+    """
+    data_digest = file_digest(data_path)
+    data = memory.cache(preprocess, ignore=['data_path'])(data_digest, data_path, HOLDOUT_SIZE, seed)
+    folds = memory.cache(fold_splits, ignore=['y_train'])(data_digest, HOLDOUT_SIZE, seed, data['y_train'], cv)
+    return data_digest, data, folds
+
+class CheckpointStore:
+    """
+    Append-only JSON-lines record of finished fits.
+
+    A fit's key covers the model, its parameters, the fold and the training rows used,
+    so a resumed run skips exactly the fits that already finished.
+    """
+
+    def __init__(self, path, resume=True):
+        self.path = path
+        self.results = {}
+        if resume and os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut short by an interrupted run
+                    self.results[entry['key']] = entry['result']
+        elif os.path.exists(path):
+            os.remove(path)
+
+    def record(self, key, result):
+        self.results[key] = result
+        with open(self.path, 'a') as f:
+            f.write(json.dumps({'key': key, 'result': result}) + '\n')
+
+def fit_key(phase, model_name, params, fold, n_rows):
+    return json.dumps([phase, model_name, params, fold, n_rows], sort_keys=True)
+
+def fit_and_score(model_name, params, seed, X, y, train_index, val_index):
+    """Fit one candidate on one fold and return its validation F1 score."""
+    model = clone(make_candidates(seed)[model_name]).set_params(**params)
+    start = time.perf_counter()
+    model.fit(X[train_index], y[train_index])
+    return {
+        'f1': float(f1_score(y[val_index], model.predict(X[val_index]))),
+        'fit_seconds': time.perf_counter() - start
+    }
 
-# Make prediction
-if best_model_name == 'Logistic Regression':
-    sample_features_scaled = scaler.transform(sample_features)
-    prediction = best_model.predict(sample_features_scaled)[0]
-    prediction_proba = best_model.predict_proba(sample_features_scaled)[0]
-else:
-    prediction = best_model.predict(sample_features)[0]
-    prediction_proba = best_model.predict_proba(sample_features)[0]
+def fit_task(key, fit, data, folds, seed):
+    phase, model_name, params, fold, n_rows = fit
+    X = data['X_train_scaled'] if model_name in SCALED_MODELS else data['X_train'].to_numpy()
+    y = data['y_train'].to_numpy()
+    train_index, val_index = folds[fold]
+    if n_rows is not None:
+        # Successive halving rounds train on a fixed random subset of the fold
+        train_index = train_index[np.random.default_rng(seed + fold).permutation(len(train_index))[:n_rows]]
+    return key, fit_and_score(model_name, params, seed, X, y, train_index, val_index)
+
+def run_fits(fits, store, data, folds, seed, n_jobs):
+    """
+    Run every (phase, model_name, params, fold, n_rows) fit not already in the checkpoint store, in parallel.
+
+    Returns:
+        {fit key: result} for all requested fits
+    """
+    keyed = [(fit_key(*fit), fit) for fit in fits]
+    pending = [(key, fit) for key, fit in keyed if key not in store.results]
+    if len(pending) < len(keyed):
+        print(f"  {len(keyed) - len(pending)} of {len(keyed)} fits restored from checkpoint")
+
+    if pending:
+        # Results are checkpointed as they finish, in whatever order the workers complete them
+        jobs = Parallel(n_jobs=n_jobs, return_as='generator_unordered')(
+            delayed(fit_task)(key, fit, data, folds, seed) for key, fit in pending
+        )
+        for done, (key, result) in enumerate(jobs, 1):
+            store.record(key, result)
+            if done % 25 == 0 or done == len(pending):
+                print(f"  {done}/{len(pending)} fits finished")
+
+    return {key: store.results[key] for key, _ in keyed}
+
+def cv_scores(results, phase, model_name, params, cv, n_rows=None):
+    return np.array([results[fit_key(phase, model_name, params, fold, n_rows)]['f1'] for fold in range(cv)])
+
+def evaluate_on_test(model_name, model, data):
+    """Fit on the full training split and compute the test metrics."""
+    scaled = model_name in SCALED_MODELS
+    X_train = data['X_train_scaled'] if scaled else data['X_train']
+    X_test = data['X_test_scaled'] if scaled else data['X_test']
+    model.fit(X_train, data['y_train'])
+    return dict(test_metrics(model, X_test, data['y_test']), model=model)
+
+def test_metrics(model, X_test, y_test):
+    y_pred = model.predict(X_test)
+    y_pred_proba = model.predict_proba(X_test)[:, 1]
+    return {
+        'accuracy': accuracy_score(y_test, y_pred),
+        'precision': precision_score(y_test, y_pred),
+        'recall': recall_score(y_test, y_pred),
+        'f1': f1_score(y_test, y_pred),
+        'roc_auc': roc_auc_score(y_test, y_pred_proba),
+        'y_pred': y_pred,
+        'y_pred_proba': y_pred_proba
+    }
 
-print(f"\nPrediction: {'RETAINED' if prediction == 1 else 'NOT RETAINED'}")
-print(f"Retention probability: {prediction_proba[1]:.2%}")
-print(f"Non-retention probability: {prediction_proba[0]:.2%}")
-print("=" * 80)
+def search_settings(model_name, args):
+    """Parameter settings to evaluate for model_name under the chosen search strategy."""
+    grid = PARAM_GRIDS[model_name]
+    if args.search == 'random':
+        n_iter = min(args.n_iter, len(ParameterGrid(grid)))
+        return list(ParameterSampler(grid, n_iter=n_iter, random_state=args.seed))
+    return list(ParameterGrid(grid))
+
+def halving_search(model_name, settings, store, data, folds, args):
+    """
+    Successive halving: score every setting on a small share of each training fold, keep the
+    best 1/factor, and repeat with factor times as many rows until the last round uses full folds.
+
+    Returns:
+        (best params, its CV scores in the last round, per-round summary)
+    """
+    factor = args.halving_factor
+    n_fold_rows = min(len(train) for train, _ in folds)
+    n_rounds = 1 + int(math.floor(math.log(len(settings), factor))) if len(settings) > 1 else 1
+    min_rows = max(n_fold_rows // factor ** (n_rounds - 1), 50)
+
+    rounds = []
+    remaining = settings
+    for i in range(n_rounds):
+        n_rows = n_fold_rows if i == n_rounds - 1 else min(n_fold_rows, min_rows * factor ** i)
+        print(f"\n  Round {i + 1}/{n_rounds}: {len(remaining)} settings on {n_rows} rows per fold")
+        fits = [('halving', model_name, params, fold, n_rows) for params in remaining for fold in range(args.cv)]
+        results = run_fits(fits, store, data, folds, args.seed, args.n_jobs)
+        scored = sorted(
+            ((cv_scores(results, 'halving', model_name, params, args.cv, n_rows), params) for params in remaining),
+            key=lambda item: item[0].mean(), reverse=True
+        )
+        rounds.append({'n_rows': n_rows, 'n_settings': len(remaining), 'best_f1': float(scored[0][0].mean())})
+        remaining = [params for _, params in scored[:max(1, math.ceil(len(remaining) / factor))]]
+    return scored[0][1], scored[0][0], rounds
+
+def print_metrics(result, scores=None):
+    if scores is not None:
+        print(f"\nCross-validation F1 Score: {scores.mean():.4f} (+/- {scores.std():.4f})")
+    print(f"Test Accuracy: {result['accuracy']:.4f}")
+    print(f"Test Precision: {result['precision']:.4f}")
+    print(f"Test Recall: {result['recall']:.4f}")
+    print(f"Test F1 Score: {result['f1']:.4f}")
+    print(f"Test ROC AUC: {result['roc_auc']:.4f}")
+
+def save_artifacts(args, best_model_name, best_model, data, metadata):
+    """
+    Flatten the model, fuse it with the encoders and scaler, check the pipeline on the test split and write it.
+
+    Args:
+        data: Dictionary with the fitted label_encoders and scaler, the raw records (df) and the
+            test split (X_test, X_test_scaled) indexed into them
+
+    Returns:
+        The fused pipeline
+    """
+    # Tree ensembles are flattened into node arrays (checked against sklearn's predictions)
+    # so the API can memory-map them; sklearn copies trees on unpickling
+    onnx_graph = None
+    if args.export_onnx:
+        # Compiled from the sklearn estimator, before flattening, and checked on the whole test split
+        from onnx_backend import OnnxScorer, export_onnx
+        onnx_graph = export_onnx(best_model, len(feature_columns), data['scaler'] if best_model_name in SCALED_MODELS else None)
+        X_test = data['X_test_scaled'] if best_model_name in SCALED_MODELS else data['X_test'].to_numpy()
+        onnx_deviation = np.max(np.abs(OnnxScorer(onnx_graph).predict_proba(data['X_test'].to_numpy())
+                                       - best_model.predict_proba(X_test)))
+        if onnx_deviation > 1e-4:
+            raise RuntimeError(f"ONNX graph deviates from the trained model by {onnx_deviation:g}")
+        print(f"ONNX graph exported ({len(onnx_graph) / 1024:.0f} KB, max deviation {onnx_deviation:.2g})")
+
+    best_model = flatten_model(best_model)
+    scaler = data['scaler'] if best_model_name in SCALED_MODELS else None
+    pipeline = build_pipeline(data['label_encoders'], scaler, feature_columns, best_model)
+
+    # The pipeline must score raw profiles exactly as the model scored the preprocessed test split
+    raw_test = data['df'].loc[data['X_test'].index]
+    X_test = data['X_test_scaled'] if scaler is not None else data['X_test'].to_numpy()
+    deviation = np.max(np.abs(pipeline.predict_proba(raw_test) - best_model.predict_proba(X_test)))
+    if deviation > 1e-9:
+        raise RuntimeError(f"Fused pipeline deviates from the trained model by {deviation:g}")
+
+    pipeline_filename = os.path.join(args.output_dir, PIPELINE_FILENAME)
+    digest = save_pipeline_artifact(pipeline, pipeline_filename, best_model_name, metadata=metadata, onnx_graph=onnx_graph)
+    print(f"Pipeline saved to: {pipeline_filename} (sha256 {digest[:12]})")
+
+    if args.legacy_artifacts:
+        # Four-file layout for consumers that predate the fused pipeline
+        paths = {key: os.path.join(args.output_dir, filename) for key, filename in LEGACY_FILENAMES.items()}
+        save_mmap_artifact(best_model, paths['model'], flatten=False)
+        joblib.dump(data['scaler'], paths['scaler'])
+        joblib.dump(data['label_encoders'], paths['encoders'])
+        joblib.dump({
+            'feature_columns': feature_columns,
+            'model_type': best_model_name,
+            'requires_scaling': best_model_name in SCALED_MODELS
+        }, paths['feature_info'])
+        print(f"Legacy artifacts saved to: {', '.join(paths.values())}")
+    return pipeline
+
+def save_training_state(output_dir, state):
+    path = os.path.join(output_dir, TRAINING_STATE_FILENAME)
+    tmp_path = f"{path}.tmp"
+    joblib.dump(state, tmp_path)
+    os.replace(tmp_path, path)
+
+def split_new_records(df, seed):
+    """(training rows, holdout rows) of newly ingested records, stratified when both outcomes allow it."""
+    if len(df) < 5:
+        return df, df.iloc[:0]
+    counts = df['retained'].value_counts()
+    stratify = df['retained'] if len(counts) == 2 and counts.min() >= 2 else None
+    return train_test_split(df, test_size=HOLDOUT_SIZE, random_state=seed, stratify=stratify)
+
+def rescale_linear(model, old_scaler, new_scaler):
+    """Copy of a linear model fitted on old_scaler's output, re-expressed for new_scaler's so it scores the same."""
+    model = copy.deepcopy(model)
+    model.intercept_ = model.intercept_ + model.coef_ @ ((new_scaler.mean_ - old_scaler.mean_) / old_scaler.scale_)
+    model.coef_ = model.coef_ * (new_scaler.scale_ / old_scaler.scale_)
+    return model
+
+def update_linear(model, X_new, y_new, n_rows, args):
+    """
+    SGD passes over the new rows, starting from the model's coefficients.
+
+    The L2 penalty matches LogisticRegression's (C) for a model fitted on n_rows rows.
+    """
+    sgd = SGDClassifier(loss='log_loss', alpha=1.0 / (model.C * n_rows), learning_rate='constant',
+                        eta0=args.learning_rate, max_iter=args.epochs, tol=None, random_state=args.seed)
+    sgd.fit(X_new, y_new, coef_init=model.coef_, intercept_init=model.intercept_)
+    model = copy.deepcopy(model)
+    model.coef_, model.intercept_ = sgd.coef_.copy(), sgd.intercept_.copy()
+    return model
+
+def update_ensemble(model, X_new, y_new, n_add):
+    """Copy of a random forest or gradient boosting model with n_add more trees, fitted on the new rows."""
+    model = copy.deepcopy(model)
+    model.set_params(warm_start=True, n_estimators=model.n_estimators + n_add)
+    model.fit(X_new, y_new)
+    return model.set_params(warm_start=False)
+
+def incremental_main(args):
+    """Update the model from the store batches ingested since the training state was written; returns the exit status."""
+    timer = PhaseTimer()
+    state_path = os.path.join(args.output_dir, TRAINING_STATE_FILENAME)
+    if not os.path.exists(state_path):
+        sys.exit(f"No training state in {args.output_dir}; train on the retention store without --incremental first")
+    if not os.path.isdir(args.data):
+        sys.exit("--incremental reads new batches from a retention store; pass its directory as --data")
+
+    print("=" * 80)
+    print("AIRFORCE RETENTION MODEL INCREMENTAL UPDATE")
+    print("=" * 80)
+
+    with timer.phase("LOADING NEW RECORDS"):
+        state = joblib.load(state_path)
+        if state['store_parts'] is None:
+            sys.exit("The model was last trained on a CSV, so no batch is known to be new; retrain on the retention store first")
+        store = RetentionStore(args.data)
+        seen = set(state['store_parts'])
+        new_parts = [name for name in store.part_names() if name not in seen]
+        if not new_parts:
+            print("\nNo batches ingested since the model was trained")
+            return 0
+
+        # Only the new files are read
+        new = store.read_frame(COLUMNS, names=new_parts)
+        new_train, new_holdout = split_new_records(new, args.seed + len(state['updates']))
+        holdout = pd.concat([state['holdout'], new_holdout], ignore_index=True)
+        try:
+            X_new, y_new = encode_features(new_train, state['label_encoders'])
+            X_holdout, y_holdout = encode_features(holdout, state['label_encoders'])
+        except ValueError as e:
+            sys.exit(f"The new records cannot be encoded by the current model ({e}); retrain without --incremental")
+
+        print(f"\n{len(new_parts)} new batch(es): {len(new)} records")
+        print(f"Training rows: {len(new_train)} new, {state['n_train_rows']} already seen")
+        print(f"Holdout rows: {len(holdout)} ({len(new_holdout)} new)")
+        if y_new.nunique() < 2:
+            print("\nThe new training rows hold only one outcome; the model is left as it is until more records arrive")
+            return 1
+
+    model_name, model = state['model_name'], state['model']
+    scaled = model_name in SCALED_MODELS
+
+    with timer.phase("INCREMENTAL UPDATE"):
+        # Running mean and variance over every training row seen so far
+        scaler = copy.deepcopy(state['scaler']).partial_fit(X_new)
+        print(f"\nScaler statistics updated: {int(state['scaler'].n_samples_seen_)} -> {int(scaler.n_samples_seen_)} rows")
+        n_rows = state['n_train_rows'] + len(X_new)
+        if scaled:
+            updated = rescale_linear(model, state['scaler'], scaler)
+            updated = update_linear(updated, scaler.transform(X_new), y_new, n_rows, args)
+            print(f"{model_name}: {args.epochs} SGD epochs over {len(X_new)} rows")
+        else:
+            # By default the new rows get the share of trees they have of the training rows
+            n_add = args.add_estimators or max(1, round(model.n_estimators * len(X_new) / state['n_train_rows']))
+            updated = update_ensemble(model, X_new, y_new, n_add)
+            print(f"{model_name}: {model.n_estimators} -> {updated.n_estimators} trees")
+
+    with timer.phase("HOLDOUT EVALUATION"):
+        current = test_metrics(model, state['scaler'].transform(X_holdout) if scaled else X_holdout, y_holdout)
+        candidate = test_metrics(updated, scaler.transform(X_holdout) if scaled else X_holdout, y_holdout)
+        print(f"\n{'metric':<12}{'current':>10}{'updated':>10}{'change':>10}")
+        for metric in ('accuracy', 'precision', 'recall', 'f1', 'roc_auc'):
+            print(f"{metric:<12}{current[metric]:>10.4f}{candidate[metric]:>10.4f}{candidate[metric] - current[metric]:>+10.4f}")
+        regressed = [metric for metric in ('f1', 'roc_auc') if candidate[metric] < current[metric] - args.max_regression]
+
+    if regressed:
+        print(f"\nNOT PUBLISHED: holdout {' and '.join(regressed)} dropped by more than {args.max_regression}; "
+              f"the current model stays")
+    else:
+        update = {
+            'store_parts': new_parts,
+            'new_rows': len(new),
+            'holdout_f1': float(candidate['f1']),
+            'finished_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        }
+        with timer.phase("SAVING MODEL ARTIFACTS"):
+            data = {
+                'label_encoders': state['label_encoders'], 'scaler': scaler, 'df': holdout,
+                'X_test': X_holdout, 'X_test_scaled': scaler.transform(X_holdout),
+            }
+            save_artifacts(args, model_name, updated, data, metadata={
+                'data_digest': store.digest(),
+                'test_f1': float(candidate['f1']),
+                'incremental': dict(update, previous_updates=len(state['updates'])),
+            })
+            state.update(model=updated, scaler=scaler, holdout=holdout, n_train_rows=n_rows,
+                         store_parts=state['store_parts'] + new_parts, updates=state['updates'] + [update])
+            save_training_state(args.output_dir, state)
+            print(f"Training state saved to: {state_path}")
+
+    timer.summary()
+    seconds = sum(elapsed for _, elapsed in timer.phases)
+    full = state['full_retrain']
+    print(f"\nIncremental update: {seconds:.2f}s for {len(new)} new records")
+    print(f"Last full retrain:  {full['seconds']:.2f}s for {full['rows']} records ({full['seconds'] / seconds:.1f}x the time)")
+
+    if args.report:
+        report = {
+            'mode': 'incremental',
+            'model': model_name,
+            'published': not regressed,
+            'new_rows': len(new),
+            'holdout_rows': len(holdout),
+            'holdout_metrics': {name: {k: float(metrics[k]) for k in ('accuracy', 'precision', 'recall', 'f1', 'roc_auc')}
+                                for name, metrics in (('current', current), ('updated', candidate))},
+            'phase_seconds': {title: round(elapsed, 3) for title, elapsed in timer.phases},
+            'full_retrain_seconds': full['seconds'],
+            'settings': vars(args)
+        }
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to: {args.report}")
+    return 1 if regressed else 0
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.incremental:
+        return incremental_main(args)
+    timer = PhaseTimer()
+    os.makedirs(args.output_dir, exist_ok=True)
+    cache_dir = args.cache_dir or os.path.join(args.output_dir, '.training_cache')
+    os.makedirs(cache_dir, exist_ok=True)
+    memory = joblib.Memory(os.path.join(cache_dir, 'joblib'), verbose=0)
+
+    print("=" * 80)
+    print("AIRFORCE RETENTION MODEL TRAINING")
+    print("=" * 80)
+
+    with timer.phase("DATA PREPROCESSING"):
+        # The batches a later --incremental run treats as already seen
+        store_parts = RetentionStore(args.data).part_names() if os.path.isdir(args.data) else None
+        # Cached on the CSV contents: a rerun on the same data skips encoding, splitting and scaling
+        data_digest, data, folds = prepare_data(memory, args.data, args.seed, args.cv)
+        df = data['df']
+
+        # Basic dataset info
+        print(f"\nDataset shape: {df.shape}")
+        print(f"\nTarget variable distribution:")
+        print(df['retained'].value_counts())
+        print(f"Retention rate: {df['retained'].sum() / len(df) * 100:.2f}%")
+        for col in categorical_columns:
+            print(f"\n{col} encoding:")
+            for i, label in enumerate(data['label_encoders'][col].classes_):
+                print(f"  {label} -> {i}")
+        print(f"\nTraining set size: {data['X_train'].shape[0]}")
+        print(f"Test set size: {data['X_test'].shape[0]}")
+
+    # Fits are checkpointed per dataset, fold count and seed
+    checkpoint_path = os.path.join(cache_dir, f"fits-{data_digest}-cv{args.cv}-seed{args.seed}.jsonl")
+    store = CheckpointStore(checkpoint_path, resume=not args.no_resume)
+
+    candidates = make_candidates(args.seed)
+
+    with timer.phase("MODEL TRAINING AND EVALUATION"):
+        # Every candidate x fold runs as one parallel batch, then the holdout fits in parallel
+        fits = [('cv', name, {}, fold, None) for name in candidates for fold in range(args.cv)]
+        cv_results = run_fits(fits, store, data, folds, args.seed, args.n_jobs)
+        evaluated = Parallel(n_jobs=args.n_jobs)(
+            delayed(evaluate_on_test)(name, clone(model), data) for name, model in candidates.items()
+        )
+        results = dict(zip(candidates, evaluated))
+
+        for name, result in results.items():
+            result['cv_scores'] = cv_scores(cv_results, 'cv', name, {}, args.cv)
+            print(f"\n{'-' * 80}")
+            print(name)
+            print(f"{'-' * 80}")
+            print_metrics(result, result['cv_scores'])
+
+    # Select best model based on F1 score (better for potentially imbalanced data)
+    best_model_name = max(results, key=lambda x: results[x]['f1']) if args.model == 'best' else MODEL_KEYS[args.model]
+    best = results[best_model_name]
+
+    print("\n" + "=" * 80)
+    print(f"{'BEST' if args.model == 'best' else 'SELECTED'} MODEL: {best_model_name}")
+    print(f"F1 Score: {best['f1']:.4f}")
+    print(f"ROC AUC: {best['roc_auc']:.4f}")
+    print("=" * 80)
+    print(f"\nClassification Report:")
+    print(classification_report(data['y_test'], best['y_pred'], target_names=['Not Retained', 'Retained']))
+    print(f"Confusion Matrix:")
+    print(confusion_matrix(data['y_test'], best['y_pred']))
+
+    # Feature importance (for tree-based models)
+    if best_model_name in PARAM_GRIDS:
+        print("\nFeature Importances:")
+        feature_importance = pd.DataFrame({
+            'feature': feature_columns,
+            'importance': best['model'].feature_importances_
+        }).sort_values('importance', ascending=False)
+        print(feature_importance)
+
+    search_summary = None
+    with timer.phase("HYPERPARAMETER TUNING"):
+        if best_model_name not in PARAM_GRIDS or args.search == 'none':
+            print(f"\nNo hyperparameter tuning for {best_model_name}")
+        else:
+            settings = search_settings(best_model_name, args)
+            print(f"\n{args.search.capitalize()} search for {best_model_name}: {len(settings)} settings x {args.cv} folds")
+            if args.search == 'halving':
+                best_params, best_scores, rounds = halving_search(best_model_name, settings, store, data, folds, args)
+                search_summary = {'strategy': 'halving', 'rounds': rounds}
+            else:
+                fits = [('search', best_model_name, params, fold, None) for params in settings for fold in range(args.cv)]
+                search_results = run_fits(fits, store, data, folds, args.seed, args.n_jobs)
+                scored = [(cv_scores(search_results, 'search', best_model_name, params, args.cv), params) for params in settings]
+                best_scores, best_params = max(scored, key=lambda item: item[0].mean())
+                search_summary = {'strategy': args.search, 'n_settings': len(settings)}
+
+            print(f"\nBest parameters: {best_params}")
+            print(f"Best CV F1 score: {best_scores.mean():.4f}")
+            search_summary.update(best_params=best_params, best_cv_f1=float(best_scores.mean()))
+
+            # Re-evaluate with tuned model
+            best = evaluate_on_test(best_model_name, clone(candidates[best_model_name]).set_params(**best_params), data)
+            print(f"\nTuned model performance:")
+            print_metrics(best)
+
+    best_model = best['model']
+
+    with timer.phase("SAVING MODEL ARTIFACTS"):
+        pipeline = save_artifacts(args, best_model_name, best_model, data, metadata={
+            'data_digest': data_digest,
+            'test_f1': float(best['f1']),
+            'search': search_summary,
+        })
+
+        # What --incremental builds on: the estimator before flattening, so trees can be added to it
+        save_training_state(args.output_dir, {
+            'model_name': best_model_name,
+            'model': best['model'],
+            'scaler': data['scaler'],
+            'label_encoders': data['label_encoders'],
+            'holdout': data['df'].loc[data['X_test'].index, COLUMNS].reset_index(drop=True),
+            'n_train_rows': len(data['X_train']),
+            'store_parts': store_parts,
+            'full_retrain': {'seconds': sum(elapsed for _, elapsed in timer.phases), 'rows': len(data['df'])},
+            'updates': [],
+        })
+
+    # Example prediction
+    print("\n" + "=" * 80)
+    print("EXAMPLE PREDICTION")
+    print("=" * 80)
+    print(f"\nSample airman profile:")
+    for key, value in sample_data.items():
+        print(f"  {key}: {value}")
+
+    prediction_proba = pipeline.predict_proba(pd.DataFrame([sample_data]))[0]
+
+    print(f"\nPrediction: {'RETAINED' if prediction_proba.argmax() == 1 else 'NOT RETAINED'}")
+    print(f"Retention probability: {prediction_proba[1]:.2%}")
+    print(f"Non-retention probability: {prediction_proba[0]:.2%}")
+
+    timer.summary()
+
+    if args.report:
+        report = {
+            'best_model': best_model_name,
+            'test_metrics': {k: float(best[k]) for k in ('accuracy', 'precision', 'recall', 'f1', 'roc_auc')},
+            'search': search_summary,
+            'phase_seconds': {title: round(elapsed, 3) for title, elapsed in timer.phases},
+            'settings': vars(args)
+        }
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to: {args.report}")
+
+if __name__ == '__main__':
+    sys.exit(main())
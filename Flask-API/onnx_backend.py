@@ -0,0 +1,135 @@
+"""
+ONNX inference backend
+
+Compiles a fitted sklearn model (and, for the retention model, its scaler)
+into an ONNX graph with skl2onnx and scores it with onnxruntime, which runs
+the whole graph in native code instead of going through sklearn's
+Python-level predict and input validation. Graphs take float32 input, so
+results agree with sklearn to about 1e-6 rather than exactly; a graph is
+only used after it matches the scorer it replaces on a canary input.
+
+Both packages are optional (requirements-onnx.txt). Without them, or when
+a model cannot be converted, build_onnx_scorer logs a warning and returns
+the regular scorer.
+"""
+
+import logging
+import warnings
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def export_onnx(model, n_features, scaler=None):
+    """
+    Convert a fitted sklearn classifier or regressor to a serialized ONNX graph.
+
+    Args:
+        n_features: Width of the float32 input
+        scaler: Optional fitted StandardScaler applied to the input inside the graph
+
+    Returns:
+        The graph as bytes
+    """
+    try:
+        from skl2onnx import convert_sklearn
+        from skl2onnx.common.data_types import FloatTensorType
+    except ImportError:
+        raise ImportError("ONNX export needs skl2onnx (pip install -r requirements-onnx.txt)") from None
+    from sklearn.base import is_classifier
+    from sklearn.pipeline import Pipeline
+
+    estimator = model if scaler is None else Pipeline([('scale', scaler), ('model', model)])
+    # Plain probability tensors instead of a list of {class: probability} maps
+    options = {id(model): {'zipmap': False}} if is_classifier(model) else None
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)
+        graph = convert_sklearn(estimator, initial_types=[('input', FloatTensorType([None, n_features]))], options=options)
+    return graph.SerializeToString()
+
+class OnnxScorer:
+    """
+    Scores an ONNX graph written by export_onnx with onnxruntime.
+
+    Args:
+        graph: Serialized graph
+        classes: Class labels for classifiers, None for regressors
+        scale, offset: Optional affine preprocessing applied in NumPy before the graph
+        threads: onnxruntime intra-op threads; 1 keeps per-request latency low when workers already use every core
+    """
+
+    def __init__(self, graph, classes=None, scale=None, offset=None, threads=1):
+        try:
+            import onnxruntime
+        except ImportError:
+            raise ImportError("The ONNX backend needs onnxruntime (pip install -r requirements-onnx.txt)") from None
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(graph, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self.classes_ = classes
+        self.scale = scale
+        self.offset = offset
+        self.n_features_in_ = self.session.get_inputs()[0].shape[1]
+
+    def _run(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if self.scale is not None:
+            X = X * self.scale + self.offset
+        return self.session.run(None, {self.input_name: X.astype(np.float32)})
+
+    def predict_proba(self, X):
+        return np.asarray(self._run(X)[1], dtype=np.float64)
+
+    def predict(self, X):
+        outputs = self._run(X)
+        if self.classes_ is None:
+            return np.asarray(outputs[0], dtype=np.float64).reshape(len(outputs[0]), -1).squeeze(axis=1)
+        return outputs[0]
+
+def max_deviation(scorer, reference, X):
+    """Largest difference between two scorers on X: absolute for probabilities, relative for regression outputs."""
+    if scorer.classes_ is not None:
+        return float(np.max(np.abs(scorer.predict_proba(X) - reference.predict_proba(X))))
+    expected = np.asarray(reference.predict(X), dtype=np.float64)
+    return float(np.max(np.abs(scorer.predict(X) - expected) / np.maximum(np.abs(expected), 1.0)))
+
+def build_onnx_scorer(model, fallback, graph=None, scale=None, offset=None, canary=None, tolerance=1e-4, threads=1):
+    """
+    Return an OnnxScorer for the model when it can be built and agrees with fallback, otherwise fallback.
+
+    Args:
+        model: Fitted estimator, converted in-process when no graph is given
+        fallback: The scorer used otherwise (build_scorer's result); also the parity reference
+        graph: Graph exported at training time that already includes the preprocessing
+        scale, offset: Affine preprocessing for an in-process conversion, applied before the graph
+        canary: Inputs (in the unpreprocessed space) to check against fallback; random rows when omitted
+        tolerance: Largest deviation from fallback that is accepted
+    """
+    classes = getattr(model, 'classes_', None)
+    name = type(model).__name__
+    try:
+        if graph is not None:
+            scorer = OnnxScorer(graph, classes, threads=threads)
+        else:
+            scorer = OnnxScorer(export_onnx(model, model.n_features_in_), classes, scale, offset, threads=threads)
+    except ImportError as e:
+        logger.warning("%s, scoring %s without it", e, name)
+        return fallback
+    except Exception as e:
+        logger.warning("Could not compile %s to ONNX (%s), scoring it without", name, str(e).splitlines()[0])
+        return fallback
+
+    if canary is None:
+        rng = np.random.default_rng(0)
+        canary = rng.normal(size=(32, scorer.n_features_in_))
+        if scale is not None:
+            canary = (canary - offset) / scale
+    deviation = max_deviation(scorer, fallback, np.atleast_2d(canary))
+    if not deviation <= tolerance:
+        logger.warning("ONNX graph for %s deviates by %g, scoring it without", name, deviation)
+        return fallback
+    return scorer
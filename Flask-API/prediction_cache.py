@@ -0,0 +1,129 @@
+"""
+Prediction result cache
+
+Single-row predictions are cached on the model name, the serving model
+version and the canonical bytes of the feature vector, so repeated
+submissions of the same measurements skip preprocessing and scoring, and
+a reloaded model never sees its predecessor's results.
+
+The in-process tier is a TTLCache (LRU eviction, concurrent identical
+requests coalesced). An optional shared tier, e.g. RedisBackend, lets
+pre-fork workers reuse each other's results; when it fails, requests fall
+back to scoring and the shared tier is skipped for a few seconds.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+
+import numpy as np
+
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+def feature_key(model_name, version, features):
+    """
+    Cache key for one feature vector.
+
+    Features are compared as float64 values, so 5, 5.0 and "5.0" parsed to the same number share an entry.
+    """
+    vector = np.ascontiguousarray(features, dtype=np.float64).ravel() + 0.0  # + 0.0 turns -0.0 into 0.0
+    digest = hashlib.blake2b(vector.tobytes(), digest_size=16).hexdigest()
+    return f"{model_name}:{version}:{digest}"
+
+class RedisBackend:
+    """
+    Shared prediction store in Redis.
+
+    Args:
+        url: Redis URL, e.g. redis://localhost:6379/0
+        ttl: Seconds entries are kept
+        timeout: Socket timeout in seconds; a slow cache must not be slower than scoring
+        prefix: Prepended to every key
+    """
+
+    def __init__(self, url, ttl=3600.0, timeout=0.05, prefix='prediction:'):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("The shared prediction cache needs the redis package (pip install redis)") from None
+        self.client = redis.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        data = self.client.get(self.prefix + key)
+        return None if data is None else np.asarray(json.loads(data), dtype=np.float64)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, json.dumps(np.asarray(value, dtype=np.float64).tolist()), ex=max(int(self.ttl), 1))
+
+class PredictionCache:
+    """
+    Two-tier cache of prediction results.
+
+    Args:
+        max_entries: Results kept in this process; 0 disables the cache
+        ttl: Seconds a result stays valid
+        shared: Optional backend with get(key) and set(key, value) shared between workers
+        shared_retry: Seconds the shared backend is skipped after it fails
+    """
+
+    def __init__(self, max_entries=10000, ttl=3600.0, shared=None, shared_retry=5.0):
+        self.local = TTLCache(max_entries=max_entries, ttl=ttl)
+        self.shared = shared
+        self.shared_retry = shared_retry
+        self._lock = threading.Lock()
+        self._shared_counts = {'hits': 0, 'misses': 0, 'errors': 0}
+        self._shared_down_until = 0.0
+
+    @property
+    def enabled(self):
+        return self.local.max_entries > 0
+
+    def get_or_compute(self, model_name, version, features, compute):
+        """Return the cached result for this model version and feature vector, calling compute() on a miss."""
+        if not self.enabled:
+            return compute()
+        key = feature_key(model_name, version, features)
+        return self.local.get_or_load(key, lambda: self._load(key, compute))
+
+    def _count(self, name):
+        with self._lock:
+            self._shared_counts[name] += 1
+
+    def _shared_failed(self, e):
+        logger.warning("Shared prediction cache unavailable, retrying in %ss: %s", self.shared_retry, e)
+        self._count('errors')
+        self._shared_down_until = time.monotonic() + self.shared_retry
+
+    def _load(self, key, compute):
+        use_shared = self.shared is not None and time.monotonic() >= self._shared_down_until
+        if use_shared:
+            try:
+                value = self.shared.get(key)
+            except Exception as e:
+                self._shared_failed(e)
+                use_shared = False
+            else:
+                if value is not None:
+                    self._count('hits')
+                    return value
+                self._count('misses')
+
+        value = compute()
+        if use_shared:
+            try:
+                self.shared.set(key, value)
+            except Exception as e:
+                self._shared_failed(e)
+        return value
+
+    def stats(self):
+        stats = self.local.stats()
+        with self._lock:
+            stats['shared'] = dict(self._shared_counts, backend=type(self.shared).__name__) if self.shared is not None else None
+        return stats
@@ -0,0 +1,89 @@
+"""
+Retention dashboard aggregates
+
+Scores every airman in the retention dataset in one vectorized pass and
+reduces the probabilities to the few numbers the dashboard charts need,
+so the frontend makes one small request instead of one prediction call
+per airman.
+"""
+
+import numpy as np
+
+from retention_features import INPUT_COLUMNS
+
+GROUP_COLUMNS = ['grade_rank', 'marital_status']
+
+def _round(values, digits=6):
+    return [round(float(v), digits) for v in values]
+
+def _group_means(labels, probabilities, actual):
+    names, inverse = np.unique(labels.astype(str), return_inverse=True)
+    counts = np.bincount(inverse, minlength=len(names))
+    return [
+        {'value': str(name), 'count': int(count), 'mean_probability': round(float(p), 6), 'actual_rate': round(float(a), 6)}
+        for name, count, p, a in zip(
+            names, counts,
+            np.bincount(inverse, weights=probabilities, minlength=len(names)) / counts,
+            np.bincount(inverse, weights=actual, minlength=len(names)) / counts,
+        )
+    ]
+
+def retention_aggregates(table, transformer, scorer, bins=10):
+    """
+    Score a retention dataset and aggregate the predictions.
+
+    Args:
+        table: ColumnarTable with the model's input columns and the actual 'retained' outcome
+        transformer: RetentionFeatureTransformer of the model
+        scorer: Scorer taking the transformer's unscaled features
+        bins: Equal-width probability bins for the histograms and the calibration table
+
+    Returns:
+        Dictionary with summary counts, probability histograms (all airmen, and split by the actual outcome),
+        mean probability per grade_rank and marital_status, and calibration per bin with the Brier score
+        and expected calibration error
+    """
+    columns = {name: table.columns[name] for name in INPUT_COLUMNS if name in table.columns}
+    features, valid, _ = transformer.encode_columns(columns, table.n_rows)
+    probabilities = scorer.predict_proba(features)[:, 1] if len(features) else np.empty(0)
+    actual = table.columns['retained'][valid].astype(bool).astype(np.float64)
+
+    edges = np.linspace(0.0, 1.0, bins + 1)
+    # Bin i holds edges[i] <= p < edges[i + 1]; p == 1 goes in the last bin
+    bin_index = np.minimum((probabilities * bins).astype(int), bins - 1)
+    counts = np.bincount(bin_index, minlength=bins)
+    predicted_sum = np.bincount(bin_index, weights=probabilities, minlength=bins)
+    actual_sum = np.bincount(bin_index, weights=actual, minlength=bins)
+    populated = counts > 0
+    mean_predicted = np.divide(predicted_sum, counts, out=np.zeros(bins), where=populated)
+    actual_rate = np.divide(actual_sum, counts, out=np.zeros(bins), where=populated)
+    n_scored = len(probabilities)
+
+    return {
+        'summary': {
+            'rows': int(table.n_rows),
+            'scored': int(n_scored),
+            'rejected': int(table.n_rows - n_scored),
+            'mean_probability': round(float(probabilities.mean()), 6) if n_scored else None,
+            'actual_rate': round(float(actual.mean()), 6) if n_scored else None,
+        },
+        'histogram': {
+            'edges': _round(edges),
+            'all': counts.tolist(),
+            'retained': np.bincount(bin_index[actual == 1], minlength=bins).tolist(),
+            'not_retained': np.bincount(bin_index[actual == 0], minlength=bins).tolist(),
+        },
+        'by_group': {
+            col: _group_means(table.columns[col][valid], probabilities, actual) for col in GROUP_COLUMNS
+        },
+        'calibration': {
+            'bins': [
+                {'lower': round(float(edges[i]), 6), 'upper': round(float(edges[i + 1]), 6), 'count': int(counts[i]),
+                 'mean_predicted': round(float(mean_predicted[i]), 6), 'actual_rate': round(float(actual_rate[i]), 6)}
+                for i in range(bins) if populated[i]
+            ],
+            'brier_score': round(float(np.mean((probabilities - actual) ** 2)), 6) if n_scored else None,
+            'expected_calibration_error': round(float(np.sum(counts * np.abs(mean_predicted - actual_rate)) / n_scored), 6)
+            if n_scored else None,
+        },
+    }
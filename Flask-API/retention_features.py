@@ -0,0 +1,190 @@
+"""
+Air Force Retention Feature Transformer
+
+Compiles the saved label encoders, scaler and feature info into plain
+dict lookups and NumPy vectors, so scoring a request does not need pandas.
+Produces the same feature matrix as the DataFrame-based preprocessing in
+train_airforce_retention_model.py.
+"""
+
+import re
+
+import numpy as np
+
+from linear_scorer import affine_from_scaler
+
+CATEGORICAL_COLUMNS = ['gender', 'marital_status', 'grade_rank']
+NUMERIC_COLUMNS = ['age', 'num_dependents', 'salary', 'years_of_service', 'num_prior_reenlistments', 'bonuses_received']
+INPUT_COLUMNS = CATEGORICAL_COLUMNS + NUMERIC_COLUMNS
+
+def _rank_level(grade_rank):
+    match = re.search(r'E-(\d+)', grade_rank)
+    if match is None:
+        raise ValueError(f"Cannot extract rank level from grade_rank: {grade_rank!r}")
+    return int(match.group(1))
+
+def _to_number(col, value):
+    if value is None:
+        raise ValueError(f"Missing required field: {col}")
+    # JSON booleans would otherwise be accepted as 0/1
+    if isinstance(value, bool):
+        raise ValueError(f"Invalid value for {col}: {value!r}")
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid value for {col}: {value!r}") from None
+    if number != number:
+        raise ValueError(f"Missing required field: {col}")
+    return number
+
+def _number_or_nan(value):
+    try:
+        return _to_number('', value)
+    except ValueError:
+        return np.nan
+
+def _none_if_nan(value):
+    # Empty cells read by pandas arrive as NaN; report them as missing, as for JSON nulls
+    return None if isinstance(value, float) and value != value else value
+
+class RetentionFeatureTransformer:
+    """
+    Pandas-free preprocessing for the retention model.
+
+    Args:
+        encoders: Dictionary of label encoders for categorical variables
+        scaler: StandardScaler fitted on the feature columns (may be None when scaling is not required)
+        feature_columns: List of feature column names, in model order
+        requires_scaling: Boolean indicating if scaling is needed
+    """
+
+    def __init__(self, encoders, scaler, feature_columns, requires_scaling=True):
+        self.feature_columns = list(feature_columns)
+        self.requires_scaling = requires_scaling
+
+        # Category -> code lookups replace LabelEncoder.transform
+        self.codes = {
+            col: {label: code for code, label in enumerate(encoders[col].classes_)}
+            for col in CATEGORICAL_COLUMNS
+        }
+        # Rank levels are known for every grade the encoder accepts, so the regex runs once here
+        self.rank_levels = {label: _rank_level(label) for label in self.codes['grade_rank']}
+
+        # How to fill each feature column: (kind, source input field)
+        self.plan = []
+        for col in self.feature_columns:
+            if col.endswith('_encoded') and col[:-len('_encoded')] in self.codes:
+                self.plan.append(('code', col[:-len('_encoded')]))
+            elif col == 'rank_level':
+                self.plan.append(('rank', 'grade_rank'))
+            else:
+                self.plan.append(('number', col))
+
+        # Fold (x - mean) / scale into x * scale + offset
+        n_features = len(self.feature_columns)
+        if requires_scaling:
+            self.scale, self.offset = affine_from_scaler(scaler, n_features)
+        else:
+            self.scale = np.ones(n_features)
+            self.offset = np.zeros(n_features)
+
+    def _lookup(self, col, value):
+        if value is None:
+            raise ValueError(f"Missing required field: {col}")
+        try:
+            return self.codes[col][value]
+        except (KeyError, TypeError):
+            raise ValueError(f"Invalid value for {col}: {value!r}") from None
+
+    def encode(self, data):
+        """
+        Encode a single airman profile into an unscaled feature vector.
+
+        Raises ValueError on a missing or invalid field.
+        """
+        row = np.empty(len(self.plan), dtype=np.float64)
+        for j, (kind, field) in enumerate(self.plan):
+            value = data.get(field)
+            if kind == 'number':
+                row[j] = _to_number(field, value)
+            else:
+                code = self._lookup(field, value)
+                row[j] = code if kind == 'code' else self.rank_levels[value]
+        return row
+
+    def encode_batch(self, columns, n_rows):
+        """
+        Encode many airmen given column-wise input.
+
+        Args:
+            columns: Dictionary of input field name -> list of values (length n_rows)
+            n_rows: Number of rows in the batch
+
+        Returns:
+            (features, valid, errors) where features holds the unscaled rows that passed
+            validation, valid is a boolean mask over the batch, and errors holds one list
+            of messages per row.
+        """
+        errors = [[] for _ in range(n_rows)]
+        matrix = np.zeros((n_rows, len(self.plan)), dtype=np.float64)
+
+        for j, (kind, field) in enumerate(self.plan):
+            values = columns.get(field)
+            if values is None:
+                values = [None] * n_rows
+            for i, value in enumerate(values):
+                try:
+                    if kind == 'number':
+                        matrix[i, j] = _to_number(field, value)
+                    else:
+                        code = self._lookup(field, value)
+                        matrix[i, j] = code if kind == 'code' else self.rank_levels[value]
+                except ValueError as e:
+                    # rank_level repeats the grade_rank check, report it once
+                    if kind != 'rank' or str(e) not in errors[i]:
+                        errors[i].append(str(e))
+
+        valid = np.array([not row_errors for row_errors in errors], dtype=bool)
+        return matrix[valid], valid, errors
+
+    def encode_columns(self, columns, n_rows):
+        """
+        Vectorized encode_batch for columns held as arrays, e.g. the columns of a DataFrame chunk.
+
+        Numeric columns are converted in one step and categories are looked up without
+        raising per value; messages are only built, through encode_batch, for the rows that fail.
+
+        Returns:
+            (features, valid, errors) like encode_batch, except errors maps only the failing rows to their messages
+        """
+        matrix = np.empty((n_rows, len(self.plan)), dtype=np.float64)
+        valid = np.ones(n_rows, dtype=bool)
+        for j, (kind, field) in enumerate(self.plan):
+            values = columns.get(field)
+            if values is None:
+                valid[:] = False
+                continue
+            values = np.asarray(values)
+            if kind == 'number':
+                if values.dtype.kind in 'iuf':
+                    matrix[:, j] = values
+                elif values.dtype.kind == 'b':
+                    matrix[:, j] = np.nan
+                else:
+                    matrix[:, j] = np.fromiter((_number_or_nan(v) for v in values), np.float64, n_rows)
+            else:
+                lookup = self.codes[field] if kind == 'code' else self.rank_levels
+                matrix[:, j] = np.fromiter((lookup.get(v, np.nan) if isinstance(v, str) else np.nan for v in values),
+                                           np.float64, n_rows)
+            valid &= ~np.isnan(matrix[:, j])
+
+        errors = {}
+        failed = np.flatnonzero(~valid)
+        if len(failed):
+            subset = {
+                field: [_none_if_nan(columns[field][i]) for i in failed] if field in columns else None
+                for field in INPUT_COLUMNS
+            }
+            _, _, subset_errors = self.encode_batch(subset, len(failed))
+            errors = {int(i): messages for i, messages in zip(failed, subset_errors)}
+        return matrix[valid], valid, errors
@@ -0,0 +1,289 @@
+"""
+Fused Air Force retention pipeline artifact
+
+One file holds the whole scoring path: category encoding and rank
+extraction (RetentionEncoder), the scaler, and the estimator, as a single
+sklearn Pipeline, together with an input schema. A SHA-256 of the
+serialized pipeline is appended after the joblib stream, so the file can
+still be memory-mapped. The checksum is verified in chunks while the file is
+read once, without keeping its bytes; the load is rejected unless the file
+is still the one whose bytes were verified.
+
+    pipeline.predict_proba(pd.DataFrame([airman]))   # raw profile in, probabilities out
+
+The four-file layout written by earlier training runs (model, scaler,
+encoders, feature info) still loads through load_retention_pipeline.
+"""
+
+import copy
+import hashlib
+import io
+import os
+import time
+
+import joblib
+import numpy as np
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.pipeline import Pipeline
+
+from retention_features import CATEGORICAL_COLUMNS, NUMERIC_COLUMNS, RetentionFeatureTransformer
+
+FORMAT_VERSION = 1
+PIPELINE_FILENAME = 'airforce_retention_pipeline.joblib'
+LEGACY_FILENAMES = {
+    'model': 'airforce_retention_model.pkl',
+    'scaler': 'airforce_retention_scaler.pkl',
+    'encoders': 'airforce_retention_encoders.pkl',
+    'feature_info': 'airforce_retention_feature_info.pkl',
+}
+
+CHECKSUM_PREFIX = b'\nsha256:'
+CHECKSUM_TRAILER_SIZE = len(CHECKSUM_PREFIX) + 64 + 1
+CHECKSUM_CHUNK_SIZE = 1 << 20
+
+def _as_columns(X):
+    """Column lists and row count from a DataFrame, a dict of columns, a list of records or one record."""
+    if hasattr(X, 'columns'):
+        return {col: X[col].tolist() for col in X.columns}, len(X)
+    if isinstance(X, dict):
+        if all(isinstance(v, list) for v in X.values()):
+            lengths = {len(v) for v in X.values()}
+            if len(lengths) > 1:
+                raise ValueError("All columns must have the same length")
+            return X, lengths.pop() if lengths else 0
+        X = [X]
+    rows = list(X)
+    if not all(isinstance(row, dict) for row in rows):
+        raise ValueError("Expected records as dicts")
+    fields = CATEGORICAL_COLUMNS + NUMERIC_COLUMNS
+    return {col: [row.get(col) for row in rows] for col in fields}, len(rows)
+
+class RetentionEncoder(TransformerMixin, BaseEstimator):
+    """
+    Pipeline step turning raw airman profiles into the model's unscaled feature matrix.
+
+    Args:
+        encoders: Dictionary of fitted label encoders for the categorical variables
+        feature_columns: Feature column names, in model order
+    """
+
+    def __init__(self, encoders=None, feature_columns=None):
+        self.encoders = encoders
+        self.feature_columns = feature_columns
+
+    def fit(self, X=None, y=None):
+        # The encoders arrive fitted from training; fitting only compiles the lookups
+        self.transformer_ = RetentionFeatureTransformer(self.encoders, None, self.feature_columns, requires_scaling=False)
+        self.n_features_out_ = len(self.feature_columns)
+        return self
+
+    def transform(self, X):
+        """Raises ValueError naming the first row with a missing or invalid field."""
+        columns, n_rows = _as_columns(X)
+        features, valid, errors = self.transformer_.encode_batch(columns, n_rows)
+        if not valid.all():
+            i = int(np.flatnonzero(~valid)[0])
+            raise ValueError(f"Row {i}: {errors[i][0]}")
+        return features
+
+def _without_feature_names(estimator, feature_columns):
+    """
+    Copy of an estimator fitted on a DataFrame, minus the column names it would check.
+
+    RetentionEncoder outputs arrays in feature_columns order, so the names are checked once here
+    instead of warning on every call.
+    """
+    names = getattr(estimator, 'feature_names_in_', None)
+    if names is None:
+        return estimator
+    if list(names) != list(feature_columns):
+        raise ValueError(f"{type(estimator).__name__} was fitted on {list(names)}, expected {list(feature_columns)}")
+    estimator = copy.copy(estimator)
+    del estimator.feature_names_in_
+    return estimator
+
+class PrefittedModel(BaseEstimator):
+    """
+    Pipeline step for a scoring-only model that is not an sklearn estimator, e.g. a FlatTreeEnsemble.
+
+    Such models are only built from an estimator that is already fitted, so fitting the step
+    leaves it unchanged, as with sklearn's FrozenEstimator.
+    """
+
+    def __init__(self, model=None):
+        self.model = model
+
+    def fit(self, X=None, y=None):
+        return self
+
+    def __sklearn_is_fitted__(self):
+        return True
+
+    @property
+    def classes_(self):
+        return self.model.classes_
+
+    def predict_proba(self, X):
+        return self.model.predict_proba(X)
+
+    def predict(self, X):
+        return self.model.predict(X)
+
+def _model_step(model, feature_columns):
+    if not hasattr(model, 'fit'):
+        return PrefittedModel(model)
+    return _without_feature_names(model, feature_columns)
+
+def build_pipeline(encoders, scaler, feature_columns, model):
+    """Fuse fitted preprocessing and estimator; scaler may be None for models trained on unscaled features."""
+    return Pipeline([
+        ('encode', RetentionEncoder(encoders, list(feature_columns)).fit()),
+        ('scale', _without_feature_names(scaler, feature_columns) if scaler is not None else 'passthrough'),
+        ('model', _model_step(model, feature_columns)),
+    ])
+
+def pipeline_parts(pipeline):
+    """
+    Returns:
+        (encoders, scaler or None, feature_columns, model) of a fused pipeline
+    """
+    encoder = pipeline.named_steps['encode']
+    scaler = pipeline.named_steps['scale']
+    model = pipeline.named_steps['model']
+    if isinstance(model, PrefittedModel):
+        model = model.model
+    return encoder.encoders, None if scaler == 'passthrough' else scaler, encoder.feature_columns, model
+
+def build_schema(pipeline, model_type):
+    """Describe the inputs the pipeline accepts and the classes it returns."""
+    encoders, scaler, feature_columns, model = pipeline_parts(pipeline)
+    inputs = {col: {'type': 'category', 'values': [str(v) for v in encoders[col].classes_]} for col in CATEGORICAL_COLUMNS}
+    inputs.update({col: {'type': 'number'} for col in NUMERIC_COLUMNS})
+    return {
+        'inputs': inputs,
+        'feature_columns': list(feature_columns),
+        'scaled': scaler is not None,
+        'model_type': model_type,
+        'classes': np.asarray(model.classes_).tolist(),
+    }
+
+def save_pipeline_artifact(pipeline, path, model_type, metadata=None, onnx_graph=None):
+    """
+    Write the pipeline, its schema and a checksum to one file.
+
+    Args:
+        onnx_graph: Optional serialized ONNX graph of the scaler and model (see onnx_backend.export_onnx),
+            taking the encoder's output
+
+    The file is written next to path and renamed into place, so a process
+    watching path never sees a partial artifact.
+
+    Returns:
+        The artifact's SHA-256 hex digest
+    """
+    import sklearn
+
+    artifact = {
+        'format_version': FORMAT_VERSION,
+        'schema': build_schema(pipeline, model_type),
+        'metadata': dict(metadata or {}, created_at=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                         sklearn_version=sklearn.__version__),
+        'pipeline': pipeline,
+    }
+    if onnx_graph is not None:
+        artifact['onnx'] = onnx_graph
+    buffer = io.BytesIO()
+    # Uncompressed, so the estimator's arrays can be memory-mapped when loaded
+    joblib.dump(artifact, buffer, compress=0)
+    payload = buffer.getvalue()
+    digest = hashlib.sha256(payload).hexdigest()
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+        f.write(CHECKSUM_PREFIX + digest.encode('ascii') + b'\n')
+    os.replace(tmp_path, path)
+    return digest
+
+def verify_checksum(f, size):
+    """
+    Hash the artifact open as f, of size bytes, in chunks and check it against its checksum trailer.
+
+    Returns:
+        The SHA-256 hex digest of the bytes before the trailer, with f back at its start
+    Raises:
+        ValueError if there is no trailer or it does not match
+    """
+    if size <= CHECKSUM_TRAILER_SIZE:
+        raise ValueError("Pipeline artifact has no checksum")
+    digest = hashlib.sha256()
+    f.seek(0)
+    remaining = size - CHECKSUM_TRAILER_SIZE
+    while remaining:
+        chunk = f.read(min(CHECKSUM_CHUNK_SIZE, remaining))
+        if not chunk:
+            raise ValueError("Pipeline artifact changed while it was loaded")
+        digest.update(chunk)
+        remaining -= len(chunk)
+    trailer = f.read(CHECKSUM_TRAILER_SIZE)
+    f.seek(0)
+    if len(trailer) != CHECKSUM_TRAILER_SIZE or not trailer.startswith(CHECKSUM_PREFIX):
+        raise ValueError("Pipeline artifact has no checksum")
+    expected = trailer[len(CHECKSUM_PREFIX):-1].decode('ascii', errors='replace')
+    actual = digest.hexdigest()
+    if actual != expected:
+        raise ValueError(f"Pipeline artifact checksum mismatch: expected {expected}, got {actual}")
+    return actual
+
+def _file_identity(stat):
+    return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+def load_pipeline_artifact(path, mmap=True):
+    """
+    Verify and load a fused pipeline artifact.
+
+    Args:
+        mmap: Memory-map the estimator's arrays instead of copying them
+
+    Returns:
+        Dictionary with format_version, schema, metadata, pipeline, sha256 (the verified checksum)
+        and, when exported, onnx
+    Raises:
+        ValueError if the checksum does not match, or the file was replaced or rewritten while it was loaded
+    """
+    with open(path, 'rb') as f:
+        verified = _file_identity(os.fstat(f.fileno()))
+        digest = verify_checksum(f, verified[2])
+        # joblib stops reading at the end of its stream, before the trailer
+        artifact = joblib.load(path, mmap_mode='r') if mmap else joblib.load(f)
+        changed = _file_identity(os.fstat(f.fileno())) != verified
+        if mmap:
+            # joblib maps the arrays from the file by name, so check it is still the file that was verified
+            changed = changed or _file_identity(os.stat(path)) != verified
+        if changed:
+            raise ValueError("Pipeline artifact changed while it was loaded")
+    artifact['sha256'] = digest
+    if artifact.get('format_version', 0) > FORMAT_VERSION:
+        raise ValueError(f"Pipeline artifact format {artifact['format_version']} is newer than supported ({FORMAT_VERSION})")
+    return artifact
+
+def load_legacy_artifacts(model_dir):
+    """Assemble a pipeline from the four-file layout. The scaler file is only needed when the model requires scaling."""
+    feature_info = joblib.load(os.path.join(model_dir, LEGACY_FILENAMES['feature_info']))
+    model = joblib.load(os.path.join(model_dir, LEGACY_FILENAMES['model']))
+    encoders = joblib.load(os.path.join(model_dir, LEGACY_FILENAMES['encoders']))
+    scaler = joblib.load(os.path.join(model_dir, LEGACY_FILENAMES['scaler'])) if feature_info['requires_scaling'] else None
+    pipeline = build_pipeline(encoders, scaler, feature_info['feature_columns'], model)
+    return {
+        'format_version': 0,
+        'schema': build_schema(pipeline, feature_info.get('model_type')),
+        'metadata': {},
+        'pipeline': pipeline,
+    }
+
+def load_retention_pipeline(model_dir):
+    """Load the fused artifact from model_dir, falling back to the four-file layout."""
+    path = os.path.join(model_dir, PIPELINE_FILENAME)
+    if os.path.exists(path):
+        return load_pipeline_artifact(path)
+    return load_legacy_artifacts(model_dir)
@@ -0,0 +1,278 @@
+"""
+Partitioned Parquet store for the Air Force retention dataset
+
+New airman records arrive as CSV batches. Each batch is checked and cast
+once, at write time, to a fixed schema (categories dictionary-encoded,
+counts and amounts as int32, retained as bool), then written as one
+Parquet file in a partition for the day it was ingested:
+
+    <store>/ingest_date=2024-05-01/part-00000-<content hash>.parquet
+
+Readers load only the columns and partitions they ask for, already typed,
+instead of re-parsing the whole CSV. Ingesting the same batch twice is a
+no-op, and files appear atomically, so readers never see a partial batch.
+
+The API serves the store in place of the base CSV once it holds a batch,
+so the first ingest into an empty store writes the base CSV's records
+first (--seed, or --no-seed to start from the new batches alone).
+
+Usage:
+    python retention_store.py ingest models/airforce_retention/retention_store new_airmen.csv
+    python retention_store.py info models/airforce_retention/retention_store
+"""
+
+import argparse
+import datetime
+import glob
+import hashlib
+import os
+import re
+import tempfile
+
+import numpy as np
+
+from retention_features import CATEGORICAL_COLUMNS, NUMERIC_COLUMNS
+
+TARGET_COLUMN = 'retained'
+COLUMNS = ['age', 'gender', 'marital_status', 'num_dependents', 'grade_rank', 'salary', 'years_of_service',
+           'num_prior_reenlistments', 'bonuses_received', TARGET_COLUMN]
+
+# The dataset the API serves until the store holds any records
+BASE_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models/airforce_retention', 'airforce_retention_data.csv')
+
+PARTITION_PATTERN = re.compile(r'^ingest_date=(\d{4}-\d{2}-\d{2})$')
+INT32_RANGE = (-2 ** 31, 2 ** 31 - 1)
+
+def arrow_schema():
+    import pyarrow as pa
+
+    types = {col: pa.dictionary(pa.int32(), pa.string()) for col in CATEGORICAL_COLUMNS}
+    types.update({col: pa.int32() for col in NUMERIC_COLUMNS})
+    types[TARGET_COLUMN] = pa.bool_()
+    return pa.schema([(col, types[col]) for col in COLUMNS])
+
+def _first_bad_row(mask):
+    return int(np.flatnonzero(mask)[0])
+
+def _bool_column(values):
+    if values.dtype == bool:
+        return values.to_numpy()
+    text = values.astype(str).str.strip().str.lower()
+    parsed = text.map({'true': True, 'false': False, '1': True, '0': False})
+    if parsed.isna().any():
+        row = _first_bad_row(parsed.isna().to_numpy())
+        raise ValueError(f"Invalid value for {TARGET_COLUMN} in row {row}: {values.iloc[row]!r}")
+    return parsed.to_numpy(dtype=bool)
+
+def to_arrow_batch(frame):
+    """
+    Check a DataFrame of airman records and cast it to the store schema.
+
+    Raises:
+        ValueError naming the first missing column, or the first row with a missing or invalid value
+    """
+    import pandas as pd
+    import pyarrow as pa
+
+    missing = [col for col in COLUMNS if col not in frame.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+    arrays = []
+    for col in COLUMNS:
+        values = frame[col]
+        if values.isna().any():
+            raise ValueError(f"Missing value for {col} in row {_first_bad_row(values.isna().to_numpy())}")
+        if col in CATEGORICAL_COLUMNS:
+            arrays.append(pa.array(values.astype(str).to_numpy()).dictionary_encode())
+        elif col == TARGET_COLUMN:
+            arrays.append(pa.array(_bool_column(values)))
+        else:
+            numbers = pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64)
+            bad = np.isnan(numbers) | (numbers != np.round(numbers)) | (numbers < INT32_RANGE[0]) | (numbers > INT32_RANGE[1])
+            if bad.any():
+                row = _first_bad_row(bad)
+                raise ValueError(f"Invalid value for {col} in row {row}: {values.iloc[row]!r}")
+            arrays.append(pa.array(numbers.astype(np.int32)))
+    return pa.Table.from_arrays(arrays, schema=arrow_schema())
+
+def batch_digest(frame):
+    """Content hash of a batch's rows, so the same records ingested twice are recognized."""
+    import pandas as pd
+
+    hashes = pd.util.hash_pandas_object(frame[COLUMNS].astype(str), index=False).to_numpy()
+    return hashlib.sha256(hashes.tobytes()).hexdigest()[:16]
+
+class RetentionStore:
+    """
+    Args:
+        root: Directory holding the ingest_date=... partitions; created on the first append
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def partitions(self):
+        """Ingest dates present in the store, oldest first."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(match.group(1) for match in map(PARTITION_PATTERN.match, os.listdir(self.root)) if match)
+
+    def parts(self, partitions=None):
+        """Parquet files of the given ingest dates (all by default), in ingestion order."""
+        dates = self.partitions() if partitions is None else sorted(partitions)
+        paths = []
+        for date in dates:
+            paths.extend(sorted(glob.glob(os.path.join(self.root, f'ingest_date={date}', 'part-*.parquet'))))
+        return paths
+
+    def __bool__(self):
+        return bool(self.parts())
+
+    def key(self):
+        """(latest mtime_ns, total size) of the store's files, which changes whenever a batch is added."""
+        stats = [os.stat(path) for path in self.parts()]
+        return max((st.st_mtime_ns for st in stats), default=0), sum(st.st_size for st in stats)
+
+    def part_names(self, partitions=None):
+        """Like parts, relative to the store root, e.g. to remember which batches a model was trained on."""
+        return [os.path.relpath(path, self.root) for path in self.parts(partitions)]
+
+    def digest(self, partitions=None):
+        """Hash of the stored batches' content hashes, e.g. to key caches built from the data."""
+        return hashlib.sha256('\n'.join(self.part_names(partitions)).encode('utf-8')).hexdigest()[:16]
+
+    def read_table(self, columns=None, partitions=None, names=None):
+        """
+        Load the store as one pyarrow.Table.
+
+        Args:
+            columns: Columns to read (all by default); the others are never decoded
+            partitions: Ingest dates to read (all by default)
+            names: Files to read instead, as returned by part_names
+        """
+        import pyarrow.dataset as ds
+
+        paths = self.parts(partitions) if names is None else [os.path.join(self.root, name) for name in names]
+        dataset = ds.dataset(paths, format='parquet', schema=arrow_schema())
+        return dataset.to_table(columns=columns or COLUMNS)
+
+    def read_frame(self, columns=None, partitions=None, names=None):
+        """Like read_table, as a DataFrame with the categorical columns as pandas categoricals."""
+        return self.read_table(columns, partitions, names).to_pandas()
+
+    def _stored(self, digest):
+        return bool(glob.glob(os.path.join(self.root, 'ingest_date=*', f'part-*-{digest}.parquet')))
+
+    def append(self, frame, ingest_date=None):
+        """
+        Add a batch of records.
+
+        Args:
+            frame: DataFrame with the dataset's columns
+            ingest_date: datetime.date or 'YYYY-MM-DD' of the partition; today by default
+
+        Returns:
+            Path of the new file, or None if the batch was already stored
+        """
+        import pyarrow.parquet as pq
+
+        table = to_arrow_batch(frame)
+        digest = batch_digest(frame)
+        if self._stored(digest):
+            return None
+
+        date = str(ingest_date or datetime.date.today())
+        if not re.fullmatch(r'\d{4}-\d{2}-\d{2}', date):
+            raise ValueError(f"Invalid ingest date: {date}")
+        partition = os.path.join(self.root, f'ingest_date={date}')
+        os.makedirs(partition, exist_ok=True)
+
+        # Written to a file of its own and renamed into place, so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(prefix='.part-', suffix='.tmp', dir=partition)
+        os.close(fd)
+        try:
+            pq.write_table(table, tmp_path, compression='zstd')
+            sequence = self._claim_sequence(partition)
+            if self._stored(digest):
+                # Stored by a concurrent ingest of the same batch
+                return None
+            path = os.path.join(partition, f'part-{sequence:05d}-{digest}.parquet')
+            os.replace(tmp_path, path)
+            return path
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @staticmethod
+    def _claim_sequence(partition):
+        """
+        Number the next file of a partition, claimed by creating a hidden .sequence-NNNNN file exclusively.
+
+        Concurrent ingests never get the same number: the one that loses the race takes the next.
+        """
+        names = glob.glob(os.path.join(partition, 'part-*.parquet'))
+        sequence = max((int(os.path.basename(name).split('-')[1]) for name in names), default=-1) + 1
+        while True:
+            try:
+                os.close(os.open(os.path.join(partition, f'.sequence-{sequence:05d}'), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return sequence
+            except FileExistsError:
+                sequence += 1
+
+    def ingest_csv(self, path, ingest_date=None):
+        """Append the records of a CSV file; returns the new file's path, or None if already stored."""
+        import pandas as pd
+        return self.append(pd.read_csv(path), ingest_date)
+
+    def info(self):
+        """Rows, files and bytes per partition, from the Parquet footers."""
+        import pyarrow.parquet as pq
+
+        summary = {}
+        for date in self.partitions():
+            parts = self.parts([date])
+            summary[date] = {
+                'files': len(parts),
+                'rows': sum(pq.ParquetFile(path).metadata.num_rows for path in parts),
+                'bytes': sum(os.path.getsize(path) for path in parts),
+            }
+        return summary
+
+def load_retention_frame(path, columns=None, partitions=None):
+    """Read the retention dataset from a store directory or a CSV file."""
+    if os.path.isdir(path):
+        return RetentionStore(path).read_frame(columns, partitions)
+    if partitions is not None:
+        raise ValueError("Partitions can only be selected in a retention store")
+    import pandas as pd
+    return pd.read_csv(path, usecols=columns)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Ingest airman records into the partitioned retention store')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    ingest = subparsers.add_parser('ingest', help='Append CSV batches')
+    ingest.add_argument('store')
+    ingest.add_argument('csv', nargs='+')
+    ingest.add_argument('--date', help='Ingest date (YYYY-MM-DD) of the partition; today by default')
+    ingest.add_argument('--seed', default=BASE_CSV, help='CSV written first when the store is empty (default: the base dataset)')
+    ingest.add_argument('--no-seed', dest='seed', action='store_const', const=None,
+                        help='Start an empty store from the new batches alone')
+    info = subparsers.add_parser('info', help='Rows, files and bytes per partition')
+    info.add_argument('store')
+    args = parser.parse_args(argv)
+
+    store = RetentionStore(args.store)
+    if args.command == 'ingest':
+        if args.seed and not store:
+            written = store.ingest_csv(args.seed, args.date)
+            print(f"{args.seed}: {'already stored' if written is None else f'seeded {written}'}")
+        for csv_path in args.csv:
+            written = store.ingest_csv(csv_path, args.date)
+            print(f"{csv_path}: {'already stored' if written is None else f'wrote {written}'}")
+    else:
+        for date, summary in store.info().items():
+            print(f"{date}  {summary['files']:>4} files  {summary['rows']:>10,} rows  {summary['bytes']:>12,} bytes")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Sampling profiler that can be switched on in a running worker
+
+A background thread reads the stack of every (or every selected) thread
+at a fixed interval and counts identical stacks. The counts are returned in
+the collapsed-stack format ("outer;inner;leaf count" per line) read by
+flamegraph.pl and speedscope. Nothing is sampled, and no thread runs, while
+the profiler is stopped.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+class SamplingProfiler:
+    """
+    Args:
+        threads: Optional function returning the idents of the threads to sample; all other threads otherwise
+        max_depth: Innermost frames kept per stack
+    """
+
+    def __init__(self, threads=None, max_depth=64):
+        self.threads = threads
+        self.max_depth = max_depth
+        self._lock = threading.Lock()      # guards the samples
+        self._control = threading.Lock()   # serializes start and stop
+        self._stacks = Counter()
+        self._samples = 0
+        self._thread = None
+        self._stop = threading.Event()
+        self.interval = None
+        self.started_at = None
+        self.stops_at = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval_ms=5.0, duration=None):
+        """
+        Start sampling every interval_ms milliseconds, for duration seconds if given.
+
+        Samples already collected are kept; call reset() to drop them.
+        """
+        with self._control:
+            if self.running:
+                self._stop.set()
+                self._thread.join()
+            self.interval = interval_ms / 1000.0
+            self.started_at = time.time()
+            self.stops_at = None if duration is None else time.monotonic() + duration
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(self._stop,), name='sampling-profiler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._control:
+            if self._thread is not None:
+                self._stop.set()
+                self._thread.join()
+                self._thread = None
+
+    def reset(self):
+        with self._lock:
+            self._stacks.clear()
+            self._samples = 0
+
+    def _run(self, stop):
+        own = threading.get_ident()
+        while not stop.wait(self.interval):
+            if self.stops_at is not None and time.monotonic() >= self.stops_at:
+                return
+            selected = self.threads() if self.threads is not None else None
+            stacks = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (selected is not None and ident not in selected):
+                    continue
+                names = []
+                while frame is not None and len(names) < self.max_depth:
+                    names.append(_frame_name(frame))
+                    frame = frame.f_back
+                stacks.append(';'.join(reversed(names)))
+            with self._lock:
+                self._stacks.update(stacks)
+                self._samples += 1
+
+    def collapsed(self):
+        """Sampled stacks in the collapsed-stack format, most frequent first."""
+        with self._lock:
+            stacks = self._stacks.most_common()
+        return ''.join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'running': self.running,
+                'interval_ms': None if self.interval is None else self.interval * 1000.0,
+                'started_at': self.started_at,
+                'samples': self._samples,
+                'distinct_stacks': len(self._stacks),
+            }
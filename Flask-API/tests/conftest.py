@@ -0,0 +1,32 @@
+import os
+import re
+import sys
+
+import pytest
+
+# The app's modules live at the Flask-API root, next to this directory
+FLASK_API_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, FLASK_API_DIR)
+
+@pytest.fixture(scope='session')
+def flask_app():
+    import app
+    return app
+
+@pytest.fixture
+def client(flask_app):
+    return flask_app.app.test_client()
+
+def _metrics_sample(metrics_text, name, **labels):
+    """Value of the sample of name whose labels include labels in Prometheus text, or None."""
+    for line in metrics_text.splitlines():
+        match = re.match(r'(\w+)\{(.*)\} (\S+)$', line)
+        if match and match.group(1) == name:
+            found = dict(re.findall(r'(\w+)="([^"]*)"', match.group(2)))
+            if all(found.get(key) == value for key, value in labels.items()):
+                return float(match.group(3))
+    return None
+
+@pytest.fixture
+def metrics_sample():
+    return _metrics_sample
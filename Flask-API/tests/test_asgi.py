@@ -0,0 +1,55 @@
+"""The ASGI entry point: async Envision routes in /metrics, and request errors answered like the Flask routes."""
+
+import pytest
+
+pytest.importorskip('starlette')
+pytest.importorskip('a2wsgi')
+pytest.importorskip('httpx')
+
+from starlette.testclient import TestClient
+
+from envision_client import AsyncEnvisionClient
+from mock_envision import start_mock_envision
+
+@pytest.fixture(scope='module')
+def envision_url():
+    server, base_url = start_mock_envision()
+    yield base_url
+    server.shutdown()
+
+@pytest.fixture
+def asgi_client(flask_app, envision_url, monkeypatch):
+    import asgi
+
+    monkeypatch.setattr(asgi, 'envision_client', AsyncEnvisionClient(envision_url, 'token'))
+    flask_app.envision_cache.invalidate()
+    with TestClient(asgi.application) as client:
+        yield client
+    flask_app.envision_cache.invalidate()
+
+def test_async_routes_are_measured(asgi_client, metrics_sample):
+    before = asgi_client.get('/metrics').text
+    count = metrics_sample(before, 'http_request_duration_seconds_count', route='/envision-dataset', method='GET', status='200') or 0
+
+    response = asgi_client.get('/envision-dataset?rid=ri.test&rowLimit=10')
+    assert response.status_code == 200
+    assert len(response.json()) == 10
+    assert asgi_client.get('/envision-dataset?rid=ri.test&rowLimit=10&format=xml').status_code == 400
+    assert asgi_client.post('/predict_ticket_assignment', json={'ticket': 'printer jam'}).json() == {
+        'output': {'ticket': 'printer jam'}
+    }
+
+    metrics = asgi_client.get('/metrics').text
+    assert metrics_sample(metrics, 'http_request_duration_seconds_count',
+                          route='/envision-dataset', method='GET', status='200') == count + 1
+    assert metrics_sample(metrics, 'http_request_duration_seconds_count',
+                          route='/envision-dataset', method='GET', status='400') >= 1
+    assert metrics_sample(metrics, 'http_request_duration_seconds_count',
+                          route='/predict_ticket_assignment', method='POST', status='200') >= 1
+    assert metrics_sample(metrics, 'http_requests_in_flight', route='/envision-dataset') == 0
+
+def test_malformed_ticket_body(asgi_client):
+    response = asgi_client.post('/predict_ticket_assignment', content=b'{"ticket": ',
+                                headers={'Content-Type': 'application/json'})
+    assert response.status_code == 400
+    assert 'Invalid JSON body' in response.json()['error']
@@ -0,0 +1,47 @@
+"""The benchmark suite's baseline check: a regression is flagged only beyond the threshold and the spread of the runs."""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+import suite
+
+def result(p50_runs, per_second_runs):
+    runs = [{'predict': {'p50_ms': p50, 'p99_ms': p50 * 2, 'calls_per_second': rate}}
+            for p50, rate in zip(p50_runs, per_second_runs)]
+    return suite.median_of_runs(runs)
+
+def statuses(before, after, threshold=0.25):
+    rows, regressions = suite.compare(after, {'results': before}, threshold)
+    return {metric: status for _, metric, _, _, _, status in rows}, len(regressions)
+
+BASELINE = ([1.0, 1.1, 1.0, 0.9, 1.0], [1000, 950, 1000, 1050, 1000])
+
+def test_runs_are_kept_for_gated_metrics():
+    combined = result(*BASELINE)['predict']
+    assert combined['p50_ms'] == 1.0 and combined['calls_per_second'] == 1000
+    assert combined['p50_ms_runs'] == BASELINE[0]
+    assert combined['calls_per_second_runs'] == BASELINE[1]
+    assert 'p99_ms_runs' not in combined
+
+def test_clear_regression():
+    after = result([1.5, 1.6, 1.5, 1.4, 1.5], [650, 600, 650, 700, 650])
+    assert statuses(result(*BASELINE), after) == ({'p50_ms': 'REGRESSION', 'calls_per_second': 'REGRESSION'}, 2)
+
+def test_noisy_runs_are_not_flagged():
+    # The median is 40% slower, but the runs spread over the baseline's
+    after = result([1.4, 0.9, 1.4, 1.5, 1.0], [700, 1100, 700, 650, 1000])
+    assert statuses(result(*BASELINE), after) == ({'p50_ms': 'noise', 'calls_per_second': 'noise'}, 0)
+
+def test_within_threshold():
+    after = result([1.1, 1.2, 1.1, 1.1, 1.1], [900, 850, 900, 900, 900])
+    assert statuses(result(*BASELINE), after) == ({'p50_ms': '', 'calls_per_second': ''}, 0)
+
+@pytest.mark.parametrize('repeats', [1, 2])
+def test_too_few_runs_are_not_gated(repeats):
+    before = result(BASELINE[0][:repeats], BASELINE[1][:repeats])
+    after = result([2.0] * repeats, [500] * repeats)
+    assert statuses(before, after) == ({'p50_ms': 'too few runs', 'calls_per_second': 'too few runs'}, 0)
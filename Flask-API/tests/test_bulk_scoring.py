@@ -0,0 +1,101 @@
+"""score_airforce_retention.py end to end on small files, with the shipped retention model."""
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+SCRIPT_DIR = os.path.join(os.path.dirname(__file__), '..', 'models', 'airforce_retention')
+sys.path.insert(0, SCRIPT_DIR)
+
+import score_airforce_retention as bulk
+
+CHUNK_SIZE = 10
+
+@pytest.fixture
+def airmen(tmp_path):
+    """A CSV whose first chunk holds only rows that cannot be scored, followed by two chunks of valid rows."""
+    valid = pd.read_csv(os.path.join(SCRIPT_DIR, 'airforce_retention_data.csv')).head(2 * CHUNK_SIZE)
+    invalid = valid.head(CHUNK_SIZE).assign(gender='Unknown')
+    path = tmp_path / 'airmen.csv'
+    pd.concat([invalid, valid], ignore_index=True).to_csv(path, index=False)
+    return path, valid
+
+def score(input_path, output_path, *args):
+    bulk.main([str(input_path), str(output_path), '--chunk-size', str(CHUNK_SIZE), *map(str, args)])
+    return pd.read_parquet(output_path) if str(output_path).endswith('.parquet') else pd.read_csv(output_path)
+
+@pytest.mark.parametrize('output_name, args', [
+    ('scores.csv', ()),
+    ('scores.parquet', ()),
+    ('scores.csv', ('--workers', 2)),
+], ids=['csv', 'parquet', 'workers'])
+def test_first_chunk_all_rejected(tmp_path, airmen, output_name, args):
+    if output_name.endswith('.parquet'):
+        pytest.importorskip('pyarrow')
+    input_path, valid = airmen
+    scores = score(input_path, tmp_path / output_name, *args)
+
+    assert scores['row_number'].tolist() == list(range(CHUNK_SIZE, 3 * CHUNK_SIZE))
+    assert scores['grade_rank'].tolist() == valid['grade_rank'].tolist()
+    assert scores['retention_probability'].between(0, 1).all()
+
+    rejects = pd.read_csv(tmp_path / 'scores.rejects.csv')
+    assert rejects['row_number'].tolist() == list(range(CHUNK_SIZE))
+    assert rejects['reject_reason'].str.contains('gender').all()
+
+def test_every_row_rejected(tmp_path, airmen):
+    input_path, _ = airmen
+    pd.read_csv(input_path).head(CHUNK_SIZE).to_csv(input_path, index=False)
+    scores = score(input_path, tmp_path / 'scores.csv')
+    assert scores.empty
+    assert {'row_number', 'grade_rank', *bulk.RESULT_COLUMNS} <= set(scores.columns)
+
+def test_selected_columns(tmp_path, airmen):
+    input_path, valid = airmen
+    scores = score(input_path, tmp_path / 'scores.csv', '--columns', 'age, grade_rank')
+    assert list(scores.columns) == ['row_number', 'age', 'grade_rank', *bulk.RESULT_COLUMNS]
+    assert scores['age'].tolist() == valid['age'].tolist()
+
+@pytest.mark.parametrize('input_name', ['airmen.csv', 'airmen.parquet'])
+def test_unknown_column_is_a_usage_error(tmp_path, airmen, capsys, input_name):
+    input_path, _ = airmen
+    if input_name.endswith('.parquet'):
+        pytest.importorskip('pyarrow')
+        parquet_path = tmp_path / input_name
+        pd.read_csv(input_path).to_parquet(parquet_path)
+        input_path = parquet_path
+    with pytest.raises(SystemExit) as exit_info:
+        score(input_path, tmp_path / 'scores.csv', '--columns', 'age,rank', '--workers', 2)
+    assert exit_info.value.code == 2
+    assert '--columns: rank not in' in capsys.readouterr().err
+    assert not (tmp_path / 'scores.csv').exists()
+
+def test_input_labels_are_kept(tmp_path, airmen):
+    # The fixture's rows still have their recorded outcome in 'retained'
+    input_path, valid = airmen
+    scores = score(input_path, tmp_path / 'scores.csv')
+    assert scores['retained'].tolist() == valid['retained'].tolist()
+    assert scores['predicted_retained'].isin([True, False]).all()
+    assert (scores['predicted_retained'] == (scores['retention_probability'] > 0.5)).all()
+
+@pytest.mark.parametrize('column, args', [
+    ('row_number', ()),
+    ('reject_reason', ('--columns', 'age')),
+    ('retention_probability', ()),
+], ids=['row-number', 'reject-reason', 'result'])
+def test_output_column_in_input_is_a_usage_error(tmp_path, airmen, capsys, column, args):
+    input_path, _ = airmen
+    pd.read_csv(input_path).assign(**{column: 1}).to_csv(input_path, index=False)
+    with pytest.raises(SystemExit) as exit_info:
+        score(input_path, tmp_path / 'scores.csv', *args)
+    assert exit_info.value.code == 2
+    assert f'already has {column}' in capsys.readouterr().err
+    assert not (tmp_path / 'scores.csv').exists()
+
+def test_result_column_left_out_with_columns(tmp_path, airmen):
+    input_path, _ = airmen
+    pd.read_csv(input_path).assign(retention_probability=-1.0).to_csv(input_path, index=False)
+    scores = score(input_path, tmp_path / 'scores.csv', '--columns', 'age')
+    assert scores['retention_probability'].between(0, 1).all()
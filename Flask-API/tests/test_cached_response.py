@@ -0,0 +1,121 @@
+"""Conditional requests and content-coding negotiation on cached dataset responses."""
+
+import gzip
+import importlib.util
+import json
+import os
+
+import pytest
+
+import cached_response
+from cached_response import CachedFileResponse, CachedResponse
+
+def get(client, **headers):
+    return client.get('/iris-data', headers=headers)
+
+def test_etag_revalidation(client):
+    first = get(client, **{'Accept-Encoding': 'identity'})
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert etag.startswith('"') and first.headers['Cache-Control'] == 'no-cache'
+
+    revalidated = get(client, **{'Accept-Encoding': 'identity', 'If-None-Match': etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers['ETag'] == etag
+    assert revalidated.get_data() == b''
+
+    assert get(client, **{'If-None-Match': '"stale"'}).status_code == 200
+
+def test_if_modified_since(client):
+    last_modified = get(client).headers['Last-Modified']
+    assert get(client, **{'If-Modified-Since': last_modified}).status_code == 304
+    assert get(client, **{'If-Modified-Since': 'Thu, 01 Jan 1970 00:00:00 GMT'}).status_code == 200
+    # If-None-Match takes precedence over If-Modified-Since
+    assert get(client, **{'If-None-Match': '"stale"', 'If-Modified-Since': last_modified}).status_code == 200
+
+def test_gzip_and_identity(client):
+    plain = get(client, **{'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.headers['Vary'] == 'Accept-Encoding'
+
+    compressed = get(client, **{'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.get_data()) == plain.get_data()
+    assert json.loads(plain.get_data()) == json.load(open(os.path.join(os.path.dirname(__file__), '..', 'datasets', 'iris.json')))
+
+    # Each content-coding has its own ETag, and either validates the cached representation
+    assert compressed.headers['ETag'] == plain.headers['ETag'][:-1] + '-gzip"'
+    assert get(client, **{'Accept-Encoding': 'gzip', 'If-None-Match': plain.headers['ETag']}).status_code == 304
+
+def test_brotli(client):
+    brotli = pytest.importorskip('brotli')
+    plain = get(client, **{'Accept-Encoding': 'identity'})
+    response = get(client, **{'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(response.get_data()) == plain.get_data()
+    assert response.headers['ETag'] == plain.headers['ETag'][:-1] + '-br"'
+
+def test_gzip_without_brotli(flask_app, client, monkeypatch, tmp_path):
+    monkeypatch.setattr(cached_response, 'brotli', None)
+    path = tmp_path / 'rows.json'
+    path.write_text('[1, 2, 3]')
+    monkeypatch.setattr(flask_app, 'iris_data_response',
+                        CachedFileResponse(str(path), flask_app.load_json_file, flask_app.dump_json_body))
+    response = get(client, **{'Accept-Encoding': 'br, gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+
+def test_body_built_only_for_full_responses(flask_app, client, monkeypatch):
+    built = []
+    build = cached_response.CachedResponse.build
+    monkeypatch.setattr(cached_response.CachedResponse, 'build', lambda self, *args: built.append(1) or build(self, *args))
+    table = flask_app.retention_data_response
+    monkeypatch.setattr(flask_app, 'retention_data_response', CachedFileResponse(
+        table.path, table.load, flask_app.dump_json_body, to_payload=lambda data: data.to_records(), key=table._key
+    ))
+
+    assert client.get('/local-retention-dataset?offset=0&limit=5').status_code == 200
+    assert client.get('/local-retention-dataset?filter=age>30&columns=age').status_code == 200
+    if importlib.util.find_spec('pyarrow') is not None:
+        assert client.get('/local-retention-dataset', headers={'Accept': 'application/vnd.apache.arrow.stream'}).status_code == 200
+    assert built == []
+
+    assert client.get('/local-retention-dataset').status_code == 200
+    assert client.get('/local-retention-dataset').status_code == 200
+    assert built == [1]
+
+class Key:
+    """A cache key whose next comparison first runs a rebuild for another key, as a concurrent request could."""
+
+    def __init__(self, name):
+        self.name = name
+        self.during_compare = []
+
+    def __eq__(self, other):
+        while self.during_compare:
+            self.during_compare.pop()()
+        return isinstance(other, Key) and other.name == self.name
+
+    __hash__ = None
+
+def test_entry_matches_its_key_during_a_rebuild():
+    cache = CachedResponse(json.dumps)
+    cache.entry(Key('a'), lambda: 'a', last_modified=0)
+
+    key = Key('a')
+    key.during_compare.append(lambda: cache.entry(Key('b'), lambda: 'b', last_modified=0))
+    assert cache.entry(key, lambda: 'a', last_modified=0)['data'] == 'a'
+
+def test_parsed_data_matches_its_key_during_a_reload(tmp_path):
+    keys = {'a': Key('a'), 'b': Key('b')}
+    current = ['a']
+    cached = CachedFileResponse(str(tmp_path), lambda path: current[0], json.dumps, key=lambda path: keys[current[0]])
+    assert cached.data() == 'a'
+
+    def reload_b():
+        current[0] = 'b'
+        cached.data()
+        current[0] = 'a'
+
+    keys['a'] = Key('a')
+    keys['a'].during_compare.append(reload_b)
+    assert cached.data() == 'a'
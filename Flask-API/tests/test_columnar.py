@@ -0,0 +1,152 @@
+"""ColumnarTable paging, projection, filtering and sorting, the query options of the dataset routes and Arrow responses."""
+
+import numpy as np
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from columnar import ARROW_STREAM_TYPE, ColumnarTable, parse_query
+
+@pytest.fixture
+def table():
+    return ColumnarTable({
+        'name': np.array(['Ada', 'Grace', 'Alan', 'Edsger', 'Barbara'], dtype=object),
+        'age': np.array([36, 45, 41, 45, 29]),
+        'salary': np.array([52000.5, np.nan, 61000.0, 58000.0, 47000.0]),
+        'retained': np.array([True, False, True, True, False]),
+    })
+
+def query(table, **args):
+    return table.query(**parse_query(MultiDict(args)))
+
+def names(result):
+    return [row['name'] for row in result['rows']]
+
+def test_no_options():
+    assert parse_query(MultiDict({'rid': 'ri.test'})) is None
+
+@pytest.mark.parametrize('expression, expected', [
+    ('age=45', ['Grace', 'Edsger']),
+    ('age!=45', ['Ada', 'Alan', 'Barbara']),
+    ('age>41', ['Grace', 'Edsger']),
+    ('age>=41', ['Grace', 'Alan', 'Edsger']),
+    ('age<36', ['Barbara']),
+    ('age<=36', ['Ada', 'Barbara']),
+    ('name=Alan', ['Alan']),
+    ('name != Alan', ['Ada', 'Grace', 'Edsger', 'Barbara']),
+], ids=['eq', 'ne', 'gt', 'ge', 'lt', 'le', 'string-eq', 'string-ne-spaced'])
+def test_filter_operators(table, expression, expected):
+    result = query(table, filter=expression)
+    assert names(result) == expected
+    assert result['total'] == len(expected)
+
+def test_filter_value_coercion(table):
+    # Numbers are compared as numbers, not strings ("100" < "29" as text)
+    assert names(query(table, filter='age<100')) == ['Ada', 'Grace', 'Alan', 'Edsger', 'Barbara']
+    assert names(query(table, filter='salary>=58000.0')) == ['Alan', 'Edsger']
+    assert names(query(table, filter='retained=TRUE')) == ['Ada', 'Alan', 'Edsger']
+    assert names(query(table, filter='retained=false')) == ['Grace', 'Barbara']
+    # NaN matches no comparison
+    assert 'Grace' not in names(query(table, filter='salary<1e9'))
+
+def test_filters_combine(table):
+    args = MultiDict([('filter', 'age>=36'), ('filter', 'retained=true')])
+    assert names(table.query(**parse_query(args))) == ['Ada', 'Alan', 'Edsger']
+
+def test_multi_key_sort(table):
+    # Age descending, ties broken by name ascending
+    assert names(query(table, sort='-age,name')) == ['Edsger', 'Grace', 'Alan', 'Ada', 'Barbara']
+    assert names(query(table, sort='-age,-name')) == ['Grace', 'Edsger', 'Alan', 'Ada', 'Barbara']
+    assert names(query(table, sort='name')) == ['Ada', 'Alan', 'Barbara', 'Edsger', 'Grace']
+
+def test_sort_then_page(table):
+    result = query(table, sort='age', offset='1', limit='2')
+    assert names(result) == ['Ada', 'Alan']
+    assert (result['total'], result['offset'], result['limit']) == (5, 1, 2)
+
+@pytest.mark.parametrize('offset, limit, expected', [
+    ('3', '10', ['Edsger', 'Barbara']),
+    ('5', '2', []),
+    ('50', None, []),
+    ('0', '0', []),
+], ids=['limit-past-end', 'offset-at-end', 'offset-past-end', 'zero-limit'])
+def test_paging_past_the_end(table, offset, limit, expected):
+    args = {'offset': offset} if limit is None else {'offset': offset, 'limit': limit}
+    result = query(table, **args)
+    assert names(result) == expected
+    assert result['total'] == 5
+
+def test_projection(table):
+    result = query(table, columns='age, name', limit='1')
+    assert result['columns'] == ['age', 'name']
+    assert result['rows'] == [{'age': 36, 'name': 'Ada'}]
+    # NaN is sent as null
+    assert query(table, columns='salary', filter='name=Grace')['rows'] == [{'salary': None}]
+
+@pytest.mark.parametrize('args, error', [
+    ({'columns': 'age,rank'}, 'Unknown column: rank'),
+    ({'filter': 'rank=E-5'}, 'Unknown column: rank'),
+    ({'sort': '-rank'}, 'Unknown column: rank'),
+    ({'filter': 'age>=old'}, "Invalid value for age: 'old'"),
+    ({'filter': 'retained=yes'}, "Invalid value for retained: 'yes'"),
+], ids=['columns', 'filter', 'sort', 'number', 'bool'])
+def test_invalid_query(table, args, error):
+    with pytest.raises(ValueError, match=error):
+        query(table, **args)
+
+@pytest.mark.parametrize('args, error', [
+    ({'filter': 'age'}, 'Invalid filter'),
+    ({'filter': '>=10'}, 'Invalid filter'),
+    ({'offset': 'ten'}, 'must be integers'),
+    ({'limit': '-1'}, 'must not be negative'),
+], ids=['no-operator', 'no-column', 'offset', 'negative-limit'])
+def test_malformed_options(args, error):
+    with pytest.raises(ValueError, match=error):
+        parse_query(MultiDict(args))
+
+def test_route(client):
+    response = client.get('/local-retention-dataset?columns=age,salary&filter=years_of_service>=10&sort=-salary&limit=3')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['limit'] == 3 and body['total'] >= 3
+    assert [list(row) for row in body['rows']] == [['age', 'salary']] * 3
+    salaries = [row['salary'] for row in body['rows']]
+    assert salaries == sorted(salaries, reverse=True)
+
+@pytest.mark.parametrize('query_string', [
+    'columns=age,rank', 'filter=rank=E-5', 'sort=rank', 'filter=age', 'filter=age>=old', 'offset=-1',
+], ids=['columns', 'filter-column', 'sort', 'malformed-filter', 'filter-value', 'offset'])
+def test_route_rejects_bad_queries(client, query_string):
+    response = client.get(f'/local-retention-dataset?{query_string}')
+    assert response.status_code == 400
+    assert response.get_json()['error']
+
+def read_arrow(response):
+    pa = pytest.importorskip('pyarrow')
+    assert response.status_code == 200
+    assert response.mimetype == ARROW_STREAM_TYPE
+    return pa.ipc.open_stream(response.get_data()).read_all()
+
+def test_arrow_stream_has_the_json_rows(client):
+    pytest.importorskip('pyarrow')
+    records = client.get('/local-retention-dataset').get_json()
+    table = read_arrow(client.get('/local-retention-dataset', headers={'Accept': ARROW_STREAM_TYPE}))
+    assert sorted(table.column_names) == sorted(records[0])
+    assert table.to_pylist() == records
+
+def test_arrow_page_metadata(client):
+    pytest.importorskip('pyarrow')
+    query_string = 'columns=age,grade_rank,salary&filter=years_of_service>=10&sort=-salary&offset=2&limit=5'
+    page = client.get(f'/local-retention-dataset?{query_string}').get_json()
+    table = read_arrow(client.get(f'/local-retention-dataset?{query_string}', headers={'Accept': ARROW_STREAM_TYPE}))
+    assert table.to_pylist() == page['rows']
+    assert table.schema.metadata == {b'total': str(page['total']).encode(), b'offset': b'2', b'limit': b'5'}
+
+@pytest.mark.parametrize('accept', [
+    None, '*/*', f'application/json, {ARROW_STREAM_TYPE}', f'{ARROW_STREAM_TYPE};q=0.5, application/json',
+], ids=['no-accept', 'any', 'tie', 'json-preferred'])
+def test_json_stays_the_default(client, accept):
+    headers = {'Accept': accept} if accept else {}
+    response = client.get('/local-retention-dataset?limit=2', headers=headers)
+    assert response.mimetype == 'application/json'
+    assert len(response.get_json()['rows']) == 2
+    assert 'Accept' in response.headers['Vary']
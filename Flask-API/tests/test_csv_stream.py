@@ -0,0 +1,52 @@
+"""Incremental and streamed CSV parsing of Envision bodies."""
+
+import io
+
+import pytest
+
+from csv_stream import CsvRecordParser, iter_csv_records, parse_cell
+
+# Unquoted free text holding characters str.splitlines treats as line breaks, a quoted newline and CRLF endings
+BODY = (
+    'name,notes,age\r\n'
+    'Ada,line\u2028separator\u2029here,36\r\n'
+    'Grace,"two\nlines",45\r\n'
+    'Alan,tab\x0bform\x0cfeed\x1cgroup\x85next para,41\r\n'
+)
+EXPECTED = [
+    {'name': 'Ada', 'notes': 'line\u2028separator\u2029here', 'age': 36},
+    {'name': 'Grace', 'notes': 'two\nlines', 'age': 45},
+    {'name': 'Alan', 'notes': 'tab\x0bform\x0cfeed\x1cgroup\x85next para', 'age': 41},
+]
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 7, len(BODY)])
+def test_incremental_parser_splits_only_on_newlines(chunk_size):
+    parser = CsvRecordParser()
+    records = []
+    for start in range(0, len(BODY), chunk_size):
+        records.extend(parser.feed(BODY[start:start + chunk_size]))
+    records.extend(parser.close())
+    assert records == EXPECTED
+
+def test_unterminated_last_record():
+    parser = CsvRecordParser()
+    records = parser.feed(BODY.rstrip('\r\n'))
+    assert records + parser.close() == EXPECTED
+
+def test_streamed_records():
+    assert list(iter_csv_records(io.BytesIO(BODY.encode('utf-8')))) == EXPECTED
+
+@pytest.mark.parametrize('cell, expected', [
+    ('1000', 1000),
+    ('1.5', 1.5),
+    ('', None),
+    ('nan', None),
+    ('true', True),
+    ('1_000', '1_000'),
+    ('1_0.5', '1_0.5'),
+    ('_1', '_1'),
+    ('unit_2', 'unit_2'),
+], ids=['int', 'float', 'empty', 'nan', 'bool', 'int-underscore', 'float-underscore', 'leading-underscore', 'text'])
+def test_parse_cell(cell, expected):
+    assert parse_cell(cell) == expected
+    assert type(parse_cell(cell)) is type(expected)
@@ -0,0 +1,32 @@
+"""Grid spec validation on the decision surface routes."""
+
+import pytest
+
+PETAL_LENGTH = {'min': 1, 'max': 7, 'steps': 5}
+PETAL_WIDTH = {'min': 0, 'max': 2.5, 'steps': 4}
+
+def test_iris_grid(client):
+    response = client.post('/predict-iris-grid', json={'axes': {'petal_length': PETAL_LENGTH, 'petal_width': PETAL_WIDTH}})
+    assert response.status_code == 200
+    assert response.get_json()['shape'] == [5, 4]
+
+    response = client.post('/predict-iris-grid', json={'axes': {'petal_length': PETAL_LENGTH}, 'fixed': {'petal_width': 1.2}})
+    assert response.status_code == 200
+    assert response.get_json()['shape'] == [5]
+
+@pytest.mark.parametrize('spec, error', [
+    ({'axes': {'petal_length': PETAL_LENGTH}}, 'Missing feature: petal_width'),
+    ({'axes': {'petal_width': PETAL_WIDTH}, 'fixed': {}}, 'Missing feature: petal_length'),
+    ({'axes': {'petal_length': PETAL_LENGTH, 'petal_width': {'values': ['narrow', 'wide']}}}, 'Axis petal_width values must be numbers'),
+    ({'axes': {'petal_length': PETAL_LENGTH}, 'fixed': {'petal_width': 'wide'}}, 'Fixed value for petal_width must be a finite number'),
+    ({'axes': {'petal_length': PETAL_LENGTH}, 'fixed': {'petal_width': None}}, 'Fixed value for petal_width must be a finite number'),
+    ({'axes': {'petal_length': PETAL_LENGTH}, 'fixed': {'petal_width': True}}, 'Fixed value for petal_width must be a finite number'),
+], ids=['missing-width', 'missing-length', 'string-axis', 'string-fixed', 'null-fixed', 'bool-fixed'])
+def test_iris_grid_rejects_bad_features(client, spec, error):
+    response = client.post('/predict-iris-grid', json=spec)
+    assert response.status_code == 400
+    assert error in response.get_json()['error']
+
+def test_retention_grid_missing_field(client):
+    response = client.post('/predict-retention-grid', json={'axes': {'salary': {'min': 20000, 'max': 90000, 'steps': 3}}})
+    assert response.status_code == 400
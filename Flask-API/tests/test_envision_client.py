@@ -0,0 +1,76 @@
+"""EnvisionClient and AsyncEnvisionClient: circuit breaker recovery and per-call accounting."""
+
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from envision_client import AsyncEnvisionClient, CircuitOpenError, EnvisionClient
+
+class Unavailable(BaseHTTPRequestHandler):
+    """Answers every request with a 503, counting the requests it receives."""
+
+    hits = 0
+
+    def do_GET(self):
+        type(self).hits += 1
+        self.send_response(503)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def unavailable_url():
+    Unavailable.hits = 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Unavailable)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+
+def test_unexpected_error_ends_half_open_trial(unavailable_url):
+    client = EnvisionClient(unavailable_url, 'token', retries=0, failure_threshold=1, reset_timeout=0.05)
+    client.get('/data')
+    assert client.breaker.state == 'open'
+    time.sleep(0.06)
+
+    # Not a requests exception; the trial must still count as failed rather than stay in flight
+    with pytest.raises(TypeError):
+        client.get('/data', not_a_requests_argument=True)
+    assert client.breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        client.get('/data')
+
+    time.sleep(0.06)
+    client.get('/data')
+    assert client.stats()['requests'] == 3
+
+def test_sync_and_async_record_one_call_each(unavailable_url):
+    pytest.importorskip('httpx')
+    seen = []
+    settings = {'retries': 2, 'backoff': 0.0, 'failure_threshold': 100}
+
+    sync = EnvisionClient(unavailable_url, 'token', **settings)
+    sync.on_request = lambda method, seconds, failed: seen.append(('sync', failed))
+    assert sync.get('/data').status_code == 503
+
+    async def call():
+        client = AsyncEnvisionClient(unavailable_url, 'token', **settings)
+        client.on_request = lambda method, seconds, failed: seen.append(('async', failed))
+        try:
+            response = await client.get('/data')
+            assert response.status_code == 503
+        finally:
+            await client.aclose()
+        return client.stats()
+
+    async_stats = asyncio.run(call())
+
+    # Three attempts upstream for each client, one recorded call each
+    assert Unavailable.hits == 6
+    assert seen == [('sync', True), ('async', True)]
+    assert sync.stats()['requests'] == async_stats['requests'] == 1
+    assert sync.stats()['failures'] == async_stats['failures'] == 1
@@ -0,0 +1,70 @@
+"""/envision-dataset against the local stand-in for the Envision API (mock_envision.py)."""
+
+import csv
+import io
+import json
+
+import pytest
+
+from mock_envision import load_rows, start_mock_envision
+
+@pytest.fixture(scope='module')
+def envision_url():
+    server, base_url = start_mock_envision()
+    yield base_url
+    server.shutdown()
+
+@pytest.fixture(autouse=True)
+def envision(flask_app, envision_url, monkeypatch):
+    monkeypatch.setattr(flask_app.envision_client, 'hostname', envision_url)
+    flask_app.envision_cache.invalidate()
+    yield
+    flask_app.envision_cache.invalidate()
+
+def test_ndjson_stream(client):
+    header, rows = load_rows()
+    response = client.get('/envision-dataset?rid=ri.test&rowLimit=2500&format=ndjson')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    # 2500 rows span several upstream chunks of 1000 and wrap around the 1000-row file
+    assert len(records) == 2500
+    assert list(records[0]) == header
+    assert records[0]['age'] == int(rows[0][0])
+    assert records[1000] == records[0]
+
+def test_csv_stream(client):
+    header, rows = load_rows()
+    response = client.get('/envision-dataset?rid=ri.test&rowLimit=1200&format=csv')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    parsed = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert parsed[0] == header
+    assert parsed[1:] == (rows + rows)[:1200]
+
+def test_json_array_fallback(client):
+    header, _ = load_rows()
+    response = client.get('/envision-dataset?rid=ri.test&rowLimit=10')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/json'
+    records = response.get_json()
+    assert isinstance(records, list) and len(records) == 10
+    assert list(records[0]) == header
+
+def test_stream_matches_json_array(client):
+    streamed = client.get('/envision-dataset?rid=ri.test&rowLimit=50&format=ndjson').get_data(as_text=True)
+    assert [json.loads(line) for line in streamed.splitlines()] == \
+        client.get('/envision-dataset?rid=ri.test&rowLimit=50').get_json()
+
+@pytest.mark.parametrize('stream_format', [None, 'ndjson', 'csv'])
+def test_upstream_error(client, stream_format):
+    url = '/envision-dataset?rid=forbidden&rowLimit=10'
+    if stream_format is not None:
+        url += f'&format={stream_format}'
+    response = client.get(url)
+    body = response.get_json()
+    assert '403' in body['error']
+
+def test_unsupported_format(client):
+    response = client.get('/envision-dataset?rid=ri.test&rowLimit=10&format=xml')
+    assert response.status_code == 400
@@ -0,0 +1,103 @@
+"""--incremental updates of the retention model from the batches ingested into a retention store since it was trained."""
+
+import os
+import sys
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+SCRIPT_DIR = os.path.join(os.path.dirname(__file__), '..', 'models', 'airforce_retention')
+sys.path.insert(0, SCRIPT_DIR)
+
+import retention_store
+import train_airforce_retention_model as training
+from retention_pipeline import PIPELINE_FILENAME, load_pipeline_artifact
+from retention_store import RetentionStore
+
+@pytest.fixture(scope='module')
+def base():
+    return pd.read_csv(retention_store.BASE_CSV)
+
+def ingest(store, base, rows, tmp_path, date):
+    path = tmp_path / f'batch-{date}.csv'
+    base.iloc[rows].to_csv(path, index=False)
+    retention_store.main(['ingest', store, str(path), '--date', date, '--no-seed'])
+
+def train(store, output_dir, *options):
+    return training.main(['--data', store, '--output-dir', str(output_dir), '--model', 'logistic_regression',
+                          '--search', 'none', '--cv', '2', '--n-jobs', '1', *options])
+
+@pytest.fixture
+def trained(base, tmp_path):
+    """A store holding one batch, and the model trained on it."""
+    store, output_dir = str(tmp_path / 'store'), tmp_path / 'model'
+    ingest(store, base, slice(0, 400), tmp_path, '2024-05-01')
+    train(store, output_dir)
+    return store, output_dir
+
+def artifact_files(output_dir):
+    return {name: (output_dir / name).read_bytes() for name in (PIPELINE_FILENAME, training.TRAINING_STATE_FILENAME)}
+
+def test_update_from_new_batches(base, trained, tmp_path):
+    store, output_dir = trained
+    before = artifact_files(output_dir)
+    ingest(store, base, slice(400, 600), tmp_path, '2024-06-01')
+
+    assert train(store, output_dir, '--incremental', '--max-regression', '1') == 0
+    assert artifact_files(output_dir) != before
+
+    state = joblib.load(output_dir / training.TRAINING_STATE_FILENAME)
+    assert state['store_parts'] == RetentionStore(store).part_names()
+    assert len(state['updates']) == 1 and state['updates'][0]['new_rows'] == 200
+    # Trained on 80% of the first batch, updated with 80% of the second
+    assert state['n_train_rows'] == 320 + 160
+
+    artifact = load_pipeline_artifact(str(output_dir / PIPELINE_FILENAME))
+    assert artifact['metadata']['incremental']['new_rows'] == 200
+    proba = artifact['pipeline'].predict_proba(base.iloc[600:650])
+    np.testing.assert_allclose(proba.sum(axis=1), 1.0)
+
+    # Nothing new since: nothing to do
+    assert train(store, output_dir, '--incremental') == 0
+    assert len(joblib.load(output_dir / training.TRAINING_STATE_FILENAME)['updates']) == 1
+
+def test_regression_is_not_published(base, trained, tmp_path, monkeypatch):
+    store, output_dir = trained
+    before = artifact_files(output_dir)
+    ingest(store, base, slice(400, 600), tmp_path, '2024-06-01')
+
+    # An update that turns the model around scores worse on the holdout rows than the current model
+    update_linear = training.update_linear
+
+    def inverted(*args):
+        model = update_linear(*args)
+        model.coef_, model.intercept_ = -model.coef_, -model.intercept_
+        return model
+
+    monkeypatch.setattr(training, 'update_linear', inverted)
+    assert train(store, output_dir, '--incremental', '--max-regression', '0.05') == 1
+    assert artifact_files(output_dir) == before
+
+def test_new_category_needs_a_full_retrain(base, trained, tmp_path):
+    store, output_dir = trained
+    before = artifact_files(output_dir)
+    new_rank = base.iloc[400:600].assign(grade_rank='E-10 (CCMSgt)')
+    path = tmp_path / 'batch-new-rank.csv'
+    new_rank.to_csv(path, index=False)
+    retention_store.main(['ingest', store, str(path), '--date', '2024-06-01', '--no-seed'])
+
+    with pytest.raises(SystemExit, match='retrain without --incremental'):
+        train(store, output_dir, '--incremental')
+    assert artifact_files(output_dir) == before
+
+    # A full retrain reads every batch and learns the new rank
+    assert train(store, output_dir) is None
+    state = joblib.load(output_dir / training.TRAINING_STATE_FILENAME)
+    assert 'E-10 (CCMSgt)' in state['label_encoders']['grade_rank'].classes_
+    assert state['store_parts'] == RetentionStore(store).part_names()
+    artifact = load_pipeline_artifact(str(output_dir / PIPELINE_FILENAME))
+    assert artifact['pipeline'].predict_proba(new_rank.head(5)).shape == (5, 2)
@@ -0,0 +1,41 @@
+"""Closed-form linear scoring against sklearn's own output."""
+
+import numpy as np
+import pytest
+from sklearn.linear_model import LinearRegression, LogisticRegression
+from sklearn.preprocessing import StandardScaler
+
+from linear_scorer import LinearScorer, affine_from_scaler, as_feature_row
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(loc=[5.0, -3.0, 100.0], scale=[1.0, 2.0, 30.0], size=(300, 3))
+    return X, rng
+
+@pytest.mark.parametrize('n_classes', [2, 3])
+def test_logistic_matches_sklearn(data, n_classes):
+    X, rng = data
+    y = rng.integers(0, n_classes, len(X))
+    scaler = StandardScaler().fit(X)
+    model = LogisticRegression(max_iter=1000).fit(scaler.transform(X), y)
+    scorer = LinearScorer.from_estimator(model, *affine_from_scaler(scaler, X.shape[1]))
+
+    expected = model.decision_function(scaler.transform(X))
+    np.testing.assert_allclose(scorer.decision_function(X).reshape(expected.shape), expected, atol=1e-9)
+    np.testing.assert_allclose(scorer.predict_proba(X), model.predict_proba(scaler.transform(X)), atol=1e-9)
+    np.testing.assert_array_equal(scorer.predict(X), model.predict(scaler.transform(X)))
+
+def test_linear_regression_matches_sklearn(data):
+    X, rng = data
+    y = X @ np.array([2.0, -1.0, 0.5]) + rng.normal(size=len(X))
+    model = LinearRegression().fit(X, y)
+    scorer = LinearScorer.from_estimator(model)
+
+    np.testing.assert_allclose(scorer.decision_function(X)[:, 0], model.predict(X), rtol=1e-9)
+    np.testing.assert_allclose(scorer.predict(X), model.predict(X), rtol=1e-9)
+
+def test_feature_row_length_is_checked():
+    assert as_feature_row([1, 2], n_features=2).shape == (1, 2)
+    with pytest.raises(ValueError, match='Expected 2 feature values, got 3'):
+        as_feature_row([1, 2, 3], n_features=2)
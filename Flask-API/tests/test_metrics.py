@@ -0,0 +1,107 @@
+"""/metrics in the Prometheus text format, per-route request metrics and switching the sampling profiler on and off."""
+
+import re
+import time
+
+import pytest
+from flask import Flask
+
+from metrics import Metrics, RequestMetrics
+
+TOKEN = 'test-admin-token'
+
+@pytest.fixture
+def admin(flask_app, monkeypatch):
+    monkeypatch.setattr(flask_app, 'ADMIN_TOKEN', TOKEN)
+    return {'Authorization': f'Bearer {TOKEN}'}
+
+def test_exposition_format():
+    metrics = Metrics()
+    requests = metrics.counter('requests_total', 'Requests', ('path',))
+    latency = metrics.histogram('latency_seconds', 'Latency', ('path',), buckets=(0.1, 1.0))
+    requests.inc('/a"b\\c\nd')
+    latency.observe(0.05, '/x')
+    latency.observe(0.5, '/x')
+    latency.observe(0.1, '/x')
+
+    assert metrics.render().splitlines() == [
+        '# HELP requests_total Requests',
+        '# TYPE requests_total counter',
+        'requests_total{path="/a\\"b\\\\c\\nd"} 1',
+        '# HELP latency_seconds Latency',
+        '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{path="/x",le="0.1"} 2',
+        'latency_seconds_bucket{path="/x",le="1"} 3',
+        'latency_seconds_bucket{path="/x",le="+Inf"} 3',
+        'latency_seconds_sum{path="/x"} 0.65',
+        'latency_seconds_count{path="/x"} 3',
+    ]
+
+def test_metrics_endpoint(client):
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+    # Every sample line is a name, optional labels and a number
+    for line in response.get_data(as_text=True).splitlines():
+        assert line.startswith('# ') or re.match(r'^[a-zA-Z_:][\w:]*(\{.*\})? (\S+)$', line), line
+
+def test_routes_are_labelled_by_rule(client, admin, metrics_sample):
+    assert client.post('/admin/models/no-such-model/reload', headers=admin).status_code == 404
+
+    metrics = client.get('/metrics').get_data(as_text=True)
+    assert metrics_sample(metrics, 'http_request_duration_seconds_count',
+                          route='/admin/models/<name>/reload', method='POST', status='404') >= 1
+    assert 'no-such-model' not in metrics
+
+def test_in_flight_returns_to_zero_when_the_view_raises(metrics_sample):
+    app = Flask(__name__)
+    metrics = Metrics()
+    request_metrics = RequestMetrics(app, metrics)
+
+    @app.route('/fail/<int:n>')
+    def fail(n):
+        raise RuntimeError("scoring failed")
+
+    client = app.test_client()
+    for n in range(3):
+        assert client.get(f'/fail/{n}').status_code == 500
+
+    rendered = metrics.render()
+    assert metrics_sample(rendered, 'http_request_duration_seconds_count', route='/fail/<int:n>', method='GET', status='500') == 3
+    assert metrics_sample(rendered, 'http_requests_in_flight', route='/fail/<int:n>') == 0
+    assert request_metrics.active_threads() == frozenset()
+
+def test_profiler_round_trip(flask_app, client, admin):
+    response = client.post('/admin/profiler', json={'enabled': True, 'interval_ms': 1, 'reset': True}, headers=admin)
+    assert response.status_code == 200
+    assert response.get_json()['running']
+    assert response.get_json()['interval_ms'] == 1.0
+
+    # The test client handles requests on this thread, which is sampled only while a request is in progress
+    deadline = time.monotonic() + 5
+    while flask_app.profiler.stats()['samples'] == 0 and time.monotonic() < deadline:
+        client.get('/metrics')
+
+    stats = client.post('/admin/profiler', json={'enabled': False}, headers=admin).get_json()
+    assert not stats['running']
+    assert stats['samples'] > 0
+
+    collapsed = client.get('/admin/profiler', headers=admin)
+    assert collapsed.mimetype == 'text/plain'
+    for line in collapsed.get_data(as_text=True).splitlines():
+        stack, count = line.rsplit(' ', 1)
+        assert stack and int(count) > 0
+
+    # Stopped: no more samples are taken
+    assert client.get('/admin/profiler', headers=admin).status_code == 200
+    assert client.post('/admin/profiler', json={}, headers=admin).get_json()['samples'] == stats['samples']
+
+@pytest.mark.parametrize('body', [{'enabled': True, 'interval_ms': 0}, {'enabled': True, 'interval_ms': 'fast'}, [1]],
+                         ids=['zero-interval', 'not-a-number', 'not-an-object'])
+def test_profiler_rejects_bad_settings(flask_app, client, admin, body):
+    assert client.post('/admin/profiler', json=body, headers=admin).status_code == 400
+    assert not flask_app.profiler.running
+
+def test_profiler_needs_the_admin_token(client, admin):
+    assert client.post('/admin/profiler', json={'enabled': True}).status_code == 401
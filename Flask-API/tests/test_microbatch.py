@@ -0,0 +1,69 @@
+"""MicroBatcher failure handling: short results, hung model calls, bad rows and a dead worker."""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from microbatch import MicroBatcher, MicroBatchTimeout
+
+def submit_concurrently(batcher, rows):
+    """Submit rows from one thread each; returns each row's result or exception."""
+    def one(row):
+        try:
+            return batcher.submit(np.asarray(row, dtype=float))
+        except Exception as e:
+            return e
+    with ThreadPoolExecutor(len(rows)) as pool:
+        return list(pool.map(one, rows))
+
+def test_short_result_fails_every_caller():
+    batcher = MicroBatcher(lambda X: X[:-1, 0], max_wait_ms=50, timeout_ms=5000)
+    outcomes = submit_concurrently(batcher, [[i, 0] for i in range(4)])
+    assert all(isinstance(outcome, RuntimeError) and 'results for a batch of' in str(outcome) for outcome in outcomes)
+
+def test_hung_model_call_times_out():
+    release = threading.Event()
+
+    def hang(X):
+        release.wait(5)
+        return X[:, 0]
+
+    batcher = MicroBatcher(hang, timeout_ms=50)
+    try:
+        with pytest.raises(MicroBatchTimeout, match='within 50 ms'):
+            batcher.submit(np.array([1.0, 2.0]))
+    finally:
+        release.set()
+
+def test_bad_row_fails_only_its_caller():
+    def score(X):
+        if np.isnan(X).any():
+            raise ValueError("NaN feature")
+        return X.sum(axis=1)
+
+    batcher = MicroBatcher(score, max_wait_ms=50, timeout_ms=5000)
+    outcomes = submit_concurrently(batcher, [[1, 2], [np.nan, 0], [3, 4]])
+    assert outcomes[0] == 3 and outcomes[2] == 7
+    assert isinstance(outcomes[1], ValueError)
+
+def test_dead_worker_is_replaced():
+    batcher = MicroBatcher(lambda X: X[:, 0], timeout_ms=5000)
+    assert batcher.submit(np.array([1.0, 0.0])) == 1.0
+    stopped = threading.Thread(target=lambda: None)
+    stopped.start()
+    stopped.join()
+    batcher._worker = stopped
+    assert batcher.submit(np.array([2.0, 0.0])) == 2.0
+
+def test_route_returns_503_on_timeout(flask_app, client, monkeypatch):
+    def timeout(row):
+        raise MicroBatchTimeout("Prediction not scored within 1 ms")
+
+    iris = flask_app.model_registry.get('iris')
+    monkeypatch.setattr(iris['batcher'], 'submit', timeout)
+    monkeypatch.setattr(flask_app.prediction_cache, 'get_or_compute', lambda name, version, key, compute: compute())
+    response = client.post('/predict-iris', json=[1.4, 0.2])
+    assert response.status_code == 503
+    assert 'not scored' in response.get_json()['error']
@@ -0,0 +1,100 @@
+"""FlatTreeEnsemble parity with the sklearn estimators it replaces, and read-only memory-mapped artifacts."""
+
+import numpy as np
+import pytest
+from sklearn.datasets import make_classification
+from sklearn.ensemble import ExtraTreesClassifier, GradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.tree import DecisionTreeClassifier
+
+from mmap_artifacts import FlatTreeEnsemble, flatten_model, load_mmap_artifact, save_mmap_artifact
+
+ESTIMATORS = [
+    RandomForestClassifier(n_estimators=25, max_depth=8, random_state=0),
+    ExtraTreesClassifier(n_estimators=25, max_depth=8, random_state=0),
+    DecisionTreeClassifier(max_depth=10, random_state=0),
+    GradientBoostingClassifier(n_estimators=40, max_depth=3, random_state=0),
+]
+ESTIMATOR_IDS = ['random_forest', 'extra_trees', 'decision_tree', 'gradient_boosting']
+
+@pytest.fixture(scope='module', params=[2, 3], ids=['binary', 'multiclass'])
+def data(request):
+    X, y = make_classification(n_samples=500, n_features=8, n_informative=5, n_classes=request.param,
+                               random_state=0)
+    # Test rows include points far outside the training range
+    rng = np.random.default_rng(1)
+    X_test = np.vstack([X, rng.normal(scale=4.0, size=(200, X.shape[1]))])
+    return X, y, X_test
+
+@pytest.mark.parametrize('estimator', ESTIMATORS, ids=ESTIMATOR_IDS)
+def test_predict_proba_matches_sklearn(data, estimator):
+    X, y, X_test = data
+    model = estimator.fit(X, y)
+    flat = FlatTreeEnsemble.from_estimator(model)
+
+    np.testing.assert_allclose(flat.predict_proba(X_test), model.predict_proba(X_test), rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(flat.predict(X_test), model.predict(X_test))
+    assert flat.n_features_in_ == X.shape[1]
+
+@pytest.mark.parametrize('estimator', ESTIMATORS, ids=ESTIMATOR_IDS)
+def test_split_thresholds(data, estimator):
+    # Feature values equal to a threshold go left in float32, as in sklearn
+    X, y, _ = data
+    model = estimator.fit(X, y)
+    flat = FlatTreeEnsemble.from_estimator(model)
+    internal = flat.feature >= 0
+    X_edge = X[:len(flat.feature[internal][:100])].copy()
+    X_edge[np.arange(len(X_edge)), flat.feature[internal][:100]] = flat.threshold[internal][:100]
+    np.testing.assert_allclose(flat.predict_proba(X_edge), model.predict_proba(X_edge), rtol=0, atol=1e-12)
+
+@pytest.mark.parametrize('estimator', ESTIMATORS, ids=ESTIMATOR_IDS)
+def test_unused_last_feature(data, estimator):
+    # A constant last column is never split on, yet it is part of every input row
+    X, y, X_test = data
+    X, X_test = np.column_stack([X, np.ones(len(X))]), np.column_stack([X_test, np.ones(len(X_test))])
+    model = estimator.fit(X, y)
+    flat = FlatTreeEnsemble.from_estimator(model)
+
+    assert flat.feature.max() < X.shape[1] - 1
+    assert flat.n_features_in_ == X.shape[1]
+    np.testing.assert_allclose(flat.predict_proba(X_test), model.predict_proba(X_test), rtol=0, atol=1e-12)
+
+def test_gradient_boosting_init_comes_from_sklearn(data):
+    # from_estimator reads the initial raw prediction through GradientBoostingClassifier._raw_predict_init,
+    # a private method; if sklearn renames or changes it, this must fail rather than flatten_model fall back
+    X, y, _ = data
+    model = GradientBoostingClassifier(n_estimators=5, random_state=0).fit(X, y)
+    assert callable(getattr(model, '_raw_predict_init', None)), "sklearn no longer has _raw_predict_init"
+    flat = FlatTreeEnsemble.from_estimator(model)
+    np.testing.assert_allclose(flat.init, model._raw_predict_init(X[:1])[0], rtol=0, atol=1e-12)
+
+    # The raw score FlatTreeEnsemble rebuilds: init plus the scaled output of each stage's trees
+    raw = np.tile(flat.init, (len(X), 1))
+    for stage in model.estimators_:
+        for k, tree in enumerate(stage):
+            raw[:, k] += flat.learning_rate * tree.predict(X)
+    np.testing.assert_allclose(raw, model.decision_function(X).reshape(raw.shape), rtol=0, atol=1e-9)
+
+def test_unsupported_estimators(data):
+    X, y, _ = data
+    model = LogisticRegression(max_iter=1000).fit(X, y)
+    with pytest.raises(TypeError, match='Cannot flatten LogisticRegression'):
+        FlatTreeEnsemble.from_estimator(model)
+    assert flatten_model(model) is model
+
+def test_mmap_artifact_is_read_only(data, tmp_path):
+    X, y, X_test = data
+    model = RandomForestClassifier(n_estimators=10, max_depth=6, random_state=0).fit(X, y)
+    path = tmp_path / 'model.mmap.joblib'
+    saved = save_mmap_artifact(model, path)
+    assert isinstance(saved, FlatTreeEnsemble)
+
+    loaded = load_mmap_artifact(path)
+    assert loaded.n_features_in_ == X.shape[1]
+    for name in ('feature', 'threshold', 'left', 'right', 'leaf_value', 'roots', 'tree_output'):
+        array = getattr(loaded, name)
+        assert isinstance(array, np.memmap), name
+        assert array.mode == 'r' and not array.flags.writeable, name
+        with pytest.raises(ValueError):
+            array[0] = 0
+    np.testing.assert_allclose(loaded.predict_proba(X_test), model.predict_proba(X_test), rtol=0, atol=1e-12)
@@ -0,0 +1,198 @@
+"""ModelRegistry: loading on first use, reloads into versioned slots, canary checks and the artifact watcher."""
+
+import gc
+import hashlib
+import itertools
+import os
+import pickle
+import threading
+import time
+import weakref
+
+import joblib
+import numpy as np
+import pytest
+
+import model_registry
+from microbatch import MicroBatcher
+from model_registry import ModelLoadError, ModelRegistry, ModelSpec, model_names_from_env
+
+class Model:
+    """Stands in for an unpickled model: scores every row with the number stored in its artifact."""
+
+    def __init__(self, weight):
+        self.weight = weight
+
+    def predict(self, X):
+        return X[:, 0] * self.weight
+
+def load_number(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    return int(data), hashlib.sha256(data).hexdigest()
+
+def build(artifacts):
+    model = Model(artifacts['model'])
+    return {'model': model, 'batcher': MicroBatcher(model.predict, max_wait_ms=1, timeout_ms=5000)}
+
+def check(value):
+    if value['model'].weight < 0:
+        raise ValueError("negative weight")
+
+def close_batcher(value):
+    value['batcher'].close()
+
+# Each write gets a later mtime, however quickly writes follow each other
+mtimes = itertools.count(1_700_000_000_000_000_000, 1_000_000_000)
+
+def write(path, text):
+    path.write_text(str(text))
+    mtime = next(mtimes)
+    os.utime(path, ns=(mtime, mtime))
+
+@pytest.fixture
+def artifact(tmp_path):
+    path = tmp_path / 'model.txt'
+    write(path, 1)
+    return path
+
+@pytest.fixture
+def registry(artifact, monkeypatch):
+    monkeypatch.setitem(model_registry.ARTIFACT_LOADERS, 'number', load_number)
+    registry = ModelRegistry(max_versions=2)
+    registry.register(ModelSpec('toy', {'model': str(artifact)}, build, loader='number', canary=check,
+                                release=close_batcher))
+    return registry
+
+def score(entry, value):
+    return float(entry.value['batcher'].submit(np.array([value, 0.0])))
+
+def wait_for(condition):
+    for _ in range(500):
+        if condition():
+            return
+        time.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+def microbatch_threads():
+    return sum(thread.name == 'microbatch' for thread in threading.enumerate())
+
+def test_model_loads_on_first_use(flask_app, client, monkeypatch):
+    # A registry holding the app's specs, none of them loaded, as when MODEL_WARMUP is empty
+    registry = ModelRegistry()
+    for name in flask_app.model_registry.names():
+        registry.register(flask_app.model_registry.spec(name))
+    monkeypatch.setattr(flask_app, 'model_registry', registry)
+
+    registry.warm_up(model_names_from_env('iris'))
+    stats = client.get('/model-stats').get_json()
+    assert stats['iris']['loaded'] and not stats['house']['loaded']
+    assert stats['house']['versions'] == {}
+
+    response = client.post('/predict-house', json=[3, 2, 5000, 0])
+    assert response.status_code == 200
+    version = response.get_json()['model_version']
+
+    stats = client.get('/model-stats').get_json()['house']
+    assert stats['loaded']
+    assert stats['traffic'] == {version: 1.0}
+    assert stats['versions'][version]['load_ms'] > 0
+    assert stats['versions'][version]['artifacts'] == {'model': 'house_price_lin_reg.pkl'}
+    assert not client.get('/model-stats').get_json()['retention']['loaded']
+
+
+def test_reload_swaps_version_and_in_flight_requests_keep_theirs(registry, artifact):
+    old = registry.select('toy')
+    write(artifact, 2)
+    new = registry.reload('toy')
+
+    assert new.version != old.version
+    assert registry.select('toy') is new
+    # A request that picked the old version before the reload still scores with it
+    assert score(old, 3) == 3.0
+    assert score(registry.select('toy'), 3) == 6.0
+    assert registry.select('toy', old.version) is old
+    assert registry.stats()['toy']['traffic'] == {new.version: 1.0}
+    assert registry.stats()['toy']['reloads'] == 1
+
+def test_canary_failure_keeps_serving_version(registry, artifact):
+    serving = registry.select('toy')
+    write(artifact, -1)
+    with pytest.raises(ModelLoadError, match='negative weight'):
+        registry.reload('toy')
+
+    assert registry.select('toy') is serving
+    assert list(registry.stats()['toy']['versions']) == [serving.version]
+    assert 'negative weight' in registry.stats()['toy']['last_error']
+
+def test_version_is_the_artifact_digest(registry, artifact):
+    assert registry.select('toy').version == hashlib.sha256(artifact.read_bytes()).hexdigest()[:12]
+
+@pytest.mark.parametrize('loader', ['pickle', 'joblib'])
+def test_file_rewritten_during_load(tmp_path, monkeypatch, loader):
+    path = tmp_path / 'model.pkl'
+    path.write_bytes(pickle.dumps({'weight': 1}))
+    module = pickle if loader == 'pickle' else joblib
+    load = module.load
+
+    def load_then_rewrite(f):
+        value = load(f)
+        write(path, 'rewritten')
+        return value
+
+    monkeypatch.setattr(module, 'load', load_then_rewrite)
+    registry = ModelRegistry()
+    registry.register(ModelSpec('toy', {'model': str(path)}, loader=loader))
+    with pytest.raises(ModelLoadError, match='changed while it was loaded'):
+        registry.select('toy')
+
+def test_watcher_waits_for_a_stable_file(registry, artifact):
+    serving = registry.select('toy')
+    assert registry.check_for_changes() == []
+
+    # Still being written: each check sees a different file, so nothing is reloaded
+    write(artifact, 2)
+    assert registry.check_for_changes() == []
+    write(artifact, 23)
+    assert registry.check_for_changes() == []
+    assert registry.select('toy') is serving
+
+    # Unchanged for one interval: reloaded once
+    assert registry.check_for_changes() == ['toy']
+    assert registry.select('toy').value['model'].weight == 23
+    assert registry.check_for_changes() == []
+
+def test_watcher_ignores_a_missing_file(registry, artifact):
+    serving = registry.select('toy')
+    artifact.unlink()
+    assert registry.check_for_changes() == []
+    assert registry.check_for_changes() == []
+    assert registry.select('toy') is serving
+
+def test_dropped_versions_are_released(registry, artifact):
+    threads_before = microbatch_threads()
+    models = []
+    for weight in range(2, 12):
+        write(artifact, weight)
+        loaded = registry.reload('toy')
+        assert score(loaded, 1) == weight
+        models.append(weakref.ref(loaded.value['model']))
+        del loaded
+        # The slot holds at most max_versions versions, each with at most one batching thread
+        wait_for(lambda: microbatch_threads() - threads_before <= 2)
+
+    assert len(registry.stats()['toy']['versions']) == 2
+    gc.collect()
+    assert sum(model() is not None for model in models) == 2
+
+def test_closed_batcher_scores_directly():
+    batcher = MicroBatcher(lambda X: X[:, 0] * 2, max_wait_ms=1, timeout_ms=5000)
+    assert batcher.submit(np.array([1.0])) == 2.0
+    worker = batcher._worker
+    batcher.close()
+    worker.join(5)
+    assert not worker.is_alive()
+
+    # A request still holding the dropped version is scored without a new thread
+    assert batcher.submit(np.array([4.0])) == 8.0
+    assert batcher._worker is worker
@@ -0,0 +1,106 @@
+"""The admin model routes: artifact overrides sent to reload, and traffic splits between loaded versions."""
+
+import collections
+import os
+import pickle
+import random
+
+import pytest
+
+@pytest.fixture
+def admin(flask_app, monkeypatch):
+    monkeypatch.setattr(flask_app, 'ADMIN_TOKEN', 'test-token')
+    return {'Authorization': 'Bearer test-token'}
+
+def reload(client, admin, name, artifacts):
+    return client.post(f'/admin/models/{name}/reload', headers=admin, json={'artifacts': artifacts, 'activate': False})
+
+def test_reload_registered_artifact(client, admin):
+    response = reload(client, admin, 'iris', {'model': 'models/iris_prediction/iris_log_reg.pkl'})
+    assert response.status_code == 200
+    assert response.get_json()['model_version']
+
+@pytest.mark.parametrize('artifacts, error', [
+    ({'model': '/etc/hostname'}, 'must be inside'),
+    ({'model': 'models/iris_prediction/../../app.py'}, 'must be inside'),
+    ({'model': 'models/airforce_retention/airforce_retention_model.pkl'}, 'must be inside'),
+    ({'model': 'models/iris_prediction/missing.pkl'}, 'not found'),
+    ({'scaler': 'models/iris_prediction/iris_log_reg.pkl'}, 'Unknown artifact for iris: scaler'),
+], ids=['absolute', 'traversal', 'other-model', 'missing', 'unknown-name'])
+def test_reload_rejects_bad_artifacts(client, admin, artifacts, error):
+    response = reload(client, admin, 'iris', artifacts)
+    assert response.status_code == 400
+    assert error in response.get_json()['error']
+
+def test_reload_rejects_mixed_retention_layouts(client, admin):
+    response = reload(client, admin, 'retention', {
+        'pipeline': 'models/airforce_retention/airforce_retention_pipeline.joblib',
+        'model': 'models/airforce_retention/airforce_retention_model.pkl',
+    })
+    assert response.status_code == 400
+    assert 'mix file layouts' in response.get_json()['error']
+
+def test_reload_symlink_out_of_model_directory(flask_app, client, admin, tmp_path):
+    outside = tmp_path / 'model.pkl'
+    outside.write_bytes(b'')
+    link = os.path.join(os.path.dirname(flask_app.iris_model_path), 'test-reload-link.pkl')
+    os.symlink(outside, link)
+    try:
+        response = reload(client, admin, 'iris', {'model': link})
+    finally:
+        os.remove(link)
+    assert response.status_code == 400
+    assert 'must be inside' in response.get_json()['error']
+
+def test_reload_unknown_model(client, admin):
+    assert reload(client, admin, 'nope', {'model': 'models/iris_prediction/iris_log_reg.pkl'}).status_code == 404
+
+@pytest.fixture
+def iris_candidate(flask_app, tmp_path):
+    """A second iris version (the same model pickled again with another protocol), loaded without traffic."""
+    registry = flask_app.model_registry
+    serving = registry.select('iris')
+    path = tmp_path / 'iris_candidate.pkl'
+    path.write_bytes(pickle.dumps(serving.value['model'], protocol=2))
+    candidate = registry.reload('iris', artifacts={'model': str(path)}, activate=False)
+    assert candidate.version != serving.version
+    yield serving.version, candidate.version
+    registry.set_traffic('iris', {serving.version: 1})
+
+def test_traffic_split_and_pinned_version(client, admin, iris_candidate, monkeypatch):
+    serving, candidate = iris_candidate
+    response = client.put('/admin/models/iris/traffic', headers=admin, json={serving: 3, candidate: 1})
+    assert response.status_code == 200
+    assert response.get_json()['traffic'] == {serving: 0.75, candidate: 0.25}
+
+    monkeypatch.setattr(random, 'random', random.Random(0).random)
+    served = collections.Counter(
+        client.post('/predict-iris', json=[1.4, 0.2]).get_json()['model_version'] for _ in range(400)
+    )
+    assert set(served) == {serving, candidate}
+    assert 0.65 <= served[serving] / 400 <= 0.85
+
+    for version in (serving, candidate):
+        pinned = {client.post('/predict-iris', json=[1.4, 0.2], headers={'X-Model-Version': version}).get_json()['model_version']
+                  for _ in range(20)}
+        assert pinned == {version}
+    response = client.post('/predict-iris', json=[1.4, 0.2], headers={'X-Model-Version': 'nope'})
+    assert response.status_code == 400
+
+    # All traffic to the candidate; the previous version stays loaded and can still be pinned
+    assert client.put('/admin/models/iris/traffic', headers=admin, json={serving: 0, candidate: 1}).status_code == 200
+    assert {client.post('/predict-iris', json=[1.4, 0.2]).get_json()['model_version'] for _ in range(20)} == {candidate}
+    assert client.post('/predict-iris', json=[1.4, 0.2], headers={'X-Model-Version': serving}).status_code == 200
+
+@pytest.mark.parametrize('weights, error', [
+    ({'nope': 1}, 'Unknown version'),
+    ('all', 'Expected a JSON object'),
+    (None, 'must be non-negative numbers'),
+    (0, 'needs a positive weight'),
+], ids=['unknown-version', 'not-an-object', 'null-weight', 'zero-weights'])
+def test_traffic_rejects_bad_weights(client, admin, iris_candidate, weights, error):
+    serving, _ = iris_candidate
+    body = weights if isinstance(weights, (dict, str)) else {serving: weights}
+    response = client.put('/admin/models/iris/traffic', headers=admin, json=body)
+    assert response.status_code == 400
+    assert error in response.get_json()['error']
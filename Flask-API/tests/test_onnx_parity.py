@@ -0,0 +1,99 @@
+"""
+ONNX backend parity: OnnxScorer against the sklearn estimator and the NumPy scorer.
+
+Graphs run in float32, so probabilities are compared to within TOLERANCE,
+the same bound build_onnx_scorer accepts on its canary rows.
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip('onnxruntime')
+pytest.importorskip('skl2onnx')
+
+from sklearn.datasets import make_classification
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LinearRegression, LogisticRegression
+from sklearn.preprocessing import StandardScaler
+
+from linear_scorer import affine_from_scaler, build_scorer, LinearScorer
+from mmap_artifacts import FlatTreeEnsemble
+from onnx_backend import OnnxScorer, build_onnx_scorer, export_onnx
+
+TOLERANCE = 1e-4
+
+@pytest.fixture(scope='module')
+def data():
+    X, y = make_classification(n_samples=600, n_features=9, n_informative=6, random_state=0)
+    # Feature magnitudes like the retention data (ages, salaries, counts), so scaling matters
+    X = X * np.array([5, 1, 1, 2, 3, 10000, 4, 1, 5000]) + np.array([30, 0, 0, 2, 5, 45000, 8, 1, 8000])
+    return X, y
+
+def max_difference(a, b):
+    return float(np.max(np.abs(np.asarray(a, dtype=np.float64) - np.asarray(b, dtype=np.float64))))
+
+def test_logistic_regression_with_scaler(data):
+    X, y = data
+    scaler = StandardScaler().fit(X)
+    model = LogisticRegression(max_iter=1000).fit(scaler.transform(X), y)
+    scale, offset = affine_from_scaler(scaler, X.shape[1])
+
+    onnx = OnnxScorer(export_onnx(model, X.shape[1], scaler), model.classes_)
+    numpy_scorer = build_scorer(model, scale, offset)
+    assert isinstance(numpy_scorer, LinearScorer)
+
+    expected = model.predict_proba(scaler.transform(X))
+    assert max_difference(onnx.predict_proba(X), expected) <= TOLERANCE
+    assert max_difference(onnx.predict_proba(X), numpy_scorer.predict_proba(X)) <= TOLERANCE
+
+def test_scaling_applied_before_the_graph(data):
+    # The in-process path: the graph holds only the model and the scaler runs in NumPy
+    X, y = data
+    scaler = StandardScaler().fit(X)
+    model = LogisticRegression(max_iter=1000).fit(scaler.transform(X), y)
+    scale, offset = affine_from_scaler(scaler, X.shape[1])
+    onnx = OnnxScorer(export_onnx(model, X.shape[1]), model.classes_, scale, offset)
+    assert max_difference(onnx.predict_proba(X), model.predict_proba(scaler.transform(X))) <= TOLERANCE
+
+@pytest.mark.parametrize('estimator', [
+    RandomForestClassifier(n_estimators=30, max_depth=8, random_state=0),
+    GradientBoostingClassifier(n_estimators=30, max_depth=3, random_state=0),
+], ids=['random_forest', 'gradient_boosting'])
+def test_tree_ensembles(data, estimator):
+    X, y = data
+    model = estimator.fit(X, y)
+    onnx = OnnxScorer(export_onnx(model, X.shape[1]), model.classes_)
+    flat = FlatTreeEnsemble.from_estimator(model)
+
+    assert max_difference(onnx.predict_proba(X), model.predict_proba(X)) <= TOLERANCE
+    assert max_difference(onnx.predict_proba(X), flat.predict_proba(X)) <= TOLERANCE
+    np.testing.assert_array_equal(onnx.predict(X), model.predict(X))
+
+def test_regression_relative_error(data):
+    X, _ = data
+    target = X @ np.linspace(1, 9, X.shape[1]) + 50000
+    model = LinearRegression().fit(X, target)
+    onnx = OnnxScorer(export_onnx(model, X.shape[1]))
+    numpy_scorer = build_scorer(model)
+    relative = np.abs(onnx.predict(X) - model.predict(X)) / np.abs(model.predict(X))
+    assert relative.max() <= TOLERANCE
+    assert max_difference(onnx.predict(X), numpy_scorer.predict(X)) / np.abs(target).max() <= TOLERANCE
+
+def test_shipped_retention_model():
+    import pandas as pd
+    from retention_pipeline import load_retention_pipeline, pipeline_parts
+
+    model_dir = os.path.join(os.path.dirname(__file__), '..', 'models', 'airforce_retention')
+    pipeline = load_retention_pipeline(model_dir)['pipeline']
+    _, scaler, _, model = pipeline_parts(pipeline)
+    raw = pd.read_csv(os.path.join(model_dir, 'airforce_retention_data.csv'))
+    X = pipeline.named_steps['encode'].transform(raw)
+    scale, offset = affine_from_scaler(scaler, X.shape[1]) if scaler is not None else (None, None)
+
+    numpy_scorer = build_scorer(model, scale, offset)
+    scorer = build_onnx_scorer(model, numpy_scorer, scale=scale, offset=offset, canary=X[:32])
+    assert isinstance(scorer, OnnxScorer)
+    assert max_difference(scorer.predict_proba(X), pipeline.predict_proba(raw)) <= TOLERANCE
+    assert max_difference(scorer.predict_proba(X), numpy_scorer.predict_proba(X)) <= TOLERANCE
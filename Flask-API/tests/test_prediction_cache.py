@@ -0,0 +1,122 @@
+"""PredictionCache keys, hits and misses, the shared tier backing off while Redis is down, and disabling the cache."""
+
+import socket
+
+import numpy as np
+import pytest
+
+import prediction_cache
+from prediction_cache import PredictionCache, RedisBackend, feature_key
+
+class Clock:
+    """Stands in for the time module, so the shared tier's retry window is tested without sleeping."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+class Unavailable:
+    """A shared backend whose every call fails, counting the calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, key):
+        self.calls += 1
+        raise ConnectionError("connection refused")
+
+    def set(self, key, value):
+        self.calls += 1
+        raise ConnectionError("connection refused")
+
+class Counting:
+    """compute() stand-in returning a fresh array and counting its calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return np.array([0.25, 0.75])
+
+def closed_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+@pytest.mark.parametrize('a, b', [
+    ([0.0, 1.0], [-0.0, 1.0]),
+    ([5, 2], [5.0, 2.0]),
+    (np.array([5, 2], dtype=np.int64), np.array([5.0, 2.0], dtype=np.float32)),
+    ([[1.4, 0.2]], [1.4, 0.2]),
+], ids=['negative-zero', 'int-float', 'dtypes', 'shape'])
+def test_equal_vectors_share_a_key(a, b):
+    assert feature_key('iris', 'v1', a) == feature_key('iris', 'v1', b)
+
+def test_different_inputs_have_different_keys():
+    keys = {
+        feature_key('iris', 'v1', [1.4, 0.2]),
+        feature_key('iris', 'v1', [1.4, 0.20000001]),
+        feature_key('iris', 'v1', [0.2, 1.4]),
+        feature_key('iris', 'v2', [1.4, 0.2]),
+        feature_key('house', 'v1', [1.4, 0.2]),
+    }
+    assert len(keys) == 5
+
+def test_hit_and_miss():
+    cache, compute = PredictionCache(), Counting()
+    first = cache.get_or_compute('retention', 'v1', np.array([28.0, 1.0]), compute)
+    again = cache.get_or_compute('retention', 'v1', np.array([28.0, 1.0]), compute)
+    other = cache.get_or_compute('retention', 'v1', np.array([29.0, 1.0]), compute)
+    assert compute.calls == 2
+    assert again is first and other is not first
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['shared']) == (1, 2, None)
+
+def test_new_model_version_misses():
+    cache, compute = PredictionCache(), Counting()
+    cache.get_or_compute('retention', 'v1', [28.0, 1.0], compute)
+    cache.get_or_compute('retention', 'v2', [28.0, 1.0], compute)
+    cache.get_or_compute('retention', 'v1', [28, 1], compute)
+    assert compute.calls == 2
+
+def test_disabled_cache_always_computes():
+    # PREDICTION_CACHE_SIZE=0
+    cache, compute = PredictionCache(max_entries=0, shared=Unavailable()), Counting()
+    assert not cache.enabled
+    for _ in range(3):
+        cache.get_or_compute('iris', 'v1', [1.4, 0.2], compute)
+    assert compute.calls == 3
+    assert cache.shared.calls == 0
+    assert cache.stats()['entries'] == 0
+
+def test_shared_tier_backs_off_while_down(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(prediction_cache, 'time', clock)
+    shared = Unavailable()
+    cache, compute = PredictionCache(shared=shared, shared_retry=5.0), Counting()
+
+    # The failing lookup falls back to scoring; storing the result is not attempted while the tier is down
+    assert cache.get_or_compute('iris', 'v1', [1.0, 0.0], compute).tolist() == [0.25, 0.75]
+    assert (shared.calls, cache.stats()['shared']['errors']) == (1, 1)
+
+    clock.now += 4.9
+    cache.get_or_compute('iris', 'v1', [2.0, 0.0], compute)
+    assert shared.calls == 1
+
+    clock.now += 0.1
+    cache.get_or_compute('iris', 'v1', [3.0, 0.0], compute)
+    assert shared.calls == 2
+    assert compute.calls == 3
+    assert cache.stats()['shared']['backend'] == 'Unavailable'
+
+def test_redis_down():
+    pytest.importorskip('redis')
+    cache = PredictionCache(shared=RedisBackend(f'redis://127.0.0.1:{closed_port()}/0', timeout=0.5))
+    compute = Counting()
+    assert cache.get_or_compute('iris', 'v1', [1.4, 0.2], compute).tolist() == [0.25, 0.75]
+    assert cache.get_or_compute('iris', 'v1', [1.4, 0.2], compute).tolist() == [0.25, 0.75]
+    assert compute.calls == 1
+    assert cache.stats()['shared'] == {'hits': 0, 'misses': 0, 'errors': 1, 'backend': 'RedisBackend'}
@@ -0,0 +1,94 @@
+"""/predict-retention-batch against single /predict-retention calls, with invalid rows and size limits."""
+
+import os
+
+import pandas as pd
+import pytest
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'models', 'airforce_retention', 'airforce_retention_data.csv')
+
+@pytest.fixture(scope='module')
+def airmen():
+    frame = pd.read_csv(DATA_PATH).head(20)
+    return [{col: value.item() if hasattr(value, 'item') else value for col, value in row.items()}
+            for row in frame.to_dict(orient='records')]
+
+def single(client, airman):
+    response = client.post('/predict-retention', json=airman)
+    assert response.status_code == 200
+    return response.get_json()
+
+def scored(result):
+    return {key: result[key] for key in ('retained', 'retention_probability', 'non_retention_probability')}
+
+def test_batch_matches_single_calls(client, airmen):
+    response = client.post('/predict-retention-batch', json=airmen)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['num_rows'] == body['num_scored'] == len(airmen)
+    assert body['num_errors'] == 0
+
+    for i, (result, airman) in enumerate(zip(body['results'], airmen)):
+        assert result['row'] == i
+        expected = scored(single(client, airman))
+        assert result['retained'] == expected['retained']
+        assert result['retention_probability'] == pytest.approx(expected['retention_probability'], abs=1e-12)
+        assert result['non_retention_probability'] == pytest.approx(expected['non_retention_probability'], abs=1e-12)
+
+def test_bad_rows_reported_and_good_rows_scored(client, airmen):
+    batch = [
+        airmen[0],
+        dict(airmen[1], gender='Unknown'),
+        {key: value for key, value in airmen[2].items() if key != 'salary'},
+        'not an airman',
+        dict(airmen[3], age='old'),
+        airmen[4],
+    ]
+    response = client.post('/predict-retention-batch', json={'records': batch})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body['num_rows'], body['num_scored'], body['num_errors']) == (6, 2, 4)
+
+    results = body['results']
+    assert scored(results[0]) == pytest.approx(scored(single(client, airmen[0])))
+    assert scored(results[5]) == pytest.approx(scored(single(client, airmen[4])))
+    assert results[1]['errors'] == ["Invalid value for gender: 'Unknown'"]
+    assert results[2]['errors'] == ['Missing required field: salary']
+    assert results[3]['errors'] == ['Row must be a JSON object']
+    assert results[4]['errors'] == ["Invalid value for age: 'old'"]
+    assert [result['row'] for result in results] == list(range(6))
+
+def test_column_oriented_input(client, airmen):
+    columns = {col: [airman[col] for airman in airmen] for col in airmen[0]}
+    by_column = client.post('/predict-retention-batch', json={'columns': columns}).get_json()
+    by_record = client.post('/predict-retention-batch', json=airmen).get_json()
+    assert by_column['results'] == by_record['results']
+
+@pytest.mark.parametrize('payload', [[], {'records': []}, {'columns': {}}], ids=['list', 'records', 'columns'])
+def test_empty_batch(client, payload):
+    response = client.post('/predict-retention-batch', json=payload)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['results'] == []
+    assert (body['num_rows'], body['num_scored'], body['num_errors']) == (0, 0, 0)
+
+@pytest.mark.parametrize('payload, error', [
+    ({'columns': {'age': [28, 30], 'salary': [47000]}}, 'same length'),
+    ({'columns': {'age': 28}}, "'columns' must map"),
+    ({'airmen': []}, 'Expected a list of records'),
+    ('airmen', 'Expected a list of records'),
+], ids=['ragged', 'scalar-column', 'unknown-key', 'string'])
+def test_unusable_payload(client, payload, error):
+    response = client.post('/predict-retention-batch', json=payload)
+    assert response.status_code == 400
+    assert error in response.get_json()['error']
+
+def test_too_many_rows(flask_app, client, airmen, monkeypatch):
+    monkeypatch.setattr(flask_app, 'retention_batch_max_rows', 5)
+    assert client.post('/predict-retention-batch', json=airmen[:5]).status_code == 200
+
+    response = client.post('/predict-retention-batch', json=airmen[:6])
+    assert response.status_code == 413
+    assert 'max 5' in response.get_json()['error']
+    columns = {col: [airman[col] for airman in airmen[:6]] for col in airmen[0]}
+    assert client.post('/predict-retention-batch', json={'columns': columns}).status_code == 413
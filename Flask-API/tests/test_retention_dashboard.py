@@ -0,0 +1,45 @@
+"""/retention-dashboard caching while traffic is split between two retention model versions."""
+
+import collections
+
+import joblib
+import pytest
+
+@pytest.fixture
+def split_traffic(flask_app, tmp_path):
+    """Load a second retention version (the same model, its feature info re-pickled) and send half the traffic to it."""
+    registry = flask_app.model_registry
+    serving = registry.select('retention')
+    candidate_path = tmp_path / 'feature_info.pkl'
+    joblib.dump(joblib.load(flask_app.retention_feature_info_path), candidate_path, protocol=2)
+    candidate = registry.reload('retention', artifacts={'feature_info': str(candidate_path)}, activate=False)
+    assert candidate.version != serving.version
+
+    registry.set_traffic('retention', {serving.version: 1, candidate.version: 1})
+    yield serving.version, candidate.version
+    registry.set_traffic('retention', {serving.version: 1})
+
+def test_dashboard_cached_per_served_version(flask_app, client, split_traffic, monkeypatch):
+    builds = collections.Counter()
+    aggregates = flask_app.retention_aggregates
+
+    def counted(frame, transformer, scorer):
+        builds[id(scorer)] += 1
+        return aggregates(frame, transformer, scorer)
+
+    monkeypatch.setattr(flask_app, 'retention_aggregates', counted)
+    flask_app.retention_dashboard_cache.invalidate()
+
+    served = collections.Counter()
+    for _ in range(40):
+        response = client.get('/retention-dashboard')
+        assert response.status_code == 200
+        served[response.get_json()['model_version']] += 1
+
+    # Both versions answered, and each built its body once however the requests alternated
+    assert set(served) == set(split_traffic)
+    assert sorted(builds.values()) == [1, 1]
+
+    for version in split_traffic:
+        response = client.get('/retention-dashboard', headers={'X-Model-Version': version})
+        assert response.get_json()['model_version'] == version
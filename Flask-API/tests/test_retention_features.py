@@ -0,0 +1,92 @@
+"""RetentionFeatureTransformer against the DataFrame preprocessing it replaced, on the shipped retention model."""
+
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import LabelEncoder
+
+from linear_scorer import build_scorer
+from retention_features import CATEGORICAL_COLUMNS, INPUT_COLUMNS, RetentionFeatureTransformer
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), '..', 'models', 'airforce_retention')
+
+AIRMAN = {
+    'age': 28, 'gender': 'Male', 'marital_status': 'Married', 'num_dependents': 2, 'grade_rank': 'E-6 (TSgt)',
+    'salary': 47000, 'years_of_service': 10, 'num_prior_reenlistments': 2, 'bonuses_received': 10000
+}
+
+@pytest.fixture(scope='module')
+def artifacts():
+    def load(name):
+        return joblib.load(os.path.join(MODEL_DIR, f'airforce_retention_{name}.pkl'))
+    return {name: load(name) for name in ('model', 'scaler', 'encoders', 'feature_info')}
+
+def pandas_proba(records, artifacts, encoders=None):
+    """The original /predict-retention preprocessing: DataFrame, LabelEncoder, str.extract, then the scaler."""
+    encoders = encoders or artifacts['encoders']
+    df = pd.DataFrame(records)
+    for col in CATEGORICAL_COLUMNS:
+        df[col + '_encoded'] = encoders[col].transform(df[col])
+    df['rank_level'] = df['grade_rank'].str.extract(r'E-(\d+)').astype(int)
+    features = df[artifacts['feature_info']['feature_columns']]
+    return artifacts['model'].predict_proba(artifacts['scaler'].transform(features))
+
+def fast_proba(records, artifacts, encoders=None):
+    """The serving path: one encode per record, scaling folded into the scorer."""
+    transformer = RetentionFeatureTransformer(encoders or artifacts['encoders'], artifacts['scaler'],
+                                              artifacts['feature_info']['feature_columns'])
+    scorer = build_scorer(artifacts['model'], transformer.scale, transformer.offset)
+    return scorer.predict_proba(np.vstack([transformer.encode(record) for record in records]))
+
+def test_dataset_rows(artifacts):
+    frame = pd.read_csv(os.path.join(MODEL_DIR, 'airforce_retention_data.csv'))
+    records = frame[INPUT_COLUMNS].to_dict(orient='records')
+    expected = pandas_proba(records, artifacts)
+    np.testing.assert_allclose(fast_proba(records, artifacts), expected, rtol=0, atol=1e-12)
+
+    # The column-wise path used by bulk scoring, the dashboard and the grids
+    transformer = RetentionFeatureTransformer(artifacts['encoders'], artifacts['scaler'],
+                                              artifacts['feature_info']['feature_columns'])
+    features, valid, errors = transformer.encode_columns({col: frame[col].to_numpy() for col in INPUT_COLUMNS}, len(frame))
+    assert valid.all() and not errors
+    scorer = build_scorer(artifacts['model'], transformer.scale, transformer.offset)
+    np.testing.assert_allclose(scorer.predict_proba(features), expected, rtol=0, atol=1e-12)
+
+def test_numeric_strings(artifacts):
+    record = dict(AIRMAN, age='28', salary='47000.0', bonuses_received='1e4')
+    np.testing.assert_allclose(fast_proba([record], artifacts), pandas_proba([record], artifacts), rtol=0, atol=1e-12)
+    np.testing.assert_allclose(fast_proba([record], artifacts), fast_proba([AIRMAN], artifacts), rtol=0, atol=1e-12)
+
+def test_two_digit_rank_level(artifacts):
+    # A grade the shipped encoder does not know; fit one that does, so both paths can score it
+    encoders = dict(artifacts['encoders'])
+    encoders['grade_rank'] = LabelEncoder().fit([*artifacts['encoders']['grade_rank'].classes_, 'E-10 (CCM)'])
+    record = dict(AIRMAN, grade_rank='E-10 (CCM)')
+
+    expected = pandas_proba([record], artifacts, encoders)
+    np.testing.assert_allclose(fast_proba([record], artifacts, encoders), expected, rtol=0, atol=1e-12)
+    transformer = RetentionFeatureTransformer(encoders, artifacts['scaler'], artifacts['feature_info']['feature_columns'])
+    assert transformer.encode(record)[artifacts['feature_info']['feature_columns'].index('rank_level')] == 10
+
+@pytest.mark.parametrize('field, value, error', [
+    ('gender', 'Unknown', 'Invalid value for gender'),
+    ('grade_rank', 'E-10 (CCM)', 'Invalid value for grade_rank'),
+    ('marital_status', np.nan, 'Invalid value for marital_status'),
+    ('salary', np.nan, 'Missing required field: salary'),
+], ids=['unseen-category', 'unseen-grade', 'nan-category', 'nan-number'])
+def test_rows_both_paths_reject(artifacts, field, value, error):
+    record = dict(AIRMAN, **{field: value})
+    with pytest.raises(ValueError):
+        pandas_proba([record], artifacts)
+    with pytest.raises(ValueError, match=error):
+        fast_proba([record], artifacts)
+
+def test_bool_is_rejected(artifacts):
+    # The DataFrame path silently read a JSON true as 1; the transformer refuses it instead
+    record = dict(AIRMAN, num_dependents=True)
+    np.testing.assert_allclose(pandas_proba([record], artifacts), pandas_proba([dict(AIRMAN, num_dependents=1)], artifacts))
+    with pytest.raises(ValueError, match='Invalid value for num_dependents: True'):
+        fast_proba([record], artifacts)
@@ -0,0 +1,80 @@
+"""Checksum verification of the fused retention pipeline artifact, memory-mapped and in memory."""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import retention_pipeline
+from retention_pipeline import load_legacy_artifacts, load_pipeline_artifact, save_pipeline_artifact
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), '..', 'models', 'airforce_retention')
+
+@pytest.fixture(scope='module')
+def pipeline():
+    return load_legacy_artifacts(MODEL_DIR)['pipeline']
+
+@pytest.fixture
+def artifact_path(pipeline, tmp_path):
+    path = tmp_path / retention_pipeline.PIPELINE_FILENAME
+    save_pipeline_artifact(pipeline, str(path), 'Logistic Regression')
+    return path
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    # The checksum is computed over many chunks, not one read of the whole file
+    monkeypatch.setattr(retention_pipeline, 'CHECKSUM_CHUNK_SIZE', 4096)
+
+@pytest.mark.parametrize('mmap', [True, False], ids=['mmap', 'in-memory'])
+def test_round_trip(pipeline, artifact_path, mmap, small_chunks):
+    artifact = load_pipeline_artifact(str(artifact_path), mmap=mmap)
+    raw = pd.read_csv(os.path.join(MODEL_DIR, 'airforce_retention_data.csv')).head(50)
+    np.testing.assert_array_equal(artifact['pipeline'].predict_proba(raw), pipeline.predict_proba(raw))
+    assert artifact['schema']['model_type'] == 'Logistic Regression'
+
+def test_digest_is_the_saved_checksum(pipeline, tmp_path):
+    path = tmp_path / retention_pipeline.PIPELINE_FILENAME
+    digest = save_pipeline_artifact(pipeline, str(path), 'Logistic Regression')
+    assert load_pipeline_artifact(str(path))['sha256'] == digest
+    assert load_pipeline_artifact(str(path), mmap=False)['sha256'] == digest
+
+@pytest.mark.parametrize('mmap', [True, False], ids=['mmap', 'in-memory'])
+@pytest.mark.parametrize('where', [0.1, 0.5, 0.9], ids=['start', 'middle', 'end'])
+def test_corrupted_byte(artifact_path, mmap, where, small_chunks):
+    data = bytearray(artifact_path.read_bytes())
+    index = int((len(data) - retention_pipeline.CHECKSUM_TRAILER_SIZE) * where)
+    data[index] ^= 0x01
+    artifact_path.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match='checksum mismatch'):
+        load_pipeline_artifact(str(artifact_path), mmap=mmap)
+
+@pytest.mark.parametrize('mmap', [True, False], ids=['mmap', 'in-memory'])
+@pytest.mark.parametrize('cut', [retention_pipeline.CHECKSUM_TRAILER_SIZE, 1], ids=['no-trailer', 'short-trailer'])
+def test_missing_checksum(artifact_path, mmap, cut):
+    artifact_path.write_bytes(artifact_path.read_bytes()[:-cut])
+    with pytest.raises(ValueError, match='no checksum'):
+        load_pipeline_artifact(str(artifact_path), mmap=mmap)
+
+@pytest.fixture
+def swapped_during_load(pipeline, artifact_path, tmp_path, monkeypatch):
+    """A training run renames a new artifact into place after the checksum was verified, before joblib reads it."""
+    replacement = tmp_path / 'replacement.joblib'
+    save_pipeline_artifact(pipeline, str(replacement), 'Logistic Regression', metadata={'run': 2})
+    joblib_load = retention_pipeline.joblib.load
+
+    def load_after_swap(source, **kwargs):
+        os.replace(replacement, artifact_path)
+        return joblib_load(source, **kwargs)
+
+    monkeypatch.setattr(retention_pipeline.joblib, 'load', load_after_swap)
+    return artifact_path
+
+def test_file_replaced_between_verification_and_mapping(swapped_during_load):
+    with pytest.raises(ValueError, match='changed while it was loaded'):
+        load_pipeline_artifact(str(swapped_during_load))
+
+def test_in_memory_load_reads_the_verified_file(swapped_during_load):
+    # Read from the file that was opened and verified, whatever the path names by then
+    artifact = load_pipeline_artifact(str(swapped_during_load), mmap=False)
+    assert 'run' not in artifact['metadata']
@@ -0,0 +1,80 @@
+"""Concurrent ingests into the retention store, and the dataset routes switching to the store while the app runs."""
+
+import os
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+import retention_store
+from retention_store import RetentionStore
+
+@pytest.fixture
+def empty_store(flask_app, tmp_path, monkeypatch):
+    store = RetentionStore(str(tmp_path / 'store'))
+    monkeypatch.setattr(flask_app, 'retention_store', store)
+    return store
+
+def dataset_rows(client):
+    response = client.get('/local-retention-dataset')
+    assert response.status_code == 200
+    return response.get_json()
+
+def test_first_ingest_is_served_without_restart(flask_app, client, empty_store, tmp_path):
+    base = pd.read_csv(retention_store.BASE_CSV)
+    assert len(dataset_rows(client)) == len(base)
+
+    batch_path = tmp_path / 'batch.csv'
+    base.head(25).assign(salary=base['salary'].head(25) + 1).to_csv(batch_path, index=False)
+    retention_store.main(['ingest', empty_store.root, str(batch_path), '--date', '2024-05-01'])
+
+    # The store now holds the seeded base records and the new batch, and the next request reads it
+    assert len(empty_store.parts()) == 2
+    assert len(dataset_rows(client)) == len(base) + 25
+    assert client.get('/retention-dashboard').status_code == 200
+
+def test_ingest_without_seed(client, empty_store, tmp_path):
+    batch_path = tmp_path / 'batch.csv'
+    pd.read_csv(retention_store.BASE_CSV).head(25).to_csv(batch_path, index=False)
+    retention_store.main(['ingest', empty_store.root, str(batch_path), '--no-seed'])
+
+    assert len(dataset_rows(client)) == 25
+
+@pytest.fixture
+def ingest_while_numbering(monkeypatch):
+    """Makes the next append run another append after counting the partition's files, as a concurrent ingest could."""
+    open_file = os.open
+    concurrent = []
+
+    def append_then_open(path, flags, *args):
+        if concurrent and '.sequence-' in path:
+            store, frame = concurrent.pop()
+            store.append(frame, '2024-05-01')
+        return open_file(path, flags, *args)
+
+    monkeypatch.setattr(retention_store.os, 'open', append_then_open)
+    return concurrent
+
+def test_concurrent_ingests_take_distinct_files(tmp_path, ingest_while_numbering):
+    store = RetentionStore(str(tmp_path / 'store'))
+    base = pd.read_csv(retention_store.BASE_CSV)
+    first, second = base.head(10), base.iloc[10:25]
+    ingest_while_numbering.append((store, second))
+
+    path = store.append(first, '2024-05-01')
+    parts = store.parts()
+    assert len(parts) == 2 and path == parts[1]
+    assert [os.path.basename(part)[:10] for part in parts] == ['part-00000', 'part-00001']
+    assert len(store.read_frame()) == 25
+    # No temporary files are left behind
+    assert not [name for name in os.listdir(os.path.dirname(path)) if name.endswith('.tmp')]
+
+def test_same_batch_ingested_concurrently_is_stored_once(tmp_path, ingest_while_numbering):
+    store = RetentionStore(str(tmp_path / 'store'))
+    batch = pd.read_csv(retention_store.BASE_CSV).head(10)
+    ingest_while_numbering.append((store, batch))
+
+    assert store.append(batch, '2024-05-01') is None
+    assert len(store.parts()) == 1
+    assert len(store.read_frame()) == 10
@@ -0,0 +1,28 @@
+"""Cached preprocessing and CV folds of the retention training script."""
+
+import os
+import sys
+
+import joblib
+import numpy as np
+
+SCRIPT_DIR = os.path.join(os.path.dirname(__file__), '..', 'models', 'airforce_retention')
+sys.path.insert(0, SCRIPT_DIR)
+
+import train_airforce_retention_model as training
+
+DATA_PATH = os.path.join(SCRIPT_DIR, 'airforce_retention_data.csv')
+
+def test_folds_follow_the_seed(tmp_path):
+    memory = joblib.Memory(str(tmp_path), verbose=0)
+    _, first, first_folds = training.prepare_data(memory, DATA_PATH, seed=1, cv=3)
+    # Same seed: both come from the cache
+    _, _, cached_folds = training.prepare_data(memory, DATA_PATH, seed=1, cv=3)
+    _, second, second_folds = training.prepare_data(memory, DATA_PATH, seed=2, cv=3)
+
+    assert all(np.array_equal(a, b) for fold, cached in zip(first_folds, cached_folds) for a, b in zip(fold, cached))
+    assert not np.array_equal(first['y_train'], second['y_train'])
+    # The folds are rebuilt for the other seed's training rows, not reused from the first run
+    assert any(not np.array_equal(a[1], b[1]) for a, b in zip(first_folds, second_folds))
+    expected = training.fold_splits(None, training.HOLDOUT_SIZE, 2, second['y_train'], 3)
+    assert all(np.array_equal(a[1], b[1]) for a, b in zip(second_folds, expected))
@@ -0,0 +1,146 @@
+"""TTLCache single-flight loading, invalidation during a load, expiry and LRU eviction."""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import ttl_cache
+from ttl_cache import TTLCache
+
+class Clock:
+    """Stands in for the time module, so expiry is tested without sleeping."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ttl_cache, 'time', clock)
+    return clock
+
+def blocking_loader(value, calls, release):
+    def load():
+        calls.append(threading.get_ident())
+        assert release.wait(5)
+        if isinstance(value, Exception):
+            raise value
+        return value
+    return load
+
+def run_concurrently(cache, n, key, loader):
+    """Call get_or_load from n threads; returns the pool and one future per thread, holding its result or exception."""
+    def one():
+        try:
+            return cache.get_or_load(key, loader)
+        except Exception as e:
+            return e
+    pool = ThreadPoolExecutor(n)
+    futures = [pool.submit(one) for _ in range(n)]
+    return pool, futures
+
+def wait_for(condition):
+    for _ in range(500):
+        if condition():
+            return
+        time.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+def test_concurrent_misses_load_once():
+    cache = TTLCache()
+    calls, release = [], threading.Event()
+    pool, futures = run_concurrently(cache, 8, 'table', blocking_loader('rows', calls, release))
+    wait_for(lambda: cache.stats()['coalesced'] == 7)
+    release.set()
+    assert [future.result() for future in futures] == ['rows'] * 8
+    pool.shutdown()
+
+    assert len(calls) == 1
+    assert cache.get_or_load('table', lambda: pytest.fail("loaded again")) == 'rows'
+    stats = cache.stats()
+    assert (stats['misses'], stats['coalesced'], stats['hits'], stats['inflight']) == (1, 7, 1, 0)
+
+def test_loader_error_reaches_every_waiter_and_is_not_cached():
+    cache = TTLCache()
+    calls, release = [], threading.Event()
+    error = RuntimeError("upstream 503")
+    pool, futures = run_concurrently(cache, 4, 'table', blocking_loader(error, calls, release))
+    wait_for(lambda: cache.stats()['coalesced'] == 3)
+    release.set()
+    assert all(future.result() is error for future in futures)
+    pool.shutdown()
+
+    assert len(calls) == 1
+    assert cache.get('table') is None
+    assert cache.get_or_load('table', lambda: 'rows') == 'rows'
+
+def test_invalidate_during_load_does_not_store_stale_value():
+    cache = TTLCache()
+    calls, release = [], threading.Event()
+    pool, futures = run_concurrently(cache, 1, 'table', blocking_loader('stale', calls, release))
+    wait_for(lambda: calls)
+
+    cache.invalidate()
+    # A caller arriving after the invalidation does not wait for the stale load
+    assert cache.get_or_load('table', lambda: 'fresh') == 'fresh'
+    release.set()
+    assert futures[0].result() == 'stale'
+    pool.shutdown()
+
+    assert cache.get('table') == 'fresh'
+    assert cache.stats()['inflight'] == 0
+
+def test_invalidate_matching_keys():
+    cache = TTLCache()
+    for key in [('ri.a', 10), ('ri.a', 20), ('ri.b', 10)]:
+        cache.set(key, key)
+    assert cache.invalidate(lambda key: key[0] == 'ri.a') == 2
+    assert cache.get(('ri.b', 10)) == ('ri.b', 10)
+
+def test_ttl_expiry(clock):
+    cache = TTLCache(ttl=60)
+    cache.set('table', 'rows')
+    clock.now += 59.9
+    assert cache.get('table') == 'rows'
+    clock.now += 0.1
+    assert cache.get('table') is None
+    assert cache.get_or_load('table', lambda: 'reloaded') == 'reloaded'
+    assert cache.stats()['expirations'] == 1
+
+def test_lru_eviction():
+    cache = TTLCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    # Reading 'a' makes 'b' the least recently used
+    assert cache.get_or_load('a', lambda: pytest.fail("loaded again")) == 1
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert cache.stats()['evictions'] == 1
+
+def test_async_waiters_share_a_sync_load():
+    cache = TTLCache()
+    calls, release = [], threading.Event()
+    pool, futures = run_concurrently(cache, 1, 'table', blocking_loader('rows', calls, release))
+    wait_for(lambda: calls)
+
+    async def waiter():
+        async def load():
+            pytest.fail("loaded again")
+        return await cache.get_or_load_async('table', load)
+
+    async def main():
+        task = asyncio.ensure_future(waiter())
+        await asyncio.sleep(0.01)
+        release.set()
+        return await task
+
+    assert asyncio.run(main()) == 'rows'
+    assert futures[0].result() == 'rows'
+    pool.shutdown()
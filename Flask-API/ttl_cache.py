@@ -0,0 +1,155 @@
+"""
+TTL + LRU cache with single-flight loading
+
+Entries expire after a fixed time-to-live and the least recently used entry
+is evicted once the cache is full. When several threads miss on the same key
+at once, only one runs the loader and the others wait for its result.
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+class TTLCache:
+    """
+    Args:
+        max_entries: Largest number of entries kept
+        ttl: Seconds an entry stays valid
+    """
+
+    def __init__(self, max_entries=32, ttl=300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}            # key -> Future shared by concurrent misses
+        self._generation = 0           # bumped by invalidate() so stale loads are not stored
+        self._counts = {'hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0, 'expirations': 0}
+
+    def get(self, key, default=None):
+        """Return a cached value without loading it."""
+        with self._lock:
+            return self._lookup(key, default)
+
+    def _lookup(self, key, default):
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self._counts['expirations'] += 1
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def _begin(self, key):
+        """Returns (hit, value_or_future, owner, generation) for a lookup that may need loading."""
+        missing = object()
+        with self._lock:
+            value = self._lookup(key, missing)
+            if value is not missing:
+                self._counts['hits'] += 1
+                return True, value, False, None
+            future = self._inflight.get(key)
+            if future is not None:
+                self._counts['coalesced'] += 1
+                return False, future, False, None
+            self._counts['misses'] += 1
+            future = self._inflight[key] = Future()
+            return False, future, True, self._generation
+
+    def _end_load(self, key, future):
+        # invalidate() may have let a newer load of the same key start meanwhile; leave that one in place
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+
+    def _fail(self, key, future, error):
+        with self._lock:
+            self._end_load(key, future)
+        future.set_exception(error)
+
+    def _finish(self, key, future, generation, value):
+        with self._lock:
+            self._end_load(key, future)
+            if generation == self._generation:
+                self._store(key, value)
+        future.set_result(value)
+
+    def get_or_load(self, key, loader):
+        """
+        Return the cached value for key, calling loader() once on a miss.
+
+        Exceptions from the loader are raised to every waiting caller and nothing is cached.
+        """
+        hit, result, owner, generation = self._begin(key)
+        if hit:
+            return result
+        if not owner:
+            return result.result()
+
+        try:
+            value = loader()
+        except BaseException as e:
+            self._fail(key, result, e)
+            raise
+        self._finish(key, result, generation, value)
+        return value
+
+    async def get_or_load_async(self, key, loader):
+        """
+        Like get_or_load, for a coroutine function loader.
+
+        Waiters share the same in-flight load as synchronous callers.
+        """
+        hit, result, owner, generation = self._begin(key)
+        if hit:
+            return result
+        if not owner:
+            return await asyncio.wrap_future(result)
+
+        try:
+            value = await loader()
+        except BaseException as e:
+            self._fail(key, result, e)
+            raise
+        self._finish(key, result, generation, value)
+        return value
+
+    def _store(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counts['evictions'] += 1
+
+    def set(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+    def invalidate(self, predicate=None):
+        """
+        Drop entries whose key matches predicate(key), or all entries when predicate is None.
+
+        Loads already in flight finish for their own callers without being stored; later callers start a new load.
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            self._generation += 1
+            for key in [key for key in self._inflight if predicate is None or predicate(key)]:
+                del self._inflight[key]
+            keys = [key for key in self._entries if predicate is None or predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counts)
+            stats.update(entries=len(self._entries), max_entries=self.max_entries, ttl=self.ttl,
+                         inflight=len(self._inflight))
+        return stats
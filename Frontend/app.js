@@ -669,7 +669,7 @@ async function queryDataset() {
         // Check if response is JSON (data found)
         if (contentType && contentType.includes('application/json')) {
             const data = await response.json();
-            buildDataTable(JSON.parse(data));
+            buildDataTable(data);
         } else {
             // Non-JSON response, likely an error
             throw new Error('Envision dataset was not found or you have insufficient permissions');